@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.cache import cache
+
+ADMINS_GROUP = 'Admins'
+INVENTORY_ADMINS_GROUP = 'InventoryAdmins'
+
+IS_STAFF_CLAIM = 'is_staff'
+IS_SUPERUSER_CLAIM = 'is_superuser'
+GROUPS_CLAIM = 'groups'
+AUTHORIZATION_CLAIMS = (IS_STAFF_CLAIM, IS_SUPERUSER_CLAIM, GROUPS_CLAIM)
+
+
+def user_group_names(user):
+    return sorted(user.groups.values_list('name', flat=True))
+
+
+def add_authorization_claims(token, user):
+    """
+    Mint the staff/superuser flags and the group names of the user into the token.
+    """
+    token[IS_STAFF_CLAIM] = user.is_staff
+    token[IS_SUPERUSER_CLAIM] = user.is_superuser
+    token[GROUPS_CLAIM] = user_group_names(user)
+    return token
+
+
+def groups_cache_key(user_id):
+    return f'auth-groups:{user_id}'
+
+
+def invalidate_cached_groups(*user_ids):
+    cache.delete_many([groups_cache_key(user_id) for user_id in user_ids])
+
+
+class AuthorizationContext:
+    """
+    What the requesting user is allowed to do, resolved once per request.
+
+    Built from the claims of the access token when they are present, otherwise from a single
+    cached group lookup (e.g. tokens minted before the claims existed).
+    """
+
+    def __init__(self, is_staff=False, is_superuser=False, groups=()):
+        self.is_staff = is_staff
+        self.is_superuser = is_superuser
+        self.groups = frozenset(groups)
+
+    @classmethod
+    def from_token(cls, token):
+        if token is None or any(claim not in token for claim in AUTHORIZATION_CLAIMS):
+            return None
+
+        return cls(token[IS_STAFF_CLAIM], token[IS_SUPERUSER_CLAIM], token[GROUPS_CLAIM])
+
+    @classmethod
+    def from_user(cls, user):
+        if not user.is_authenticated:
+            return cls()
+
+        key = groups_cache_key(user.pk)
+        groups = cache.get(key)
+        if groups is None:
+            groups = user_group_names(user)
+            cache.set(key, groups, settings.AUTH_USER_CACHE['SHARED_TTL'])
+
+        return cls(user.is_staff, user.is_superuser, groups)
+
+    @property
+    def is_admin(self):
+        return self.is_staff or self.is_superuser
+
+    def in_group(self, name):
+        return name in self.groups
+
+
+def get_authorization_context(user):
+    """
+    Return the authorization context of the user, memoized on the user instance of the request.
+    """
+    context = getattr(user, '_authorization_context', None)
+    if context is None:
+        context = AuthorizationContext.from_user(user)
+        user._authorization_context = context
+    return context
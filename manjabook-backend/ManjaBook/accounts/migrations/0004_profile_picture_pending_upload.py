@@ -0,0 +1,18 @@
+# Generated by Django 5.1.8 on 2026-10-18 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_profile_picture_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='profile_picture_pending_upload',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+    ]
@@ -59,6 +59,8 @@ class Profile(models.Model):
 
     profile_picture = models.ImageField(upload_to=user_directory_path,
                                         default='common/default-user-photo.jpg')
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
+    profile_picture_pending_upload = models.CharField(max_length=32, blank=True, editable=False)
 
     def __str__(self):
         return self.user.username
@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from ManjaBook.accounts.authorization import ADMINS_GROUP, INVENTORY_ADMINS_GROUP, get_authorization_context
+
 
 def is_allowed(request_user, user):
     return (user == request_user or
@@ -8,7 +10,16 @@ def is_allowed(request_user, user):
 
 
 def is_allowed_in_inventory(request_user, user):
-    return is_allowed(request_user, user) or request_user.groups.filter(name="InventoryAdmins").exists()
+    return is_allowed(request_user, user) or get_authorization_context(request_user).in_group(INVENTORY_ADMINS_GROUP)
+
+
+def is_allowed_to_view_private(request_user, user):
+    if not request_user.is_authenticated:
+        return False
+
+    return (user.pk == request_user.pk or
+            request_user.is_superuser or
+            get_authorization_context(request_user).in_group(ADMINS_GROUP))
 
 
 class IsOwnerOrAdmin(permissions.BasePermission):
@@ -17,3 +28,11 @@ class IsOwnerOrAdmin(permissions.BasePermission):
     """
     def has_object_permission(self, request, view, obj):
         return is_allowed_in_inventory(request.user, obj.created_by.user)
+
+
+class IsProfileOwnerOrAdmin(permissions.BasePermission):
+    """
+    Only allow the owner of a profile or admins to edit it.
+    """
+    def has_object_permission(self, request, view, obj):
+        return is_allowed(request.user, obj.user)
@@ -2,16 +2,26 @@ from django.contrib.auth.password_validation import validate_password
 from django.db import transaction, DataError, IntegrityError
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
 
 from ManjaBook.accounts.models import Profile
+from ManjaBook.accounts.authorization import add_authorization_claims
+from ManjaBook.images import SrcsetField
+from ManjaBook.media_urls import MediaImageField, MediaURLFieldsMixin
+from ManjaBook.uploads import StagedUploadsMixin
+from ManjaBook.values_serializers import ValuesSerializer, Srcset
 from ManjaBook.accounts.permissions import is_allowed
-from ManjaBook.inventory.models import Recipe, RecipesCollection
 
 UserModel = get_user_model()
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_authorization_claims(super().get_token(user), user)
+
     def validate(self, attrs):
         data = super().validate(attrs)
         data['user_id'] = self.user.id
@@ -19,6 +29,20 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Re-mint the permission claims on refresh, so group changes reach the access token
+    within one access token lifetime instead of being copied over from the refresh token.
+    """
+    def validate(self, attrs):
+        data = super().validate(attrs)
+
+        access = AccessToken(data['access'])
+        user = UserModel.objects.get(**{jwt_settings.USER_ID_FIELD: access[jwt_settings.USER_ID_CLAIM]})
+        data['access'] = str(add_authorization_claims(access, user))
+        return data
+
+
 class UserCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserModel
@@ -34,14 +58,15 @@ class UserCreateSerializer(serializers.ModelSerializer):
         return user
 
 
-class BaseProfileSerializer(serializers.ModelSerializer):
+class BaseProfileSerializer(MediaURLFieldsMixin, serializers.ModelSerializer):
     username = serializers.SerializerMethodField()
     user_id = serializers.SerializerMethodField(read_only=True)
     is_active = serializers.SerializerMethodField(read_only=True)
+    profile_picture_srcset = SrcsetField('profile_picture')
 
     class Meta:
         model = Profile
-        fields = ['user_id', 'username', 'profile_picture', 'is_active']
+        fields = ['user_id', 'username', 'profile_picture', 'profile_picture_srcset', 'is_active']
 
     def get_username(self, obj):
         return obj.user.username
@@ -52,9 +77,26 @@ class BaseProfileSerializer(serializers.ModelSerializer):
     def get_is_active(self, obj):
         return obj.user.is_active
 
-class ProfileUpdateSerializer(serializers.ModelSerializer):
+
+class BaseProfileValuesSerializer(ValuesSerializer):
+    """
+    `.values()` counterpart of BaseProfileSerializer.
+    """
+    model = Profile
+    fields = {
+        'user_id': 'user',
+        'username': 'user__username',
+        'profile_picture': 'profile_picture',
+        'profile_picture_srcset': Srcset('profile_picture'),
+        'is_active': 'user__is_active',
+    }
+    null_lookup = 'user'
+
+
+class ProfileUpdateSerializer(StagedUploadsMixin, serializers.ModelSerializer):
+    staged_upload_fields = ('profile_picture',)
     username = serializers.CharField(source='user.username')
-    profile_picture = serializers.ImageField(required=False, allow_null=True)
+    profile_picture = MediaImageField(required=False, allow_null=True)
 
     class Meta:
         model = Profile
@@ -79,35 +121,10 @@ class ProfileUpdateSerializer(serializers.ModelSerializer):
 
 
 class ProfileSerializer(BaseProfileSerializer):
-    recipes = serializers.SerializerMethodField()
-    owned_collections = serializers.SerializerMethodField()
     is_owner = serializers.SerializerMethodField()
 
     class Meta(BaseProfileSerializer.Meta):
-        fields = BaseProfileSerializer.Meta.fields + ['recipes', 'owned_collections', 'is_owner']
-
-    def get_recipes(self, obj):
-        from ManjaBook.inventory.serializers import RecipeDetailSerializer
-
-        recipes = Recipe.objects.filter(created_by=obj)
-        return RecipeDetailSerializer(recipes, many=True, context={'exclude_created_by': True}).data
-
-    def get_owned_collections(self, obj):
-        from ManjaBook.inventory.serializers import BaseRecipesCollectionSerializer
-
-        request = self.context.get('request')
-        owned_collections = RecipesCollection.objects.filter(created_by=obj)
-
-        if request and request.user.is_authenticated:
-            is_owner = request.user.profile == obj
-            if is_owner or request.user.is_superuser or request.user.groups.filter(name="Admins").exists():
-                return BaseRecipesCollectionSerializer(
-                    owned_collections, many=True, context={'exclude_created_by': True}
-                ).data
-
-        return BaseRecipesCollectionSerializer(
-            owned_collections.filter(is_private=False), many=True, context={'exclude_created_by': True}
-        ).data
+        fields = BaseProfileSerializer.Meta.fields + ['is_owner']
 
     def get_is_owner(self, obj):
         request = self.context.get('request', None)
@@ -1,11 +1,20 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, pre_save, post_save, post_delete
 from django.contrib.auth import get_user_model
 from django.dispatch import receiver
+from ManjaBook.cache_versions import PROFILES, bump_versions
+from ManjaBook.images import assign_default_image_variants, image_rows_updated, queue_image_derivatives
+from .authorization import invalidate_cached_groups
 from .models import Profile
+from .user_cache import user_cache
 
 UserModel = get_user_model()
 
 
+def is_last_login_update(update_fields):
+    # update_last_login() runs on every sign in and changes nothing that is shown anywhere.
+    return update_fields is not None and set(update_fields) == {'last_login'}
+
+
 @receiver(post_save, sender=UserModel)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
@@ -13,5 +22,46 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=UserModel)
-def save_user_profile(sender, instance, **kwargs):
+def save_user_profile(sender, instance, update_fields=None, **kwargs):
+    if is_last_login_update(update_fields):
+        return
+
     instance.profile.save()
+
+
+@receiver([post_save, post_delete], sender=UserModel)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(m2m_changed, sender=UserModel.groups.through)
+def invalidate_cached_user_groups(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+
+    if not reverse:
+        invalidate_cached_groups(instance.pk)
+    elif action == 'pre_clear':
+        invalidate_cached_groups(*instance.user_set.values_list('pk', flat=True))
+    elif pk_set:
+        invalidate_cached_groups(*pk_set)
+
+
+@receiver([post_save, post_delete], sender=UserModel)
+@receiver([post_save, post_delete], sender=Profile)
+@receiver(image_rows_updated, sender=Profile)
+def bump_profiles_version(sender, update_fields=None, **kwargs):
+    if is_last_login_update(update_fields):
+        return
+
+    bump_versions(PROFILES)
+
+
+@receiver(pre_save, sender=Profile)
+def assign_default_profile_picture_variants(sender, instance, **kwargs):
+    assign_default_image_variants(instance, 'profile_picture')
+
+
+@receiver(post_save, sender=Profile)
+def queue_profile_picture_derivatives(sender, instance, **kwargs):
+    queue_image_derivatives(instance, 'profile_picture')
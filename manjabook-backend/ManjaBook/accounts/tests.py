@@ -1,3 +1,221 @@
-from django.test import TestCase
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from ManjaBook.accounts import urls
+from ManjaBook.accounts.authorization import AUTHORIZATION_CLAIMS, INVENTORY_ADMINS_GROUP
+from ManjaBook.accounts.models import Profile
+from ManjaBook.accounts.serializers import CustomTokenObtainPairSerializer
+from ManjaBook.accounts.user_cache import user_cache
+from ManjaBook.cache_versions import PROFILES, get_versions
+from ManjaBook.jobs.queue import run_due_jobs
+from ManjaBook.testing import QueryBudgetTestCase, S3StorageMixin, image_file, url_names
+
+# Maximum number of SQL queries per request, independent of how many rows are serialized.
+QUERY_BUDGETS = {
+    'api_create_user': 6,
+    'api_token_obtain_pair': 4,
+    'api_token_refresh': 9,
+    'api_user_verify': 1,
+    'api_logout': 7,
+    'api_profile_list_view': 1,
+    'api_profile_detail_view': 2,
+    'api_profile_recipes_view': 2,
+    'api_profile_collections_view': 4,
+    'api_profile_picture_upload': 2,
+    'api_profile_picture_upload_confirm': 3,
+}
+
+
+class AccountsQueryBudgetTests(QueryBudgetTestCase):
+    def test_every_url_has_a_query_budget(self):
+        self.assertSetEqual(url_names(urls.urlpatterns), set(QUERY_BUDGETS))
+
+    def test_create_user(self):
+        self.assertQueryBudget(QUERY_BUDGETS['api_create_user'], 'post', reverse('api_create_user'),
+                               {'email': 'new@manjabook.test', 'username': 'newcomer', 'password': 'budget-Pa55word'},
+                               format='json', expected_status=201)
+
+    def test_token_obtain_pair(self):
+        self.assertQueryBudget(QUERY_BUDGETS['api_token_obtain_pair'], 'post', reverse('api_token_obtain_pair'),
+                               {'email': self.user.email, 'password': 'budget-Pa55word'},
+                               format='json', expected_status=200)
+
+    def test_token_refresh(self):
+        refresh = CustomTokenObtainPairSerializer.get_token(self.user)
+        self.assertQueryBudget(QUERY_BUDGETS['api_token_refresh'], 'post', reverse('api_token_refresh'),
+                               {'refresh': str(refresh)}, format='json', expected_status=200)
+
+    def test_user_verify(self):
+        self.authenticate()
+        response = self.assertQueryBudget(QUERY_BUDGETS['api_user_verify'], 'get', reverse('api_user_verify'),
+                                          expected_status=200)
+        self.assertTrue(response.data['Authenticated'])
+
+    def test_logout(self):
+        self.authenticate()
+        self.client.cookies['refresh'] = str(CustomTokenObtainPairSerializer.get_token(self.user))
+        self.assertQueryBudget(QUERY_BUDGETS['api_logout'], 'post', reverse('api_logout'))
+
+    def test_profile_list(self):
+        response = self.assertQueryBudget(QUERY_BUDGETS['api_profile_list_view'], 'get',
+                                          reverse('api_profile_list_view'), expected_status=200)
+        self.assertEqual(len(response.data['results']), self.USERS)
+
+    def test_profile_detail(self):
+        self.authenticate()
+        response = self.assertQueryBudget(QUERY_BUDGETS['api_profile_detail_view'], 'get',
+                                          reverse('api_profile_detail_view', args=[self.user.pk]),
+                                          expected_status=200)
+        self.assertTrue(response.data['is_owner'])
+
+    def test_profile_recipes(self):
+        response = self.assertQueryBudget(QUERY_BUDGETS['api_profile_recipes_view'], 'get',
+                                          reverse('api_profile_recipes_view', args=[self.user.pk]),
+                                          {'page_size': 100}, expected_status=200)
+        self.assertEqual(len(response.data['results']), self.RECIPES_PER_USER)
+
+    def test_profile_collections(self):
+        response = self.assertQueryBudget(QUERY_BUDGETS['api_profile_collections_view'], 'get',
+                                          reverse('api_profile_collections_view', args=[self.user.pk]),
+                                          expected_status=200)
+        public_collections = len(range(0, self.COLLECTIONS_PER_USER, 2))
+        self.assertEqual(len(response.data['results']), public_collections)
+
+    def test_profile_collections_of_owner(self):
+        self.authenticate()
+        response = self.assertQueryBudget(QUERY_BUDGETS['api_profile_collections_view'], 'get',
+                                          reverse('api_profile_collections_view', args=[self.user.pk]),
+                                          expected_status=200)
+        self.assertEqual(len(response.data['results']), self.COLLECTIONS_PER_USER)
+
+
+class UserCacheTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.authenticate()
+
+    def verify(self):
+        return self.client.get(reverse('api_user_verify')).data
+
+    def test_authenticated_requests_are_served_from_the_cache(self):
+        self.assertTrue(self.verify()['Authenticated'])
+        with self.assertNumQueries(0):
+            self.assertTrue(self.verify()['Authenticated'])
+
+        # Another process, with nothing cached locally, reads the shared entry.
+        user_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertTrue(self.verify()['Authenticated'])
+
+    def test_saving_a_user_invalidates_it(self):
+        self.verify()
+        self.user.username = 'renamed'
+        self.user.save()
+
+        self.assertEqual(self.verify()['username'], 'renamed')
+
+    def test_deactivated_and_deleted_users_are_rejected(self):
+        self.verify()
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self.verify()['Authenticated'])
+
+        self.authenticate(self.users[1])
+        self.verify()
+        self.users[1].delete()
+        self.assertFalse(self.verify()['Authenticated'])
+
+
+class AuthorizationClaimsTests(QueryBudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.inventory_admin = cls.users[1]
+        cls.inventory_admin.groups.add(Group.objects.create(name=INVENTORY_ADMINS_GROUP))
+
+    def is_owner_of_another_users_recipe(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api_recipes_detail', args=[self.recipes[0].pk]))
+        self.assertEqual(response.status_code, 200)
+        group_queries = [query for query in queries.captured_queries if '"auth_group"' in query['sql']]
+        return response.data['is_owner'], len(group_queries)
+
+    def authenticate_without_claims(self, user):
+        # As a token minted before the claims existed
+        token = CustomTokenObtainPairSerializer.get_token(user).access_token
+        for claim in AUTHORIZATION_CLAIMS:
+            del token[claim]
+        self.client.cookies['token'] = str(token)
+
+    def test_tokens_carry_the_authorization_claims(self):
+        token = CustomTokenObtainPairSerializer.get_token(self.inventory_admin).access_token
+        self.assertEqual((token['is_staff'], token['is_superuser'], token['groups']),
+                         (False, False, [INVENTORY_ADMINS_GROUP]))
+
+    def test_claims_grant_permissions_without_group_queries(self):
+        self.authenticate(self.inventory_admin)
+        self.assertEqual(self.is_owner_of_another_users_recipe(), (True, 0))
+
+        self.authenticate(self.users[2])
+        self.assertEqual(self.is_owner_of_another_users_recipe(), (False, 0))
+
+    def test_tokens_without_claims_fall_back_to_a_cached_group_lookup(self):
+        self.authenticate_without_claims(self.inventory_admin)
+        self.assertEqual(self.is_owner_of_another_users_recipe(), (True, 1))
+        self.assertEqual(self.is_owner_of_another_users_recipe(), (True, 0))
+
+        self.inventory_admin.groups.clear()
+        self.assertEqual(self.is_owner_of_another_users_recipe(), (False, 1))
+
+
+class ProfilePictureUploadTests(QueryBudgetTestCase):
+    def test_profile_picture_is_stored_by_the_worker(self):
+        self.authenticate()
+        content = image_file(width=300, height=300)
+        content.name = 'avatar.png'
+        response = self.client.patch(reverse('api_profile_detail_view', args=[self.user.pk]),
+                                     {'username': self.user.username, 'profile_picture': content},
+                                     format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.profile_picture.name, Profile._meta.get_field('profile_picture').default)
+
+        versions = get_versions(PROFILES)
+        run_due_jobs()
+
+        profile = Profile.objects.get(pk=self.user.pk)
+        self.assertTrue(profile.profile_picture.name.startswith(f'users/{self.user.username}/avatar'))
+        self.assertEqual(profile.profile_picture_variants['source'], profile.profile_picture.name)
+        # Cached profile representations are invalidated once the picture and again once its derivatives land.
+        self.assertGreater(get_versions(PROFILES), versions)
+        srcset = self.client.get(reverse('api_profile_detail_view', args=[self.user.pk])).data['profile_picture_srcset']
+        self.assertEqual([candidate.rsplit(' ', 1)[1] for candidate in srcset['jpeg'].split(', ')],
+                         ['160w', '300w'])
+
+
+class ProfilePictureDirectUploadTests(S3StorageMixin, QueryBudgetTestCase):
+    def test_profile_picture(self):
+        self.authenticate()
+        content = image_file(width=200, height=200, image_format='JPEG').read()
+        upload = self.assertQueryBudget(QUERY_BUDGETS['api_profile_picture_upload'], 'post',
+                                        reverse('api_profile_picture_upload', args=[self.user.pk]),
+                                        {'content_type': 'image/jpeg', 'size': len(content)}, format='json',
+                                        expected_status=201).data
+        self.post_to_storage(upload, content, 'image/jpeg')
+
+        versions = get_versions(PROFILES)
+        self.assertQueryBudget(QUERY_BUDGETS['api_profile_picture_upload_confirm'], 'post',
+                               reverse('api_profile_picture_upload_confirm', args=[self.user.pk]),
+                               {'token': upload['token']}, format='json', expected_status=200)
+
+        profile = Profile.objects.get(pk=self.user.pk)
+        self.assertTrue(profile.profile_picture.name.startswith(f'users/{self.user.username}/'))
+        self.assertGreater(get_versions(PROFILES), versions)
+
+    def test_only_the_owner_uploads(self):
+        self.authenticate(self.users[1])
+        response = self.client.post(reverse('api_profile_picture_upload', args=[self.user.pk]),
+                                    {'content_type': 'image/jpeg', 'size': 100}, format='json')
+        self.assertEqual(response.status_code, 403)
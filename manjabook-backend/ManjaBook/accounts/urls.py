@@ -2,18 +2,27 @@ from django.urls import path, include
 from rest_framework_simplejwt.views import TokenRefreshView
 
 from ManjaBook.accounts import views
+from ManjaBook.accounts.serializers import CustomTokenRefreshSerializer
 
 urlpatterns = [
     path('auth/', include([
         path('register/', views.CreateUserApiView.as_view(), name='api_create_user'),
         path('token/', views.LoginApiView.as_view(), name='api_token_obtain_pair'),
-        path('token/refresh/', TokenRefreshView.as_view(), name='api_token_refresh'),
+        path('token/refresh/', TokenRefreshView.as_view(serializer_class=CustomTokenRefreshSerializer), name='api_token_refresh'),
         path('verify/', views.CheckAuthenticationView.as_view(), name='api_user_verify'),
         path('logout/', views.LogoutView.as_view(), name='api_logout'),
     ])),
 
     path('profiles/', include([
         path('', views.ProfileListView.as_view(), name='api_profile_list_view'),
-        path('<int:pk>/', views.UserProfileView.as_view(), name='api_profile_detail_view'),
+        path('<int:pk>/', include([
+            path('', views.UserProfileView.as_view(), name='api_profile_detail_view'),
+            path('recipes/', views.ProfileRecipeListView.as_view(), name='api_profile_recipes_view'),
+            path('collections/', views.ProfileCollectionListView.as_view(), name='api_profile_collections_view'),
+            path('picture/upload/', views.ProfilePictureUploadIntentView.as_view(),
+                 name='api_profile_picture_upload'),
+            path('picture/upload/confirm/', views.ProfilePictureUploadConfirmView.as_view(),
+                 name='api_profile_picture_upload_confirm'),
+        ])),
     ])),
 ]
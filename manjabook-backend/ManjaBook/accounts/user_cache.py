@@ -0,0 +1,88 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class UserCache:
+    """
+    Two-tier cache of authenticated users: a small per-process LRU with a short TTL in front of
+    Django's cache framework, so steady-state authenticated requests do not touch the users table.
+
+    Local entries are keyed by the user id and the password-hash fingerprint of the token.
+    Saving a user drops the shared entry and the local entries of the current process;
+    the local entries of other processes expire within `local_ttl` seconds.
+    """
+
+    def __init__(self, local_ttl=30, local_max_size=1024, shared_ttl=300, key_prefix='auth-user'):
+        self.local_ttl = local_ttl
+        self.local_max_size = local_max_size
+        self.shared_ttl = shared_ttl
+        self.key_prefix = key_prefix
+
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(**{option.lower(): value for option, value in getattr(settings, 'AUTH_USER_CACHE', {}).items()})
+
+    def shared_key(self, user_id):
+        return f'{self.key_prefix}:{user_id}'
+
+    @staticmethod
+    def local_key(user_id, fingerprint):
+        return str(user_id), fingerprint
+
+    def get(self, user_id, fingerprint=None):
+        local_key = self.local_key(user_id, fingerprint)
+
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is not None:
+                user, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._local.move_to_end(local_key)
+                    return copy.deepcopy(user)
+                del self._local[local_key]
+
+        user = cache.get(self.shared_key(user_id))
+        if user is None:
+            return None
+
+        if fingerprint is not None and get_md5_hash_password(user.password) != fingerprint:
+            # The shared entry may predate a password change made elsewhere; let the caller reload the user.
+            return None
+
+        self._set_local(local_key, user)
+        return copy.deepcopy(user)
+
+    def set(self, user_id, user, fingerprint=None):
+        cache.set(self.shared_key(user_id), user, self.shared_ttl)
+        self._set_local(self.local_key(user_id, fingerprint), user)
+
+    def invalidate(self, user_id):
+        cache.delete(self.shared_key(user_id))
+
+        with self._lock:
+            for local_key in [local_key for local_key in self._local if local_key[0] == str(user_id)]:
+                del self._local[local_key]
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def _set_local(self, local_key, user):
+        with self._lock:
+            self._local[local_key] = (copy.deepcopy(user), time.monotonic() + self.local_ttl)
+            self._local.move_to_end(local_key)
+
+            while len(self._local) > self.local_max_size:
+                self._local.popitem(last=False)
+
+
+user_cache = UserCache.from_settings()
@@ -1,14 +1,20 @@
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
 from rest_framework import generics as api_views, views as base_api_views, permissions, status
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 from ManjaBook.accounts.models import Profile
+from ManjaBook.accounts.permissions import IsProfileOwnerOrAdmin, is_allowed_to_view_private
 from ManjaBook.accounts.serializers import UserCreateSerializer, ProfileSerializer, CustomTokenObtainPairSerializer, \
     BaseProfileSerializer, ProfileUpdateSerializer
+from ManjaBook.inventory.models import Recipe, RecipesCollection
+from ManjaBook.inventory.serializers import SimpleRecipeSerializer, BaseRecipesCollectionSerializer
+from ManjaBook.uploads import DirectUploadIntentView, DirectUploadConfirmView
 
 UserModel = get_user_model()
 
@@ -50,6 +56,7 @@ class LoginApiView(TokenObtainPairView):
 class ProfileListView(api_views.ListAPIView):
     serializer_class = BaseProfileSerializer
     permission_classes = [permissions.AllowAny]
+    ordering = ('pk',)
 
     def get_authenticators(self):
         if self.request.method == 'GET':
@@ -57,7 +64,7 @@ class ProfileListView(api_views.ListAPIView):
         return super().get_authenticators()
 
     def get_queryset(self):
-        queryset = Profile.objects.filter(user__is_active=True)
+        queryset = Profile.objects.filter(user__is_active=True).select_related('user')
 
         search_term = self.request.query_params.get('search', None)
         if search_term:
@@ -74,9 +81,7 @@ class UserProfileView(api_views.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
-        return (Profile.objects.filter(user__is_active=True)
-                .select_related('user')
-                .prefetch_related('owned_collections').prefetch_related('recipe_set'))
+        return Profile.objects.filter(user__is_active=True).select_related('user')
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -110,6 +115,55 @@ class UserProfileView(api_views.RetrieveUpdateDestroyAPIView):
         return response
 
 
+class ProfilePictureUploadIntentView(DirectUploadIntentView):
+    queryset = Profile.objects.filter(user__is_active=True).select_related('user')
+    permission_classes = [permissions.IsAuthenticated, IsProfileOwnerOrAdmin]
+    image_field_name = 'profile_picture'
+
+
+class ProfilePictureUploadConfirmView(DirectUploadConfirmView):
+    queryset = Profile.objects.filter(user__is_active=True).select_related('user')
+    permission_classes = [permissions.IsAuthenticated, IsProfileOwnerOrAdmin]
+    image_field_name = 'profile_picture'
+
+
+class ProfileSubresourceMixin:
+    """
+    Resolve the active profile from the URL once, for the paginated lists below a profile.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get_profile(self):
+        if not hasattr(self, '_profile'):
+            self._profile = get_object_or_404(Profile.objects.select_related('user'),
+                                              pk=self.kwargs['pk'], user__is_active=True)
+        return self._profile
+
+
+class ProfileRecipeListView(ProfileSubresourceMixin, api_views.ListAPIView):
+    serializer_class = SimpleRecipeSerializer
+
+    def get_queryset(self):
+        return (Recipe.objects.filter(created_by=self.get_profile())
+                .select_related('created_by__user')
+                .defer('search_vector'))
+
+
+class ProfileCollectionListView(ProfileSubresourceMixin, api_views.ListAPIView):
+    serializer_class = BaseRecipesCollectionSerializer
+
+    def get_queryset(self):
+        profile = self.get_profile()
+        queryset = (RecipesCollection.objects.filter(created_by=profile)
+                    .prefetch_related(Prefetch('recipes',
+                                               queryset=Recipe.objects.only('id', 'name', 'slug', 'created_by'))))
+
+        if not is_allowed_to_view_private(self.request.user, profile.user):
+            queryset = queryset.filter(is_private=False)
+
+        return queryset
+
+
 class CheckAuthenticationView(base_api_views.APIView):
     queryset = Profile.objects.all()
     permission_classes = [permissions.AllowAny]
@@ -0,0 +1,71 @@
+import datetime
+import time
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+PRODUCTS = 'products'
+SHOPS = 'shops'
+UNITS = 'units'
+PROFILES = 'profiles'
+# Product names and nutrients only, for the product registry (see ManjaBook.inventory.product_registry)
+PRODUCT_NUTRIENTS = 'product_nutrients'
+
+
+def version_key(namespace):
+    return f'version:{namespace}'
+
+
+def get_versions(*namespaces):
+    """
+    Return the current version of every namespace, in order.
+
+    Versions are nanosecond timestamps of the last change, so they double as modification times.
+    A namespace missing from the cache (cold start or eviction) starts at the current time,
+    which can only make clients refetch, never serve them stale data.
+    """
+    keys = [version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        versions.update(cache.get_many(missing))
+
+    return tuple(versions[key] for key in keys)
+
+
+def bump_versions(*namespaces):
+    keys = [version_key(namespace) for namespace in namespaces]
+    current = cache.get_many(keys)
+    now = time.time_ns()
+    cache.set_many({key: max(now, current.get(key, 0) + 1) for key in keys}, timeout=None)
+
+
+def version_to_datetime(version):
+    return datetime.datetime.fromtimestamp(version / 1_000_000_000, tz=datetime.timezone.utc)
+
+
+def cache_is_process_local():
+    """
+    Whether the default cache is private to each process, so versions bumped in one never reach the others.
+    """
+    return isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if not cache_is_process_local():
+        return []
+
+    return [Error(
+        "The default cache is local to each process.",
+        hint="Changes are only announced to the other processes (web server processes and run_worker) through "
+             "the versions in the default cache, so with a local one their cached responses, ETags and unit "
+             "and product registries go stale. Set CACHE_BACKEND and CACHE_LOCATION to a cache they share, "
+             "e.g. django.core.cache.backends.redis.RedisCache.",
+        id='cache_versions.E001',
+    )]
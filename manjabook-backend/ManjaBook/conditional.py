@@ -0,0 +1,48 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+class ConditionalGetMixin:
+    """
+    Answer GET requests with 304 Not Modified while the client's copy is still fresh.
+
+    Views override `get_etag()` and/or `get_last_modified()` with checks that are cheap compared to
+    the full response (a timestamp query or cached version counters). They run after authentication and
+    permission checks but before the queryset is evaluated, so a 304 skips serialization entirely.
+    """
+    cache_control = {'private': True, 'no_cache': True}
+    vary_headers = ('Cookie', 'Accept')
+
+    def get_etag(self, request):
+        return None
+
+    def get_last_modified(self, request):
+        return None
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        # Every renderer's representation gets its own validator.
+        etag = quote_etag(f'{etag}.{request.accepted_renderer.format}') if etag is not None else None
+        last_modified = self.get_last_modified(request)
+        last_modified = int(last_modified.timestamp()) if last_modified is not None else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            if etag is not None:
+                response.headers.setdefault('ETag', etag)
+            if last_modified is not None:
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+
+        patch_cache_control(response, **self.cache_control)
+        if self.vary_headers:
+            patch_vary_headers(response, self.vary_headers)
+        return response
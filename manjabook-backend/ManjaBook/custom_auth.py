@@ -9,6 +9,9 @@ from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import Token
 from rest_framework_simplejwt.utils import get_md5_hash_password
 
+from ManjaBook.accounts.authorization import AuthorizationContext
+from ManjaBook.accounts.user_cache import user_cache
+
 
 class JWTAuthentication(authentication.BaseAuthentication):
     """
@@ -62,17 +65,25 @@ class JWTAuthentication(authentication.BaseAuthentication):
 
     def get_user(self, validated_token: Token):
         """
-        Attempts to find and return a user using the given validated token.
+        Attempts to find and return a user using the given validated token,
+        looking in the authenticated-user cache before the database.
+        The permission claims of the token become the authorization context of the request.
         """
         try:
             user_id = validated_token[api_settings.USER_ID_CLAIM]
         except KeyError:
             raise InvalidToken(_("Token contained no recognizable user identification"))
 
-        try:
-            user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
-        except self.user_model.DoesNotExist:
-            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        fingerprint = validated_token.get(api_settings.REVOKE_TOKEN_CLAIM)
+        user = user_cache.get(user_id, fingerprint)
+
+        if user is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+            user_cache.set(user_id, user, fingerprint)
 
         if not user.is_active:
             raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
@@ -85,6 +96,10 @@ class JWTAuthentication(authentication.BaseAuthentication):
                     _("The user's password has been changed."), code="password_changed"
                 )
 
+        authorization = AuthorizationContext.from_token(validated_token)
+        if authorization is not None:
+            user._authorization_context = authorization
+
         return user
 
 
@@ -0,0 +1,196 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django import forms
+from django.core import checks, validators
+from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Cast
+from django.utils.functional import cached_property
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.settings import api_settings
+
+# Stored values are integer thousandths of their unit: milligrams, millikilocalories
+SCALE_PLACES = 3
+SCALE = 10 ** SCALE_PLACES
+
+
+def to_units(value, decimal_places):
+    """
+    Exact Decimal of units for stored thousandths, with `decimal_places`, e.g. 12340 -> Decimal('12.34').
+    """
+    return Decimal(value).scaleb(-SCALE_PLACES).quantize(Decimal(1).scaleb(-decimal_places))
+
+
+def to_stored(value, decimal_places):
+    """
+    Thousandths stored for a number of units, rounded half up to `decimal_places` like the nutrients are
+    calculated, e.g. Decimal('12.34') -> 12340.
+    """
+    units = Decimal(value).quantize(Decimal(1).scaleb(-decimal_places), rounding=ROUND_HALF_UP)
+    return int(units.scaleb(SCALE_PLACES))
+
+
+def fixed_point_formatter(decimal_places):
+    """
+    Function formatting stored thousandths as the string DRF's DecimalField renders for the same number of
+    units, e.g. 12340 -> '12.34', with integer arithmetic and a table of the fractions instead of Decimals.
+    """
+    step = 10 ** (SCALE_PLACES - decimal_places)
+    fractions = [f'.{fraction:0{decimal_places}d}' if decimal_places else ''
+                 for fraction in range(10 ** decimal_places)]
+
+    def format_units(value):
+        if value < 0:
+            return f'-{format_units(-value)}'
+        units, thousandths = divmod(value, SCALE)
+        return f'{units}{fractions[thousandths // step]}'
+
+    return format_units
+
+
+class FixedPointField(models.IntegerField):
+    """
+    A decimal number of units stored as an integer number of thousandths: milligrams for a quantity in
+    grams, millikilocalories for calories. Integers take less space than numerics and the database sums
+    them with integer arithmetic, and Python reads them without building Decimals.
+
+    The value of the model attribute and in queries is the stored integer. Serializers (see
+    FixedPointFieldsMixin), forms and `validators` use the decimal number of units instead, with at most
+    `max_digits` and `decimal_places`, converted exactly both ways.
+    """
+    description = "Decimal number stored in thousandths"
+
+    def __init__(self, *args, max_digits, decimal_places, **kwargs):
+        self.max_digits, self.decimal_places = max_digits, decimal_places
+        super().__init__(*args, **kwargs)
+
+    def check(self, **kwargs):
+        errors = super().check(**kwargs)
+        if not 0 <= self.decimal_places <= min(SCALE_PLACES, self.max_digits):
+            errors.append(checks.Error(
+                f"'decimal_places' must be between 0 and {SCALE_PLACES}, and at most 'max_digits'.",
+                obj=self,
+                id='fixed_point.E001',
+            ))
+        return errors
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['max_digits'] = self.max_digits
+        kwargs['decimal_places'] = self.decimal_places
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        # An integer column holds any 9 digits of thousandths.
+        if self.max_digits - self.decimal_places + SCALE_PLACES <= 9:
+            return 'IntegerField'
+        return 'BigIntegerField'
+
+    @cached_property
+    def validators(self):
+        return [*self._validators, validators.DecimalValidator(self.max_digits, self.decimal_places)]
+
+    def run_validators(self, value):
+        # Validators are declared in units, like the values users enter.
+        super().run_validators(value if value in self.empty_values else self.to_units(value))
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{
+            'form_class': FixedPointFormField,
+            'max_digits': self.max_digits,
+            'decimal_places': self.decimal_places,
+            **kwargs,
+        })
+
+    def to_units(self, value):
+        return to_units(value, self.decimal_places)
+
+    def to_stored(self, value):
+        return to_stored(value, self.decimal_places)
+
+    @cached_property
+    def format_units(self):
+        return fixed_point_formatter(self.decimal_places)
+
+    @staticmethod
+    def units_expression(expression):
+        """
+        `expression`, reading a FixedPointField column, as a numeric number of units.
+        """
+        # Multiplied rather than divided: the integer literal of Decimal(1000) would make it an integer division.
+        return expression * Value(Decimal(1).scaleb(-SCALE_PLACES))
+
+    def stored_expression(self, expression):
+        """
+        `expression`, a number of units with at most `decimal_places`, as the thousandths stored in this field.
+        """
+        return Cast(expression * Value(Decimal(SCALE)), self.clone())
+
+
+def value_in_units(instance, field_name):
+    """
+    A numeric field of a model instance in its unit, converting FixedPointFields from thousandths.
+    """
+    field = instance._meta.get_field(field_name)
+    value = getattr(instance, field_name)
+    if isinstance(field, FixedPointField) and value is not None:
+        return field.to_units(value)
+    return value
+
+
+class FixedPointFormField(forms.DecimalField):
+    """
+    Form side of FixedPointField, e.g. in the admin: shows and accepts the value in units.
+    """
+
+    def prepare_value(self, value):
+        if isinstance(value, int):
+            return to_units(value, self.decimal_places)
+        return value
+
+    def clean(self, value):
+        value = super().clean(value)
+        return value if value is None else to_stored(value, self.decimal_places)
+
+    def has_changed(self, initial, data):
+        return super().has_changed(self.prepare_value(initial), data)
+
+
+class FixedPointSerializerField(serializers.DecimalField):
+    """
+    API side of FixedPointField: renders the stored thousandths as DecimalField renders the same number of
+    units, and validates input in units before converting it to thousandths.
+    """
+
+    def __init__(self, max_digits, decimal_places, **kwargs):
+        super().__init__(max_digits, decimal_places, **kwargs)
+        self.format_units = fixed_point_formatter(decimal_places)
+        self.coerce_to_string = getattr(self, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+
+    def run_validation(self, data=empty):
+        value = super().run_validation(data)
+        return value if value is None else to_stored(value, self.decimal_places)
+
+    def to_representation(self, value):
+        if self.coerce_to_string:
+            return self.format_units(value)
+        return to_units(value, self.decimal_places)
+
+
+class FixedPointFieldsMixin:
+    """
+    ModelSerializer mixin mapping model FixedPointFields to FixedPointSerializerField.
+    """
+    serializer_field_mapping = {**serializers.ModelSerializer.serializer_field_mapping,
+                                FixedPointField: FixedPointSerializerField}
+
+    def build_standard_field(self, field_name, model_field):
+        field_class, field_kwargs = super().build_standard_field(field_name, model_field)
+        if isinstance(model_field, FixedPointField):
+            field_kwargs.update(max_digits=model_field.max_digits, decimal_places=model_field.decimal_places)
+            # Taken from the validators, which are in units; DecimalField compares them as Decimals.
+            for limit in ('max_value', 'min_value'):
+                if limit in field_kwargs:
+                    field_kwargs[limit] = Decimal(str(field_kwargs[limit]))
+        return field_class, field_kwargs
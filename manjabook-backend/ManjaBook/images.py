@@ -0,0 +1,222 @@
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db.models import F, Q
+from django.db.models.fields.json import KT
+from django.db.models.functions import Now
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+from ManjaBook.jobs.queue import enqueue, task
+from ManjaBook.media_urls import media_url_resolver
+
+# Sent with the model as sender after image columns were written by a queryset update, which sends no post_save.
+image_rows_updated = Signal()
+
+# Output formats of the derivatives: file extension -> (Pillow format, content type)
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+
+def variants_field_name(image_field_name):
+    return f'{image_field_name}_variants'
+
+
+def derivative_name(name, width, extension):
+    root, _ = os.path.splitext(name)
+    return f'{root}.w{width}.{extension}'
+
+
+def derivative_widths(width):
+    """
+    The configured widths, with the ones wider than the original replaced by the original width (no upscaling).
+    """
+    return sorted({min(target, width) for target in settings.IMAGE_DERIVATIVES['WIDTHS']})
+
+
+def to_rgb(image):
+    # JPEG has no alpha channel, so transparent areas are flattened onto white.
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate_image_derivatives(storage, name):
+    """
+    Save fixed-width WebP and JPEG versions of an image next to it and return their description,
+    `{'source': name, 'formats': {extension: {width: name}}}`, stored in the `<field>_variants` column.
+    """
+    quality = settings.IMAGE_DERIVATIVES['QUALITY']
+
+    with storage.open(name, 'rb') as source, Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image if image.mode in ('RGB', 'RGBA') else image.convert('RGBA')
+
+        formats = {extension: {} for extension in DERIVATIVE_FORMATS}
+        for width in derivative_widths(image.width):
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS,
+                                                                       reducing_gap=3.0)
+            for extension, (pillow_format, _) in DERIVATIVE_FORMATS.items():
+                buffer = BytesIO()
+                (resized if pillow_format == 'WEBP' else to_rgb(resized)).save(
+                    buffer, pillow_format, quality=quality, optimize=True)
+                formats[extension][str(width)] = storage.save(derivative_name(name, width, extension),
+                                                              ContentFile(buffer.getvalue()))
+
+    return {'source': name, 'formats': formats}
+
+
+def default_variants_cache_key(model, image_field_name):
+    return f'image-variants:{model._meta.label_lower}.{image_field_name}'
+
+
+def default_image_variants(model, image_field_name):
+    """
+    Return the derivatives of the field's default image already recorded on another row, if any,
+    so that every row left with the default image does not generate them again.
+    """
+    default = model._meta.get_field(image_field_name).default
+    cache_key = default_variants_cache_key(model, image_field_name)
+    variants = cache.get(cache_key)
+    if variants is None:
+        variants_field = variants_field_name(image_field_name)
+        variants = (model.objects
+                    .filter(**{image_field_name: default, f'{variants_field}__source': default})
+                    .values_list(variants_field, flat=True)
+                    .first())
+        if variants:
+            cache.set(cache_key, variants, None)
+    return variants
+
+
+def assign_default_image_variants(instance, image_field_name):
+    """
+    Before saving, copy the recorded derivatives of the default image onto an instance left with it.
+    """
+    field_file = getattr(instance, image_field_name)
+    variants_field = variants_field_name(image_field_name)
+    model = type(instance)
+    if (field_file.name != model._meta.get_field(image_field_name).default or
+            (getattr(instance, variants_field) or {}).get('source') == field_file.name):
+        return
+
+    variants = default_image_variants(model, image_field_name)
+    if variants:
+        setattr(instance, variants_field, variants)
+
+
+def stale_image_rows(model, image_field_name):
+    """
+    Rows with an image whose derivatives are missing or were generated for a previous image.
+    """
+    variants_source = KT(f'{variants_field_name(image_field_name)}__source')
+    return (model.objects
+            .exclude(**{image_field_name: ''})
+            .exclude(**{f'{image_field_name}__isnull': True})
+            .annotate(variants_source=variants_source)
+            .filter(Q(variants_source__isnull=True) | ~Q(variants_source=F(image_field_name))))
+
+
+def update_image_rows(queryset, **values):
+    """
+    Write image columns with a queryset update, stamping the `auto_now` fields as a save would
+    and sending `image_rows_updated` so that whatever else caches the rows can follow.
+    """
+    model = queryset.model
+    auto_now = {field.name: Now() for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)}
+    updated = queryset.update(**values, **auto_now)
+    if updated:
+        image_rows_updated.send(sender=model)
+    return updated
+
+
+def record_image_derivatives(model, image_field_name, name):
+    """
+    Generate the derivatives of the stored image `name` once and record them on every row showing it
+    without up-to-date ones (many rows share the default image). Returns the number of rows updated.
+    """
+    if not stale_image_rows(model, image_field_name).filter(**{image_field_name: name}).exists():
+        # An earlier job for the same image recorded them already.
+        return 0
+
+    variants = generate_image_derivatives(model._meta.get_field(image_field_name).storage, name)
+    if name == model._meta.get_field(image_field_name).default:
+        cache.set(default_variants_cache_key(model, image_field_name), variants, None)
+
+    return update_image_rows(stale_image_rows(model, image_field_name).filter(**{image_field_name: name}),
+                             **{variants_field_name(image_field_name): variants})
+
+
+@task('images.record_derivatives')
+def record_image_derivatives_task(model, field, name):
+    record_image_derivatives(apps.get_model(model), field, name)
+
+
+def queue_image_derivatives(instance, image_field_name):
+    """
+    After a save, queue the generation of the derivatives of the instance's image unless they are
+    up to date. Jobs finding the derivatives already recorded by an earlier one end without generating them.
+    """
+    field_file = getattr(instance, image_field_name)
+    variants_field = variants_field_name(image_field_name)
+    variants = getattr(instance, variants_field) or {}
+    if variants.get('source') == (field_file.name or None):
+        return
+
+    model = type(instance)
+    if not field_file:
+        update_image_rows(model.objects.filter(pk=instance.pk), **{variants_field: {}})
+        setattr(instance, variants_field, {})
+        return
+
+    # Not deduplicated with a key: a job already running for the image may have passed this row.
+    enqueue('images.record_derivatives', model=model._meta.label_lower, field=image_field_name, name=field_file.name)
+
+
+def build_srcset(variants, image_name, url):
+    """
+    Return `{extension: 'url 160w, url 320w, ...'}` for `<picture>` sources, or {} when the derivatives
+    are missing or belong to a previous image.
+    """
+    if not variants or not image_name or variants.get('source') != image_name:
+        return {}
+    return {extension: ', '.join(f'{url(name)} {width}w' for width, name in names.items())
+            for extension, names in variants['formats'].items()}
+
+
+def media_url_builder(storage, request):
+    # The URL of a stored file, as DRF's ImageField renders it.
+    resolve = media_url_resolver(storage)
+
+    def url(name):
+        location = resolve(name)
+        return request.build_absolute_uri(location) if request is not None else location
+
+    return url
+
+
+class SrcsetField(serializers.Field):
+    """
+    Read-only srcset map of the derivatives of an image field.
+    """
+
+    def __init__(self, image_field_name, **kwargs):
+        self.image_field_name = image_field_name
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        field_file = getattr(instance, self.image_field_name)
+        url = media_url_builder(field_file.storage, self.context.get('request'))
+        return build_srcset(getattr(instance, variants_field_name(self.image_field_name)), field_file.name, url)
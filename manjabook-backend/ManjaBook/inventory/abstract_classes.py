@@ -1,7 +1,14 @@
 from django.core.validators import MinValueValidator, MaxValueValidator, MinLengthValidator
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import NullIf, Round
+
+from ManjaBook.fixed_point import FixedPointField
 from ManjaBook.inventory.choices import NutritionPerChoices
 
+NUTRIENT_FIELDS = ('calories', 'protein', 'carbohydrates', 'sugars',
+                   'fats', 'saturated_fats', 'salt', 'fibre')
+
 
 class ProductNutrientsInfo(models.Model):
     class Meta:
@@ -15,47 +22,47 @@ class ProductNutrientsInfo(models.Model):
                                         validators=[MinValueValidator(0, 'Calories have to be more or equal to 0.'),
                                                     MaxValueValidator(1000, 'Calories have to be less than or equal '
                                                                             'to 1000.')])
-    protein = models.DecimalField(default=0,
-                                  max_digits=5,
-                                  decimal_places=2,
-                                  validators=[MinValueValidator(0),
-                                              MaxValueValidator(250)])
-
-    carbohydrates = models.DecimalField(default=0,
-                                        max_digits=5,
-                                        decimal_places=2,
-                                        validators=[MinValueValidator(0),
-                                                    MaxValueValidator(250)])
-
-    sugars = models.DecimalField(default=0,
-                                 max_digits=5,
-                                 decimal_places=2,
-                                 validators=[MinValueValidator(0),
-                                             MaxValueValidator(250)])
-
-    fats = models.DecimalField(default=0,
-                               max_digits=5,
-                               decimal_places=2,
-                               validators=[MinValueValidator(0),
-                                           MaxValueValidator(111.11)])
-
-    saturated_fats = models.DecimalField(default=0,
-                                         max_digits=5,
-                                         decimal_places=2,
-                                         validators=[MinValueValidator(0),
-                                                     MaxValueValidator(111.11)])
-
-    salt = models.DecimalField(default=0,
-                               max_digits=5,
-                               decimal_places=3,
-                               validators=[MinValueValidator(0),
-                                           MaxValueValidator(100)])
-
-    fibre = models.DecimalField(default=0,
-                                max_digits=4,
-                                decimal_places=2,
-                                validators=[MinValueValidator(0),
-                                            MaxValueValidator(50)])
+    protein = FixedPointField(default=0,
+                              max_digits=5,
+                              decimal_places=2,
+                              validators=[MinValueValidator(0),
+                                          MaxValueValidator(250)])
+
+    carbohydrates = FixedPointField(default=0,
+                                    max_digits=5,
+                                    decimal_places=2,
+                                    validators=[MinValueValidator(0),
+                                                MaxValueValidator(250)])
+
+    sugars = FixedPointField(default=0,
+                             max_digits=5,
+                             decimal_places=2,
+                             validators=[MinValueValidator(0),
+                                         MaxValueValidator(250)])
+
+    fats = FixedPointField(default=0,
+                           max_digits=5,
+                           decimal_places=2,
+                           validators=[MinValueValidator(0),
+                                       MaxValueValidator(111.11)])
+
+    saturated_fats = FixedPointField(default=0,
+                                     max_digits=5,
+                                     decimal_places=2,
+                                     validators=[MinValueValidator(0),
+                                                 MaxValueValidator(111.11)])
+
+    salt = FixedPointField(default=0,
+                           max_digits=5,
+                           decimal_places=3,
+                           validators=[MinValueValidator(0),
+                                       MaxValueValidator(100)])
+
+    fibre = FixedPointField(default=0,
+                            max_digits=4,
+                            decimal_places=2,
+                            validators=[MinValueValidator(0),
+                                        MaxValueValidator(50)])
 
     @property
     def kilojoules(self):
@@ -63,33 +70,93 @@ class ProductNutrientsInfo(models.Model):
 
 
 class RecipeNutrientsInfo(models.Model):
-    calories = models.DecimalField(max_digits=6, decimal_places=2,
-                                   null=True, blank=True, editable=False)
+    calories = FixedPointField(max_digits=6, decimal_places=2,
+                               null=True, blank=True, editable=False)
 
-    protein = models.DecimalField(max_digits=6, decimal_places=2,
-                                  null=True, blank=True, editable=False)
+    protein = FixedPointField(max_digits=6, decimal_places=2,
+                              null=True, blank=True, editable=False)
 
-    carbohydrates = models.DecimalField(max_digits=6, decimal_places=2,
-                                        null=True, blank=True, editable=False)
+    carbohydrates = FixedPointField(max_digits=6, decimal_places=2,
+                                    null=True, blank=True, editable=False)
 
-    sugars = models.DecimalField(max_digits=6, decimal_places=2,
-                                 null=True, blank=True, editable=False)
+    sugars = FixedPointField(max_digits=6, decimal_places=2,
+                             null=True, blank=True, editable=False)
 
-    fats = models.DecimalField(max_digits=6, decimal_places=2,
-                               null=True, blank=True, editable=False)
+    fats = FixedPointField(max_digits=6, decimal_places=2,
+                           null=True, blank=True, editable=False)
 
-    saturated_fats = models.DecimalField(max_digits=6, decimal_places=2,
-                                         null=True, blank=True, editable=False)
+    saturated_fats = FixedPointField(max_digits=6, decimal_places=2,
+                                     null=True, blank=True, editable=False)
 
-    salt = models.DecimalField(max_digits=6, decimal_places=3,
-                               null=True, blank=True, editable=False)
+    salt = FixedPointField(max_digits=6, decimal_places=3,
+                           null=True, blank=True, editable=False)
+
+    fibre = FixedPointField(max_digits=6, decimal_places=2,
+                            null=True, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
 
-    fibre = models.DecimalField(max_digits=6, decimal_places=2,
-                                null=True, blank=True, editable=False)
 
+class RecipeTotalNutrientsInfo(models.Model):
+    """
+    Totals of the nutrients of all products in a recipe, kept in sync by the RecipeProduct signals.
+    """
     class Meta:
         abstract = True
 
+    calories = FixedPointField(max_digits=10, decimal_places=2, default=0, editable=False)
+
+    protein = FixedPointField(max_digits=10, decimal_places=2, default=0, editable=False)
+
+    carbohydrates = FixedPointField(max_digits=10, decimal_places=2, default=0, editable=False)
+
+    sugars = FixedPointField(max_digits=10, decimal_places=2, default=0, editable=False)
+
+    fats = FixedPointField(max_digits=10, decimal_places=2, default=0, editable=False)
+
+    saturated_fats = FixedPointField(max_digits=10, decimal_places=2, default=0, editable=False)
+
+    salt = FixedPointField(max_digits=10, decimal_places=3, default=0, editable=False)
+
+    fibre = FixedPointField(max_digits=10, decimal_places=2, default=0, editable=False)
+
+    @property
+    def total_nutrients(self):
+        return {field: getattr(self, field) for field in NUTRIENT_FIELDS}
+
+
+def nutrient_per_portion_field(nutrient, decimal_places=2):
+    output_field = FixedPointField(max_digits=10, decimal_places=decimal_places)
+    per_portion = Round(output_field.units_expression(F(nutrient)) / NullIf(F('portions'), 0), decimal_places)
+    return models.GeneratedField(expression=output_field.stored_expression(per_portion),
+                                 output_field=output_field,
+                                 db_persist=True)
+
+
+class RecipePortionNutrientsInfo(models.Model):
+    """
+    Stored per-portion nutrients, generated by the database from the recipe totals and portions.
+    """
+    class Meta:
+        abstract = True
+
+    calories_per_portion = nutrient_per_portion_field('calories')
+
+    protein_per_portion = nutrient_per_portion_field('protein')
+
+    carbohydrates_per_portion = nutrient_per_portion_field('carbohydrates')
+
+    sugars_per_portion = nutrient_per_portion_field('sugars')
+
+    fats_per_portion = nutrient_per_portion_field('fats')
+
+    saturated_fats_per_portion = nutrient_per_portion_field('saturated_fats')
+
+    salt_per_portion = nutrient_per_portion_field('salt', decimal_places=3)
+
+    fibre_per_portion = nutrient_per_portion_field('fibre')
+
 
 class BasicRecipeInfo(models.Model):
     class Meta:
@@ -1,9 +1,19 @@
 from django.contrib import admin
 
+from ManjaBook.fixed_point import value_in_units
 from ManjaBook.inventory.models import Shop, Product, Recipe, RecipeProduct, Unit, CustomUnit, RecipesCollection, \
     SavedRecipesCollection
 
 
+def units_column(field_name):
+    # A FixedPointField in units rather than its stored thousandths.
+    @admin.display(description=field_name.replace('_', ' '), ordering=field_name)
+    def column(obj):
+        return value_in_units(obj, field_name)
+
+    return column
+
+
 @admin.register(Shop)
 class ShopAdmin(admin.ModelAdmin):
     list_display = ('id', 'name')
@@ -16,7 +26,8 @@ class ShopAdmin(admin.ModelAdmin):
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'brand', 'nutrition_per', 'calories',
-                    'protein', 'carbohydrates', 'sugars', 'fats', 'saturated_fats', 'salt', 'fibre')
+                    *(units_column(field) for field in ('protein', 'carbohydrates', 'sugars', 'fats',
+                                                        'saturated_fats', 'salt', 'fibre')))
     list_filter = ('brand', 'nutrition_per', 'calories')
     search_fields = ('name', 'brand')
     ordering = ('name',)
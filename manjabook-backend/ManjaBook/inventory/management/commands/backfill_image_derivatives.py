@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from ManjaBook.accounts.models import Profile
+from ManjaBook.images import record_image_derivatives, stale_image_rows
+from ManjaBook.inventory.models import Recipe, RecipesCollection
+
+IMAGE_FIELDS = ((Recipe, 'image'), (RecipesCollection, 'image'), (Profile, 'profile_picture'))
+
+
+class Command(BaseCommand):
+    help = ("Generate the missing or stale WebP/JPEG derivatives of uploaded images, or list them with --verify. "
+            "Rows sharing an image (such as the default one) are generated once and updated together.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help="Only report images without up-to-date derivatives, without writing anything.")
+
+    def handle(self, *args, **options):
+        for model, image_field_name in IMAGE_FIELDS:
+            label = f'{model._meta.label}.{image_field_name}'
+            stale = stale_image_rows(model, image_field_name)
+            names = list(stale.order_by(image_field_name).values_list(image_field_name, flat=True).distinct())
+
+            if options['verify']:
+                self.stdout.write(f"{label}: {stale.count()} rows, {len(names)} images without up-to-date derivatives.")
+                continue
+
+            updated, failed = 0, 0
+            for name in names:
+                try:
+                    updated += record_image_derivatives(model, image_field_name, name)
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(self.style.WARNING(f"{label}: could not generate {name}: {error}"))
+
+            self.stdout.write(self.style.SUCCESS(f"{label}: generated {len(names) - failed} images, "
+                                                 f"updated {updated} rows, {failed} failed."))
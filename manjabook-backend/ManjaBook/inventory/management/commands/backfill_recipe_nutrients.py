@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ManjaBook.inventory.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Recalculate the stored nutrient totals of recipes, or verify them with --verify."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help="Only report recipes with stale totals, without writing anything.")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of recipes updated per transaction.")
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            self.verify()
+        else:
+            self.backfill(options['batch_size'])
+
+    def verify(self):
+        stale_ids = list(Recipe.objects.with_stale_total_nutrients().values_list('id', flat=True))
+
+        if not stale_ids:
+            self.stdout.write(self.style.SUCCESS("All recipe nutrient totals are up to date."))
+            return
+
+        self.stdout.write(self.style.WARNING(f"{len(stale_ids)} recipes have stale nutrient totals: "
+                                             f"{', '.join(map(str, stale_ids))}"))
+
+    def backfill(self, batch_size):
+        last_id = 0
+        updated = 0
+
+        while True:
+            batch_ids = list(Recipe.objects.filter(id__gt=last_id)
+                             .order_by('id')
+                             .values_list('id', flat=True)[:batch_size])
+            if not batch_ids:
+                break
+
+            with transaction.atomic():
+                updated += Recipe.objects.filter(id__in=batch_ids).refresh_total_nutrients()
+
+            last_id = batch_ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Recalculated nutrient totals of {updated} recipes."))
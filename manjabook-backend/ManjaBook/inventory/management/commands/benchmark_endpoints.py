@@ -0,0 +1,222 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from ManjaBook.accounts.models import AccountUser, Profile
+from ManjaBook.accounts.serializers import CustomTokenObtainPairSerializer
+from ManjaBook.inventory.models import Shop, Product, Unit, CustomUnit, Recipe, RecipeProduct, RecipesCollection, \
+    SavedRecipesCollection
+
+
+class Scenario:
+    def __init__(self, name, url, method='get', data=None, authenticated=False, rollback=False):
+        self.name = name
+        self.url = url
+        self.method = method
+        self.data = data
+        self.authenticated = authenticated
+        self.rollback = rollback
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the API routes through the Django test client against the current database "
+            "(see seed_database) and write p50/p95/p99 latency, query counts and peak memory to a JSON file.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument('--compare', help="A previous benchmark JSON file to print the differences against.")
+        parser.add_argument('--only', nargs='*', default=None, help="Run only the scenarios with these names.")
+
+    def handle(self, *args, **options):
+        scenarios = self.build_scenarios()
+        if options['only']:
+            scenarios = [scenario for scenario in scenarios if scenario.name in options['only']]
+
+        # Always measured with DEBUG off, as in the test runner, so runs on different machines compare.
+        setup_test_environment(debug=False)
+        try:
+            results = {scenario.name: self.run_scenario(scenario, options['warmup'], options['iterations'])
+                       for scenario in scenarios}
+            report = {'meta': self.metadata(options), 'results': results}
+        finally:
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+
+        self.print_results(results, self.load_baseline(options['compare']))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}."))
+
+    def build_scenarios(self):
+        recipe = Recipe.objects.order_by('id').first()
+        if recipe is None or recipe.created_by_id is None:
+            raise CommandError("No recipes to benchmark; run seed_database first.")
+
+        self.user = AccountUser.objects.get(pk=recipe.created_by_id)
+        product = Product.objects.order_by('id').first()
+        unit = Unit.objects.order_by('id').first()
+        collection = RecipesCollection.objects.order_by('id').first()
+        saved_collection = SavedRecipesCollection.objects.order_by('id').first()
+        recipe_product = RecipeProduct.objects.order_by('id').first()
+        custom_unit = CustomUnit.objects.order_by('id').first()
+
+        recipe_payload = {
+            'name': 'Benchmark recipe',
+            'quick_description': 'Created and rolled back by the benchmark.',
+            'portions': 2,
+            'time_to_cook': 10,
+            'time_to_prepare': 10,
+            'preparation': 'Cook it.',
+            'products': [{'product_id': recipe_product.product_id, 'quantity': str(recipe_product.quantity),
+                          'unit_id': recipe_product.unit_id, 'custom_unit_id': recipe_product.custom_unit_id}
+                         for recipe_product in recipe.recipe_products.all()],
+        }
+
+        scenarios = [
+            Scenario('products_list', reverse('api_products_list')),
+            Scenario('products_search', reverse('api_products_list') + '?search=chick'),
+            Scenario('products_autocomplete', reverse('api_products_autocomplete') + '?search=chick'),
+            Scenario('products_detail', reverse('api_products_detail', args=[product.pk])),
+            Scenario('shops_list', reverse('api_shops_list')),
+            Scenario('units_list', reverse('api_units_list')),
+            Scenario('units_detail', reverse('api_units_detail', args=[unit.pk])),
+            Scenario('custom_units_list', reverse('api_custom_units_list')),
+            Scenario('recipes_products_list', reverse('api_recipes_products_list')),
+            Scenario('recipes_products_detail', reverse('api_recipes_products_detail', args=[recipe_product.pk])),
+            Scenario('recipes_list', reverse('api_recipes_list')),
+            Scenario('recipes_search', reverse('api_recipes_list') + '?search=spicy+chicken'),
+            Scenario('recipes_filter', reverse('api_recipes_list') +
+                     '?calories_per_portion__lte=500&protein_per_portion__gte=20'),
+            Scenario('recipes_detail', reverse('api_recipes_detail', args=[recipe.pk]), authenticated=True),
+            Scenario('recipes_create', reverse('api_recipes_list'), method='post', data=recipe_payload,
+                     authenticated=True, rollback=True),
+            Scenario('recipes_update', reverse('api_recipes_detail', args=[recipe.pk]), method='put',
+                     data=recipe_payload, authenticated=True, rollback=True),
+            Scenario('recipes_collection_list', reverse('api_recipes_collection_list')),
+            Scenario('saved_recipes_collection_list', reverse('api_saved_recipes_collection_list')),
+            Scenario('profile_list', reverse('api_profile_list_view')),
+            Scenario('profile_detail', reverse('api_profile_detail_view', args=[self.user.pk]), authenticated=True),
+            Scenario('profile_recipes', reverse('api_profile_recipes_view', args=[self.user.pk])),
+            Scenario('profile_collections', reverse('api_profile_collections_view', args=[self.user.pk]),
+                     authenticated=True),
+            Scenario('user_verify', reverse('api_user_verify'), authenticated=True),
+        ]
+        if custom_unit is not None:
+            scenarios.append(Scenario('custom_units_detail', reverse('api_custom_units_detail', args=[custom_unit.pk])))
+        if collection is not None:
+            scenarios.append(Scenario('recipes_collection_detail',
+                                      reverse('api_recipes_collection_detail', args=[collection.pk])))
+        if saved_collection is not None:
+            scenarios.append(Scenario('saved_recipes_collection_detail',
+                                      reverse('api_saved_recipes_collection_detail', args=[saved_collection.pk])))
+
+        return scenarios
+
+    def client_for(self, scenario):
+        client = Client()
+        if scenario.authenticated:
+            client.cookies['token'] = str(CustomTokenObtainPairSerializer.get_token(self.user).access_token)
+        return client
+
+    def request(self, client, scenario):
+        kwargs = {'content_type': 'application/json'} if scenario.data is not None else {}
+        data = json.dumps(scenario.data) if scenario.data is not None else None
+
+        if not scenario.rollback:
+            return getattr(client, scenario.method)(scenario.url, data, **kwargs)
+
+        with transaction.atomic():
+            response = getattr(client, scenario.method)(scenario.url, data, **kwargs)
+            transaction.set_rollback(True)
+        return response
+
+    def run_scenario(self, scenario, warmup, iterations):
+        client = self.client_for(scenario)
+        for _ in range(warmup):
+            self.request(client, scenario)
+
+        durations, query_counts, statuses = [], [], set()
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = self.request(client, scenario)
+                durations.append((time.perf_counter() - start) * 1000)
+            query_counts.append(len(queries))
+            statuses.add(response.status_code)
+
+        # Measured on a separate request, since tracing allocations slows every request down.
+        tracemalloc.start()
+        self.request(client, scenario)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        percentiles = statistics.quantiles(durations, n=100, method='inclusive')
+        return {
+            'method': scenario.method.upper(),
+            'url': scenario.url,
+            'status': sorted(statuses),
+            'iterations': iterations,
+            'p50_ms': round(percentiles[49], 3),
+            'p95_ms': round(percentiles[94], 3),
+            'p99_ms': round(percentiles[98], 3),
+            'mean_ms': round(statistics.fmean(durations), 3),
+            'queries': max(query_counts),
+            'peak_memory_kb': round(peak_memory / 1024, 1),
+        }
+
+    def metadata(self, options):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                    check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW server_version')
+            database_version = cursor.fetchone()[0]
+
+        return {
+            'commit': commit,
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': f'{connection.vendor} {database_version}',
+            'debug': settings.DEBUG,
+            'warmup': options['warmup'],
+            'iterations': options['iterations'],
+            'rows': {model.__name__: model.objects.count()
+                     for model in (AccountUser, Profile, Shop, Product, Unit, Recipe, RecipeProduct,
+                                   RecipesCollection, SavedRecipesCollection)},
+        }
+
+    @staticmethod
+    def load_baseline(path):
+        if not path:
+            return {}
+        with open(path) as baseline:
+            return json.load(baseline)['results']
+
+    def print_results(self, results, baseline):
+        self.stdout.write(f"{'scenario':<34}{'p50':>10}{'p95':>10}{'p99':>10}{'queries':>9}{'peak kb':>10}")
+        for name, result in results.items():
+            line = (f"{name:<34}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                    f"{result['queries']:>9}{result['peak_memory_kb']:>10.1f}")
+            if name in baseline:
+                before = baseline[name]
+                change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+                line += f"   p50 {change:+.1f}%, queries {result['queries'] - before['queries']:+d}"
+            self.stdout.write(line)
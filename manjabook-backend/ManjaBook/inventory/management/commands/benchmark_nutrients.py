@@ -0,0 +1,69 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from rest_framework.test import APIRequestFactory
+
+from ManjaBook.inventory.abstract_classes import NUTRIENT_FIELDS
+from ManjaBook.inventory.models import Recipe, RecipeProduct
+from ManjaBook.inventory.serializers import RecipeProductSerializer, SimpleRecipeValuesSerializer
+from ManjaBook.renderers import ORJSONRenderer
+
+
+class Command(BaseCommand):
+    help = ("Time the aggregation and serialization of the stored nutrients on the current database "
+            "(see seed_database): summing the recipe products per recipe, refreshing every recipe total "
+            "(rolled back), and fetching nutrient columns and rendering them as JSON. Wall time, database included.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000,
+                            help="Recipe products fetched and serialized.")
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        if not RecipeProduct.objects.exists():
+            raise CommandError("No recipe products to benchmark; run seed_database first.")
+
+        context = {'request': APIRequestFactory().get('/')}
+        renderer = ORJSONRenderer()
+        recipe_products = RecipeProduct.objects.order_by('id')[:rows]
+        cases = {
+            'sum_per_recipe': lambda: list(RecipeProduct.objects.order_by().values('recipe')
+                                           .annotate(**{f'total_{field}': Sum(field) for field in NUTRIENT_FIELDS})),
+            'refresh_totals': self.refresh_totals,
+            'fetch_nutrients': lambda: list(recipe_products.values_list(*NUTRIENT_FIELDS)),
+            'serialize_products': lambda: renderer.render(RecipeProductSerializer(
+                recipe_products.select_related('product').prefetch_related('product__shopped_from'),
+                many=True, context=context).data),
+            'serialize_recipes': lambda: renderer.render(self.serialize_values(SimpleRecipeValuesSerializer(context),
+                                                                               Recipe.objects.order_by('id'))),
+        }
+
+        self.stdout.write(f"{RecipeProduct.objects.count()} recipe products in {Recipe.objects.count()} recipes")
+        self.stdout.write(f"{'case':<22}{'median ms':>12}{'min ms':>10}")
+        for name, function in cases.items():
+            median, fastest = self.wall_time(function, repeat)
+            self.stdout.write(f"{name:<22}{median:>12.2f}{fastest:>10.2f}")
+
+    @staticmethod
+    def refresh_totals():
+        with transaction.atomic():
+            Recipe.objects.refresh_total_nutrients()
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def serialize_values(serializer, queryset):
+        return serializer.serialize_many(queryset.values(*serializer.lookups))
+
+    @staticmethod
+    def wall_time(function, repeat):
+        function()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings), min(timings)
@@ -0,0 +1,56 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ManjaBook.inventory.models import Recipe
+from ManjaBook.inventory.serializers import RecipeDetailSerializer, SimpleRecipeValuesSerializer
+from ManjaBook.renderers import ORJSONRenderer, MessagePackRenderer
+
+
+class Command(BaseCommand):
+    help = ("Compare the render time and size of the recipe detail and recipe list payloads "
+            "with DRF's JSONRenderer, the orjson renderer and the MessagePack renderer.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help="Recipes in the list payload.")
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        recipe = (Recipe.objects.annotate(products_count=Count('recipe_products'))
+                  .order_by('-products_count', 'id').first())
+        if recipe is None:
+            raise CommandError("No recipes to benchmark; run seed_database first.")
+
+        context = {'request': Request(APIRequestFactory().get('/'))}
+        serializer = SimpleRecipeValuesSerializer(context)
+        payloads = {
+            f'recipe_detail ({recipe.products_count} products)': RecipeDetailSerializer(
+                Recipe.objects.with_products().get(pk=recipe.pk), context=context).data,
+            f'recipe_list ({options["rows"]} rows)': {
+                'next': None, 'previous': None,
+                'results': serializer.serialize_many(
+                    Recipe.objects.order_by('-created_at', '-id').values(*serializer.lookups)[:options['rows']]),
+            },
+        }
+        renderers = {'drf json': JSONRenderer(), 'orjson': ORJSONRenderer(), 'msgpack': MessagePackRenderer()}
+
+        self.stdout.write(f"{'payload':<34}{'renderer':<10}{'median ms':>11}{'bytes':>10}")
+        for payload_name, data in payloads.items():
+            for renderer_name, renderer in renderers.items():
+                content = renderer.render(data)
+                self.stdout.write(f"{payload_name:<34}{renderer_name:<10}"
+                                  f"{self.render_time(renderer, data, options['repeat']):>11.3f}{len(content):>10}")
+
+    @staticmethod
+    def render_time(renderer, data, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            renderer.render(data)
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,80 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from ManjaBook.inventory.models import Product, Recipe, RecipesCollection
+from ManjaBook.inventory.serializers import ProductBaseSerializer, ProductValuesSerializer, SimpleRecipeSerializer, \
+    SimpleRecipeValuesSerializer, RecipesCollectionDetailSerializer, RecipesCollectionDetailValuesSerializer
+
+
+class Command(BaseCommand):
+    help = ("Compare the CPU time of the DRF serializers and their .values() counterparts on the same rows "
+            "of the current database (see seed_database), including fetching the rows.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--no-url-cache', action='store_true',
+                            help="Resolve every media URL through the storage, as before ManjaBook.media_urls.")
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        collection = (RecipesCollection.objects.filter(recipes__isnull=False)
+                      .order_by('-id').values_list('id', flat=True).first())
+        if collection is None:
+            raise CommandError("No collections with recipes to benchmark; run seed_database first.")
+
+        # DRF builds absolute media URLs from the request, so both sides get one.
+        context = {'request': APIRequestFactory().get('/')}
+        cases = {
+            'products': (
+                lambda: ProductBaseSerializer(
+                    Product.objects.prefetch_related('shopped_from').order_by('id')[:rows],
+                    many=True, context=context).data,
+                lambda: self.serialize_values(ProductValuesSerializer(context), Product.objects.order_by('id')[:rows]),
+            ),
+            'recipes': (
+                lambda: SimpleRecipeSerializer(
+                    Recipe.objects.select_related('created_by__user').defer('search_vector').order_by('id')[:rows],
+                    many=True, context=context).data,
+                lambda: self.serialize_values(SimpleRecipeValuesSerializer(context),
+                                              Recipe.objects.order_by('id')[:rows]),
+            ),
+            'collection_detail': (
+                lambda: RecipesCollectionDetailSerializer(
+                    RecipesCollection.objects.prefetch_related(
+                        Prefetch('recipes', queryset=Recipe.objects.select_related('created_by__user')))
+                    .get(pk=collection), context=context).data,
+                lambda: self.serialize_values(RecipesCollectionDetailValuesSerializer(context),
+                                              RecipesCollection.objects.filter(pk=collection))[0],
+            ),
+        }
+
+        overrides = {}
+        if options['no_url_cache']:
+            overrides['MEDIA_URLS'] = {**settings.MEDIA_URLS, 'CACHE_SIZE': 0, 'PUBLIC_STORAGES': ()}
+
+        self.stdout.write(f"{'case':<20}{'serializer ms':>15}{'values ms':>12}{'speedup':>10}")
+        with override_settings(**overrides):
+            for name, (serializer, values) in cases.items():
+                before, after = self.cpu_time(serializer, repeat), self.cpu_time(values, repeat)
+                self.stdout.write(f"{name:<20}{before:>15.2f}{after:>12.2f}{before / after:>9.1f}x")
+
+    @staticmethod
+    def serialize_values(serializer, queryset):
+        return serializer.serialize_many(queryset.values(*serializer.lookups))
+
+    @staticmethod
+    def cpu_time(function, repeat):
+        function()
+        timings = []
+        for _ in range(repeat):
+            start = time.process_time()
+            function()
+            timings.append((time.process_time() - start) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,182 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from ManjaBook.inventory.abstract_classes import NUTRIENT_FIELDS
+from ManjaBook.inventory.models import RecipeProduct
+
+
+def format_nutrient(field, value):
+    # In units, as the API shows them, rather than the stored thousandths.
+    return str(value) if value is None else RecipeProduct._meta.get_field(field).format_units(value)
+
+
+def rebuild_partition(start, end, batch_size, dry_run, diff_limit):
+    """
+    Rebuild the nutrients of the recipe products with `start <= id < end`, in batches of `batch_size`
+    ids each committed on its own. Returns `(rows, changed, diffs, overflowing)`; with `dry_run` nothing is
+    written and `diffs` lists up to `diff_limit` of the changes that would be made. `overflowing` are the ids
+    of the recipe products left unchanged because their calculated nutrients do not fit the columns.
+    """
+    rows, changed, diffs, overflowing = 0, 0, [], []
+    for batch_start in range(start, end, batch_size):
+        batch = RecipeProduct.objects.filter(id__gte=batch_start, id__lt=min(batch_start + batch_size, end))
+        rows += batch.count()
+
+        if not dry_run:
+            updated, batch_overflowing = batch.refresh_nutrients()
+            changed += updated
+            overflowing += batch_overflowing
+            continue
+
+        overflowing += batch.with_overflowing_nutrients().order_by('id').values_list('id', flat=True)
+
+        stale = batch.with_stale_nutrients().values('id', *NUTRIENT_FIELDS,
+                                                    *(f'new_{field}' for field in NUTRIENT_FIELDS))
+        for row in stale.order_by('id'):
+            changed += 1
+            if len(diffs) < diff_limit:
+                diffs.append((row['id'], {field: (format_nutrient(field, row[field]),
+                                                  format_nutrient(field, row[f'new_{field}']))
+                                          for field in NUTRIENT_FIELDS if row[field] != row[f'new_{field}']}))
+    return rows, changed, diffs, overflowing
+
+
+class Command(BaseCommand):
+    help = ("Recalculate the stored nutrients of every recipe product from its product and unit, and the totals "
+            "of the recipes that change, e.g. after a unit conversion rate was corrected. Id ranges are rebuilt "
+            "in parallel processes with set-based UPDATEs, and finished ranges are recorded in a checkpoint file "
+            "so an interrupted rebuild can be resumed where it stopped with --resume.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report the recipe products whose nutrients would change, without writing.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="Number of processes rebuilding id ranges at once.")
+        parser.add_argument('--partition-size', type=int, default=100_000,
+                            help="Number of ids per range handed to a worker and checkpointed.")
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Number of ids updated per transaction.")
+        parser.add_argument('--checkpoint',
+                            default=os.path.join(tempfile.gettempdir(), 'rebuild_nutrients.checkpoint.json'),
+                            help="File recording the finished ranges, in the temporary directory by default.")
+        checkpoint_mode = parser.add_mutually_exclusive_group()
+        checkpoint_mode.add_argument('--resume', action='store_true',
+                                     help="Continue the interrupted rebuild recorded in the checkpoint file.")
+        checkpoint_mode.add_argument('--restart', action='store_true',
+                                     help="Ignore the checkpoint file and rebuild every range.")
+        parser.add_argument('--diff-limit', type=int, default=50,
+                            help="Number of changes printed with --dry-run.")
+
+    def handle(self, *args, **options):
+        bounds = RecipeProduct.objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            self.stdout.write("No recipe products to rebuild.")
+            return
+
+        # Ranges are aligned on multiples of the partition size, so a checkpoint stays valid when rows are deleted.
+        partition_size = options['partition_size']
+        partitions = [(start, start + partition_size)
+                      for start in range(bounds['first'] // partition_size * partition_size, bounds['last'] + 1,
+                                         partition_size)]
+
+        # Dry runs neither read nor write the checkpoint: they describe a full rebuild.
+        checkpoint = None if options['dry_run'] else options['checkpoint']
+        run = {'partition_size': partition_size, 'last_id': bounds['last'],
+               'started_at': timezone.now().isoformat(), 'done': []}
+        run = self.load_checkpoint(checkpoint, run, options['resume'], options['restart'])
+        done = set(run['done'])
+        pending = [partition for partition in partitions if partition[0] not in done]
+        if len(pending) < len(partitions):
+            self.stdout.write(f"Resuming the rebuild started at {run['started_at']} from {checkpoint}: "
+                              f"{len(partitions) - len(pending)} of {len(partitions)} ranges already rebuilt.")
+
+        started = time.monotonic()
+        totals = {'rows': 0, 'changed': 0}
+        overflowing = []
+        for (start, end), (rows, changed, diffs, partition_overflowing) in self.run_partitions(pending, options):
+            totals['rows'] += rows
+            totals['changed'] += changed
+            overflowing += partition_overflowing
+            done.add(start)
+            self.save_checkpoint(checkpoint, {**run, 'done': sorted(done)})
+
+            for recipe_product_id, fields in diffs:
+                changes = ', '.join(f'{field} {old} -> {new}' for field, (old, new) in fields.items())
+                self.stdout.write(f"  recipe product {recipe_product_id}: {changes}")
+
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"ids {start}-{end - 1}: {changed} of {rows} rows "
+                              f"{'to change' if options['dry_run'] else 'changed'} "
+                              f"({len(done)}/{len(partitions)} ranges, {totals['rows'] / elapsed:.0f} rows/s)")
+
+        elapsed = time.monotonic() - started
+        verb = 'would change' if options['dry_run'] else 'changed'
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {totals['rows']} recipe products in {elapsed:.1f}s "
+            f"({totals['rows'] / elapsed if elapsed else 0:.0f} rows/s), {verb} {totals['changed']}."))
+        if overflowing:
+            self.stderr.write(self.style.WARNING(
+                f"Left {len(overflowing)} recipe products unchanged, their calculated nutrients overflow the "
+                f"columns: {', '.join(map(str, sorted(overflowing)))}"))
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+    def run_partitions(self, partitions, options):
+        arguments = (options['batch_size'], options['dry_run'], options['diff_limit'])
+        if options['workers'] <= 1 or len(partitions) <= 1:
+            for start, end in partitions:
+                yield (start, end), rebuild_partition(start, end, *arguments)
+            return
+
+        # Forked workers must open their own connections instead of sharing the parent's sockets.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'],
+                                 mp_context=multiprocessing.get_context('fork')) as executor:
+            futures = {executor.submit(rebuild_partition, start, end, *arguments): (start, end)
+                       for start, end in partitions}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    @staticmethod
+    def load_checkpoint(path, run, resume, restart):
+        """
+        Return the state of the run to continue: the one recorded in the checkpoint with `resume`, else `run`.
+
+        A checkpoint left by an interrupted rebuild is only continued on request, since ranges it marks as
+        done may have changed since, e.g. another conversion rate was corrected in the meantime.
+        """
+        if not path or restart or not os.path.exists(path):
+            return run
+
+        with open(path) as checkpoint:
+            state = json.load(checkpoint)
+        if 'started_at' not in state or 'last_id' not in state:
+            raise CommandError(f"{path} was written by an older version of this command; use --restart.")
+        if not resume:
+            raise CommandError(f"{path} records a rebuild started at {state['started_at']} over the ids up to "
+                               f"{state['last_id']}; use --resume to continue it or --restart to start over.")
+        if state['partition_size'] != run['partition_size']:
+            raise CommandError(f"{path} was written with --partition-size {state['partition_size']}; "
+                               f"use the same size or --restart.")
+        # Ranges added since the interrupted run started are rebuilt too.
+        return {**state, 'last_id': run['last_id']}
+
+    @staticmethod
+    def save_checkpoint(path, state):
+        if not path:
+            return
+
+        # Written aside and renamed, so an interruption never leaves a truncated checkpoint.
+        with open(f'{path}.tmp', 'w') as checkpoint:
+            json.dump(state, checkpoint)
+        os.replace(f'{path}.tmp', path)
@@ -0,0 +1,211 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import slugify
+
+from ManjaBook.accounts.models import AccountUser, Profile
+from ManjaBook.fixed_point import FixedPointField
+from ManjaBook.inventory.abstract_classes import NUTRIENT_FIELDS
+from ManjaBook.inventory.choices import NutritionPerChoices
+from ManjaBook.inventory.models import Shop, Product, Unit, Recipe, RecipeProduct, RecipesCollection, \
+    SavedRecipesCollection
+
+FOODS = ('Chicken', 'Beef', 'Pork', 'Salmon', 'Tuna', 'Shrimp', 'Tofu', 'Egg', 'Rice', 'Pasta', 'Oats', 'Quinoa',
+         'Potato', 'Tomato', 'Onion', 'Garlic', 'Carrot', 'Pepper', 'Spinach', 'Broccoli', 'Mushroom', 'Lentils',
+         'Chickpeas', 'Beans', 'Cheese', 'Yogurt', 'Milk', 'Butter', 'Olive oil', 'Flour', 'Sugar', 'Honey',
+         'Apple', 'Banana', 'Lemon', 'Avocado', 'Almonds', 'Walnuts', 'Bread', 'Cream')
+STYLES = ('Classic', 'Spicy', 'Smoked', 'Roasted', 'Creamy', 'Crispy', 'Grilled', 'Baked', 'Fresh', 'Sweet',
+          'Hearty', 'Zesty', 'Garlicky', 'Rustic', 'Quick')
+DISHES = ('curry', 'stew', 'salad', 'soup', 'bowl', 'pie', 'risotto', 'stir fry', 'wrap', 'casserole', 'tacos',
+          'burger', 'omelette', 'pancakes', 'skewers', 'lasagna', 'noodles', 'smoothie')
+BRANDS = ('Basic', 'Farm Fresh', 'Green Valley', 'Golden Field', 'Nature Best', 'Daily', 'Organic Co', 'Harvest')
+
+DEFAULT_UNITS = (
+    ('Gram', 'g', NutritionPerChoices.GRAMS, Decimal('1.000'), False),
+    ('Milliliter', 'ml', NutritionPerChoices.MILLITERS, Decimal('1.000'), False),
+    ('Tablespoon', 'tbsp', NutritionPerChoices.GRAMS, Decimal('15.000'), True),
+    ('Cup', 'cup', NutritionPerChoices.GRAMS, Decimal('240.000'), True),
+    ('Piece', 'pc', NutritionPerChoices.GRAMS, Decimal('100.000'), True),
+)
+
+
+class Command(BaseCommand):
+    help = ("Generate a production-shaped data set with bulk inserts, for benchmarking. "
+            "The same --seed always produces the same data, so runs are comparable across commits.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--shops', type=int, default=50)
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--recipes', type=int, default=200_000)
+        parser.add_argument('--min-recipe-products', type=int, default=5)
+        parser.add_argument('--max-recipe-products', type=int, default=30)
+        parser.add_argument('--collections-per-user', type=int, default=5)
+        parser.add_argument('--saves-per-user', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of recipes (with their products) inserted per transaction.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='seed',
+                            help="Prefix of the generated usernames and emails.")
+
+    def handle(self, *args, **options):
+        if AccountUser.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(f"Users prefixed with '{options['prefix']}' already exist; "
+                               f"seed into an empty database or pass another --prefix.")
+
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+
+        profiles = self.seed_users(options['users'], options['prefix'])
+        shops = self.seed_shops(options['shops'])
+        products = self.seed_products(options['products'], shops)
+        units = self.seed_units()
+        recipe_ids = self.seed_recipes(options['recipes'], profiles, products, units,
+                                       options['min_recipe_products'], options['max_recipe_products'])
+        self.seed_collections(profiles, recipe_ids, options['collections_per_user'], options['saves_per_user'])
+
+        self.stdout.write(self.style.SUCCESS("Seeding finished."))
+
+    def seed_users(self, count, prefix):
+        password = make_password(f'{prefix}-password')
+        users = AccountUser.objects.bulk_create(
+            (AccountUser(email=f'{prefix}{i}@manjabook.test', username=f'{prefix}{i}', password=password)
+             for i in range(count)),
+            batch_size=self.batch_size)
+        # bulk_create skips the post_save signal that creates the profiles.
+        profiles = Profile.objects.bulk_create((Profile(user=user) for user in users), batch_size=self.batch_size)
+
+        self.stdout.write(f"Created {len(users)} users.")
+        return profiles
+
+    def seed_shops(self, count):
+        shops = Shop.objects.bulk_create(Shop(name=f'Shop {i}') for i in range(count))
+        self.stdout.write(f"Created {len(shops)} shops.")
+        return shops
+
+    def seed_products(self, count, shops):
+        products = Product.objects.bulk_create(
+            (self.build_product(i) for i in range(count)), batch_size=self.batch_size)
+
+        through_model = Product.shopped_from.through
+        through_model.objects.bulk_create(
+            (through_model(product_id=product.id, shop_id=shop.id)
+             for product in products
+             for shop in self.random.sample(shops, self.random.randint(0, min(3, len(shops))))),
+            batch_size=self.batch_size * 5)
+
+        self.stdout.write(f"Created {len(products)} products.")
+        return products
+
+    def build_product(self, number):
+        rand = self.random
+        protein, carbohydrates, fats = (Decimal(rand.randint(0, 4000)) / 100 for _ in range(3))
+        product = Product(
+            name=f'{rand.choice(FOODS)} {number}',
+            brand=rand.choice(BRANDS),
+            nutrition_per=rand.choice(NutritionPerChoices.values),
+            calories=int(protein * 4 + carbohydrates * 4 + fats * 9),
+            protein=protein,
+            carbohydrates=carbohydrates,
+            sugars=(carbohydrates * Decimal(rand.randint(0, 100)) / 100).quantize(Decimal('0.01')),
+            fats=fats,
+            saturated_fats=(fats * Decimal(rand.randint(0, 60)) / 100).quantize(Decimal('0.01')),
+            salt=Decimal(rand.randint(0, 3000)) / 1000,
+            fibre=Decimal(rand.randint(0, 1500)) / 100,
+        )
+        # Drawn in units, like the API takes them, and stored in thousandths.
+        for field in NUTRIENT_FIELDS:
+            model_field = Product._meta.get_field(field)
+            if isinstance(model_field, FixedPointField):
+                setattr(product, field, model_field.to_stored(getattr(product, field)))
+        return product
+
+    def seed_units(self):
+        units = list(Unit.objects.filter(convert_to_base_rate__lte=250))
+        if not units:
+            units = Unit.objects.bulk_create(
+                Unit(name=name, abbreviation=abbreviation, base_unit=base_unit,
+                     convert_to_base_rate=rate, is_customizable=is_customizable)
+                for name, abbreviation, base_unit, rate, is_customizable in DEFAULT_UNITS)
+            self.stdout.write(f"Created {len(units)} units.")
+        return units
+
+    def seed_recipes(self, count, profiles, products, units, min_recipe_products, max_recipe_products):
+        rand = self.random
+        recipe_ids = []
+
+        for start in range(0, count, self.batch_size):
+            with transaction.atomic():
+                recipes = []
+                for number in range(start, min(start + self.batch_size, count)):
+                    name = f'{rand.choice(STYLES)} {rand.choice(FOODS).lower()} {rand.choice(DISHES)} {number}'
+                    recipes.append(Recipe(
+                        name=name,
+                        slug=slugify(name),
+                        quick_description=f'A {rand.choice(STYLES).lower()} {rand.choice(DISHES)} '
+                                          f'for {rand.randint(1, 8)}.',
+                        preparation=' '.join(f'Add the {rand.choice(FOODS).lower()} and '
+                                             f'cook for {rand.randint(1, 30)} minutes.'
+                                             for _ in range(rand.randint(2, 8))),
+                        portions=rand.randint(1, 8),
+                        time_to_prepare=rand.randint(0, 60),
+                        time_to_cook=rand.randint(0, 180),
+                        created_by=rand.choice(profiles),
+                    ))
+                recipes = Recipe.objects.bulk_create(recipes)
+
+                recipe_products = []
+                for recipe in recipes:
+                    for product in rand.sample(products, rand.randint(min_recipe_products, max_recipe_products)):
+                        recipe_product = self.build_recipe_product(recipe, product, rand.choice(units))
+                        if recipe_product is not None:
+                            recipe_products.append(recipe_product)
+                RecipeProduct.objects.bulk_create(recipe_products)
+
+                batch_ids = [recipe.id for recipe in recipes]
+                Recipe.objects.filter(id__in=batch_ids).refresh_recipe_products_fields()
+                recipe_ids.extend(batch_ids)
+
+            self.stdout.write(f"Created {len(recipe_ids)}/{count} recipes.")
+
+        return recipe_ids
+
+    def build_recipe_product(self, recipe, product, unit):
+        max_quantity = max(1, int(500 / unit.convert_to_base_rate))
+        quantity = Decimal(self.random.randint(1, max_quantity * 4)) / 4
+        recipe_product = RecipeProduct(recipe=recipe, product=product, unit=unit, quantity=quantity)
+        recipe_product.calculate_nutrients()
+        return None if recipe_product.exceeds_column_limits() else recipe_product
+
+    def seed_collections(self, profiles, recipe_ids, collections_per_user, saves_per_user):
+        rand = self.random
+        if not recipe_ids:
+            return
+
+        collections = RecipesCollection.objects.bulk_create(
+            (RecipesCollection(name=f'{rand.choice(STYLES)} favourites {i}', is_private=rand.random() < 0.2,
+                               created_by=profile)
+             for profile in profiles for i in range(collections_per_user)),
+            batch_size=self.batch_size)
+
+        through_model = RecipesCollection.recipes.through
+        through_model.objects.bulk_create(
+            (through_model(recipescollection_id=collection.id, recipe_id=recipe_id)
+             for collection in collections
+             for recipe_id in rand.sample(recipe_ids, min(len(recipe_ids), rand.randint(3, 25)))),
+            batch_size=self.batch_size * 5)
+
+        # Owners save their own collections on creation (see the auto_save_collection signal).
+        saved = [SavedRecipesCollection(user_id=collection.created_by_id, recipes_collection=collection)
+                 for collection in collections]
+        public_collections = [collection for collection in collections if not collection.is_private]
+        for profile in profiles:
+            for collection in rand.sample(public_collections, min(saves_per_user, len(public_collections))):
+                if collection.created_by_id != profile.pk:
+                    saved.append(SavedRecipesCollection(user=profile, recipes_collection=collection))
+        SavedRecipesCollection.objects.bulk_create(saved, batch_size=self.batch_size)
+
+        self.stdout.write(f"Created {len(collections)} collections and {len(saved)} saved collections.")
@@ -0,0 +1,186 @@
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import connections, models, transaction
+from django.db.models import BooleanField, Case, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Abs, Coalesce, Now, Round
+from django.db.models.lookups import GreaterThan
+
+from ManjaBook.fixed_point import FixedPointField
+from ManjaBook.inventory.abstract_classes import NUTRIENT_FIELDS
+
+logger = logging.getLogger('ManjaBook.nutrients')
+
+
+class RecipeQuerySet(models.QuerySet):
+    def _recipe_products(self):
+        recipe_product_model = self.model._meta.get_field('recipe_products').related_model
+        return recipe_product_model.objects.filter(recipe=OuterRef('pk')).order_by().values('recipe')
+
+    def _recipe_products_total(self, field):
+        totals = self._recipe_products().annotate(total=Sum(field)).values('total')
+        return Coalesce(Subquery(totals), Value(0))
+
+    def _total_nutrients_expressions(self):
+        return {field: self._recipe_products_total(field) for field in NUTRIENT_FIELDS}
+
+    def _search_vector_expression(self):
+        config = settings.RECIPE_SEARCH_CONFIG
+        product_names = self._recipe_products().annotate(names=StringAgg('product__name', ' ')).values('names')
+
+        return (SearchVector('name', weight='A', config=config) +
+                SearchVector('quick_description', weight='B', config=config) +
+                SearchVector(Subquery(product_names), weight='B', config=config) +
+                SearchVector('preparation', weight='C', config=config))
+
+    def with_products(self):
+        # Units are embedded from the unit registry, not loaded with the recipe.
+        return (self.select_related('created_by__user')
+                .prefetch_related('recipe_products__product__shopped_from'))
+
+    def refresh_total_nutrients(self, mark_edited=False):
+        """
+        Recalculate the stored nutrient totals of the recipes in a single UPDATE statement.
+        With `mark_edited`, their last edit time moves too, so conditional GETs see the change.
+        """
+        if mark_edited:
+            return self.update(last_edit_at=Now(), **self._total_nutrients_expressions())
+        return self.update(**self._total_nutrients_expressions())
+
+    def refresh_search_vector(self):
+        """
+        Rebuild the full-text search document of the recipes from their texts and product names.
+        """
+        return self.update(search_vector=self._search_vector_expression())
+
+    def refresh_recipe_products_fields(self):
+        """
+        Refresh everything derived from the recipe products (nutrient totals and search document) at once.
+        Marks the recipes as edited too, since this runs on every recipe product change.
+        """
+        return self.update(last_edit_at=Now(),
+                           search_vector=self._search_vector_expression(),
+                           **self._total_nutrients_expressions())
+
+    def with_stale_total_nutrients(self):
+        """
+        Return only the recipes whose stored nutrient totals differ from the sum of their products.
+        """
+        expected = {f'expected_{field}': self._recipe_products_total(field) for field in NUTRIENT_FIELDS}
+        stale = models.Q()
+        for field in NUTRIENT_FIELDS:
+            stale |= ~models.Q(**{field: models.F(f'expected_{field}')})
+
+        return self.annotate(**expected).filter(stale)
+
+
+class RecipeProductQuerySet(models.QuerySet):
+    def _nutrient_limit(self, field):
+        # The largest value the column holds; RecipeProduct.exceeds_column_limits rejects larger ones on input.
+        model_field = self.model._meta.get_field(field)
+        return (Decimal(10) ** (model_field.max_digits - model_field.decimal_places) -
+                Decimal(1).scaleb(-model_field.decimal_places))
+
+    def _calculated_nutrients(self):
+        """
+        The nutrients RecipeProduct.calculate_nutrients() would store, as `new_<field>` columns, and
+        `nutrients_overflow`, true when one of them does not fit its column.
+        """
+        base_quantity = Round(Coalesce(F('custom_unit__custom_convert_to_base_rate'), F('unit__convert_to_base_rate')) *
+                              F('quantity') / Value(Decimal(100)), 2)
+        overflow = Q()
+        for field in NUTRIENT_FIELDS:
+            overflow |= self._nutrient_overflow(field)
+
+        return (self.order_by()
+                .annotate(base_quantity=base_quantity)
+                .annotate(nutrients_overflow=ExpressionWrapper(overflow, output_field=BooleanField()),
+                          **{f'new_{field}': self._calculated_nutrient(field) for field in NUTRIENT_FIELDS})
+                .values('id', 'nutrients_overflow', *(f'new_{field}' for field in NUTRIENT_FIELDS)))
+
+    def _nutrient_units(self, field):
+        # Calculated in units (e.g. grams) like calculate_nutrients().
+        product_field = self.model._meta.get_field('product').related_model._meta.get_field(field)
+        product_value = F(f'product__{field}')
+        if isinstance(product_field, FixedPointField):
+            product_value = product_field.units_expression(product_value)
+        return Round(F('base_quantity') * product_value, 2)
+
+    def _nutrient_overflow(self, field):
+        return Q(GreaterThan(Abs(self._nutrient_units(field)), Value(self._nutrient_limit(field))))
+
+    def _calculated_nutrient(self, field):
+        # Converted to the stored thousandths, or NULL when too large for the column (the cast would fail).
+        model_field = self.model._meta.get_field(field)
+        return Case(When(self._nutrient_overflow(field), then=Value(None)),
+                    default=model_field.stored_expression(self._nutrient_units(field)),
+                    output_field=model_field)
+
+    def with_stale_nutrients(self):
+        """
+        Return only the recipe products whose stored nutrients differ from the ones calculated from
+        their product and unit, annotated with the calculated ones as `new_<field>`.
+
+        Recipe products whose calculated nutrients overflow are left out, since they are never written
+        (see with_overflowing_nutrients()).
+        """
+        stale = models.Q()
+        for field in NUTRIENT_FIELDS:
+            stale |= ~models.Q(**{field: F(f'new_{field}')})
+
+        return self._calculated_nutrients().filter(stale, nutrients_overflow=False)
+
+    def with_overflowing_nutrients(self):
+        """
+        Return only the recipe products whose calculated nutrients are too large for their columns, e.g. after
+        a product's nutrients were raised, which the API rejects for new rows (exceeds_column_limits()).
+        """
+        return self._calculated_nutrients().filter(nutrients_overflow=True)
+
+    def refresh_nutrients(self):
+        """
+        Recalculate the stored nutrients of the recipe products from their product and unit in a single
+        UPDATE ... FROM statement, writing only the rows that change, then the totals of their recipes.
+
+        Recipe products whose calculated nutrients overflow their columns keep their stored ones and are
+        logged with a warning instead of being written with capped values.
+        Returns the number of recipe products updated and the ids of the overflowing ones.
+        """
+        connection = connections[self.db]
+        quote_name = connection.ops.quote_name
+        table = quote_name(self.model._meta.db_table)
+        source_sql, params = self._calculated_nutrients().query.sql_with_params()
+        columns = [(quote_name(self.model._meta.get_field(field).column), quote_name(f'new_{field}'))
+                   for field in NUTRIENT_FIELDS]
+        overflow = quote_name('nutrients_overflow')
+
+        # One statement reading the source once: the updated rows' recipes, then the overflowing rows.
+        sql = (f'WITH source AS ({source_sql}), updated AS ('
+               f'UPDATE {table} SET {", ".join(f"{column} = source.{new}" for column, new in columns)} '
+               f'FROM source '
+               f'WHERE {table}.{quote_name("id")} = source.{quote_name("id")} AND NOT source.{overflow} '
+               f'AND ({" OR ".join(f"{table}.{column} IS DISTINCT FROM source.{new}" for column, new in columns)}) '
+               f'RETURNING {table}.{quote_name("recipe_id")}) '
+               f'SELECT {quote_name("recipe_id")}, NULL FROM updated '
+               f'UNION ALL SELECT NULL, {quote_name("id")} FROM source WHERE source.{overflow}')
+
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            recipe_ids = [recipe_id for recipe_id, _ in rows if recipe_id is not None]
+            overflowing_ids = sorted(row_id for _, row_id in rows if row_id is not None)
+            if recipe_ids:
+                recipe_model = self.model._meta.get_field('recipe').related_model
+                recipes = recipe_model.objects.using(self.db).filter(id__in=set(recipe_ids))
+                # Locked in id order first: concurrent refreshes sharing recipes (rebuild workers, propagation
+                # jobs) would otherwise lock them in the order of their plans and could deadlock.
+                list(recipes.order_by('id').select_for_update().values_list('id', flat=True))
+                recipes.refresh_total_nutrients(mark_edited=True)
+
+        if overflowing_ids:
+            logger.warning("Left the nutrients of %d recipe products unchanged, the calculated ones overflow "
+                           "their columns: %s", len(overflowing_ids), ', '.join(map(str, overflowing_ids)))
+        return len(recipe_ids), overflowing_ids
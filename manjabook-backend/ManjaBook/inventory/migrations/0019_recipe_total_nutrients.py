@@ -0,0 +1,74 @@
+# Generated by Django 5.1.8 on 2026-10-18 13:05
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_recipe_total_nutrients(apps, schema_editor):
+    Recipe = apps.get_model('inventory', 'Recipe')
+    RecipeProduct = apps.get_model('inventory', 'RecipeProduct')
+
+    def total(field):
+        totals = (RecipeProduct.objects
+                  .filter(recipe=OuterRef('pk'))
+                  .order_by()
+                  .values('recipe')
+                  .annotate(total=Sum(field))
+                  .values('total'))
+        return Coalesce(Subquery(totals), Value(Decimal(0)))
+
+    Recipe.objects.update(**{field: total(field) for field in ('calories', 'protein', 'carbohydrates', 'sugars',
+                                                               'fats', 'saturated_fats', 'salt', 'fibre')})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0018_alter_customunit_custom_convert_to_base_rate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='calories',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='carbohydrates',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fats',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fibre',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='protein',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='salt',
+            field=models.DecimalField(decimal_places=3, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='saturated_fats',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='sugars',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.RunPython(backfill_recipe_total_nutrients, migrations.RunPython.noop),
+    ]
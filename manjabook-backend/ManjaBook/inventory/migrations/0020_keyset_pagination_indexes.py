@@ -0,0 +1,26 @@
+# Generated by Django 5.1.8 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_squashed_0002_profile'),
+        ('inventory', '0019_recipe_total_nutrients'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['created_at', 'id'], name='recipe_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescollection',
+            index=models.Index(fields=['created_at', 'id'], name='collection_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savedrecipescollection',
+            index=models.Index(fields=['saved_at', 'id'], name='saved_collection_saved_id_idx'),
+        ),
+    ]
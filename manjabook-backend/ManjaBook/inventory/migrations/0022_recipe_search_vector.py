@@ -0,0 +1,48 @@
+# Generated by Django 5.1.8 on 2026-10-18 13:09
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_recipe_search_vector(apps, schema_editor):
+    Recipe = apps.get_model('inventory', 'Recipe')
+    RecipeProduct = apps.get_model('inventory', 'RecipeProduct')
+
+    config = settings.RECIPE_SEARCH_CONFIG
+    product_names = (RecipeProduct.objects
+                     .filter(recipe=OuterRef('pk'))
+                     .order_by()
+                     .values('recipe')
+                     .annotate(names=StringAgg('product__name', ' '))
+                     .values('names'))
+
+    Recipe.objects.update(search_vector=(SearchVector('name', weight='A', config=config) +
+                                         SearchVector('quick_description', weight='B', config=config) +
+                                         SearchVector(Subquery(product_names), weight='B', config=config) +
+                                         SearchVector('preparation', weight='C', config=config)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_squashed_0002_profile'),
+        ('inventory', '0021_product_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+        migrations.RunPython(backfill_recipe_search_vector, migrations.RunPython.noop),
+    ]
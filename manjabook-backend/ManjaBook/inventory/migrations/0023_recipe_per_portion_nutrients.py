@@ -0,0 +1,77 @@
+# Generated by Django 5.1.8 on 2026-10-18 13:10
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_squashed_0002_profile'),
+        ('inventory', '0022_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='calories_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('calories'), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 2), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='carbohydrates_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('carbohydrates'), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 2), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fats_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('fats'), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 2), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fibre_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('fibre'), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 2), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='protein_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('protein'), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 2), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='salt_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('salt'), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 3), output_field=models.DecimalField(decimal_places=3, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='saturated_fats_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('saturated_fats'), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 2), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='sugars_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('sugars'), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 2), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['time_to_cook', 'calories_per_portion'], name='recipe_time_calories_pp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['time_to_cook', 'protein_per_portion'], name='recipe_time_protein_pp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['calories_per_portion', 'protein_per_portion'], name='recipe_calories_protein_pp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['protein_per_portion', 'calories_per_portion'], name='recipe_protein_calories_pp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['calories', 'protein'], name='recipe_calories_protein_idx'),
+        ),
+    ]
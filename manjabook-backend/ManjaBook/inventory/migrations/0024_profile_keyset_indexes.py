@@ -0,0 +1,22 @@
+# Generated by Django 5.1.8 on 2026-10-18 13:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_squashed_0002_profile'),
+        ('inventory', '0023_recipe_per_portion_nutrients'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['created_by', 'created_at', 'id'], name='recipe_creator_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescollection',
+            index=models.Index(fields=['created_by', 'created_at', 'id'], name='collection_creator_created_idx'),
+        ),
+    ]
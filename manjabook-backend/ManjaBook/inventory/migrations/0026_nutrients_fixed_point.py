@@ -0,0 +1,267 @@
+# Generated by Django 5.1.8 on 2026-10-18 14:37
+
+import ManjaBook.fixed_point
+import django.core.validators
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+from decimal import Decimal
+from django.db import migrations, models
+
+
+# The nutrient columns are rescaled in place to integer thousandths of their unit (milligrams, millikilocalories;
+# see ManjaBook.fixed_point.FixedPointField), with one ALTER TABLE per table so each is rewritten once.
+NUTRIENT_COLUMNS = {
+    'inventory_product': {'protein': (5, 2), 'carbohydrates': (5, 2), 'sugars': (5, 2), 'fats': (5, 2),
+                          'saturated_fats': (5, 2), 'salt': (5, 3), 'fibre': (4, 2)},
+    'inventory_recipeproduct': {'calories': (6, 2), 'protein': (6, 2), 'carbohydrates': (6, 2), 'sugars': (6, 2),
+                                'fats': (6, 2), 'saturated_fats': (6, 2), 'salt': (6, 3), 'fibre': (6, 2)},
+    'inventory_recipe': {'calories': (10, 2), 'protein': (10, 2), 'carbohydrates': (10, 2), 'sugars': (10, 2),
+                         'fats': (10, 2), 'saturated_fats': (10, 2), 'salt': (10, 3), 'fibre': (10, 2)},
+}
+
+
+def rescale_nutrient_columns(table, columns):
+    integer_type = 'bigint' if table == 'inventory_recipe' else 'integer'
+    to_integer = ', '.join(f'ALTER COLUMN "{column}" TYPE {integer_type} USING round("{column}" * 1000)'
+                           for column in columns)
+    to_numeric = ', '.join(f'ALTER COLUMN "{column}" TYPE numeric({max_digits}, {decimal_places}) '
+                           f'USING "{column}" / 1000.0'
+                           for column, (max_digits, decimal_places) in columns.items())
+    return migrations.RunSQL(f'ALTER TABLE "{table}" {to_integer}', f'ALTER TABLE "{table}" {to_numeric}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0025_image_variants'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_time_calories_pp_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_time_protein_pp_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_calories_protein_pp_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_protein_calories_pp_idx',
+        ),
+        migrations.RemoveField(
+            model_name='recipe',
+            name='calories_per_portion',
+        ),
+        migrations.RemoveField(
+            model_name='recipe',
+            name='carbohydrates_per_portion',
+        ),
+        migrations.RemoveField(
+            model_name='recipe',
+            name='fats_per_portion',
+        ),
+        migrations.RemoveField(
+            model_name='recipe',
+            name='fibre_per_portion',
+        ),
+        migrations.RemoveField(
+            model_name='recipe',
+            name='protein_per_portion',
+        ),
+        migrations.RemoveField(
+            model_name='recipe',
+            name='salt_per_portion',
+        ),
+        migrations.RemoveField(
+            model_name='recipe',
+            name='saturated_fats_per_portion',
+        ),
+        migrations.RemoveField(
+            model_name='recipe',
+            name='sugars_per_portion',
+        ),
+        # Per-portion columns are generated from the totals, which cannot change type under them.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[rescale_nutrient_columns(table, columns)
+                                 for table, columns in NUTRIENT_COLUMNS.items()],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='product',
+                    name='carbohydrates',
+                    field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, default=0, max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(250)]),
+                ),
+                migrations.AlterField(
+                    model_name='product',
+                    name='fats',
+                    field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, default=0, max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(111.11)]),
+                ),
+                migrations.AlterField(
+                    model_name='product',
+                    name='fibre',
+                    field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, default=0, max_digits=4, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(50)]),
+                ),
+                migrations.AlterField(
+                    model_name='product',
+                    name='protein',
+                    field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, default=0, max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(250)]),
+                ),
+                migrations.AlterField(
+                    model_name='product',
+                    name='salt',
+                    field=ManjaBook.fixed_point.FixedPointField(decimal_places=3, default=0, max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)]),
+                ),
+                migrations.AlterField(
+                    model_name='product',
+                    name='saturated_fats',
+                    field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, default=0, max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(111.11)]),
+                ),
+                migrations.AlterField(
+                    model_name='product',
+                    name='sugars',
+                    field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, default=0, max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(250)]),
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='calories',
+                    field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, default=0, editable=False, max_digits=10),
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='carbohydrates',
+                    field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, default=0, editable=False, max_digits=10),
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='fats',
+                    field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, default=0, editable=False, max_digits=10),
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='fibre',
+                    field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, default=0, editable=False, max_digits=10),
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='protein',
+                    field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, default=0, editable=False, max_digits=10),
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='salt',
+                    field=ManjaBook.fixed_point.FixedPointField(decimal_places=3, default=0, editable=False, max_digits=10),
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='saturated_fats',
+                    field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, default=0, editable=False, max_digits=10),
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='sugars',
+                    field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, default=0, editable=False, max_digits=10),
+                ),
+                migrations.AlterField(
+                    model_name='recipeproduct',
+                    name='calories',
+                    field=ManjaBook.fixed_point.FixedPointField(blank=True, decimal_places=2, editable=False, max_digits=6, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='recipeproduct',
+                    name='carbohydrates',
+                    field=ManjaBook.fixed_point.FixedPointField(blank=True, decimal_places=2, editable=False, max_digits=6, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='recipeproduct',
+                    name='fats',
+                    field=ManjaBook.fixed_point.FixedPointField(blank=True, decimal_places=2, editable=False, max_digits=6, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='recipeproduct',
+                    name='fibre',
+                    field=ManjaBook.fixed_point.FixedPointField(blank=True, decimal_places=2, editable=False, max_digits=6, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='recipeproduct',
+                    name='protein',
+                    field=ManjaBook.fixed_point.FixedPointField(blank=True, decimal_places=2, editable=False, max_digits=6, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='recipeproduct',
+                    name='salt',
+                    field=ManjaBook.fixed_point.FixedPointField(blank=True, decimal_places=3, editable=False, max_digits=6, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='recipeproduct',
+                    name='saturated_fats',
+                    field=ManjaBook.fixed_point.FixedPointField(blank=True, decimal_places=2, editable=False, max_digits=6, null=True),
+                ),
+                migrations.AlterField(
+                    model_name='recipeproduct',
+                    name='sugars',
+                    field=ManjaBook.fixed_point.FixedPointField(blank=True, decimal_places=2, editable=False, max_digits=6, null=True),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='calories_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('calories'), '*', models.Value(Decimal('0.001'))), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 2), '*', models.Value(Decimal('1000'))), ManjaBook.fixed_point.FixedPointField(decimal_places=2, max_digits=10)), output_field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='carbohydrates_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('carbohydrates'), '*', models.Value(Decimal('0.001'))), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 2), '*', models.Value(Decimal('1000'))), ManjaBook.fixed_point.FixedPointField(decimal_places=2, max_digits=10)), output_field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fats_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('fats'), '*', models.Value(Decimal('0.001'))), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 2), '*', models.Value(Decimal('1000'))), ManjaBook.fixed_point.FixedPointField(decimal_places=2, max_digits=10)), output_field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fibre_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('fibre'), '*', models.Value(Decimal('0.001'))), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 2), '*', models.Value(Decimal('1000'))), ManjaBook.fixed_point.FixedPointField(decimal_places=2, max_digits=10)), output_field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='protein_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('protein'), '*', models.Value(Decimal('0.001'))), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 2), '*', models.Value(Decimal('1000'))), ManjaBook.fixed_point.FixedPointField(decimal_places=2, max_digits=10)), output_field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='salt_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('salt'), '*', models.Value(Decimal('0.001'))), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 3), '*', models.Value(Decimal('1000'))), ManjaBook.fixed_point.FixedPointField(decimal_places=3, max_digits=10)), output_field=ManjaBook.fixed_point.FixedPointField(decimal_places=3, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='saturated_fats_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('saturated_fats'), '*', models.Value(Decimal('0.001'))), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 2), '*', models.Value(Decimal('1000'))), ManjaBook.fixed_point.FixedPointField(decimal_places=2, max_digits=10)), output_field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='sugars_per_portion',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('sugars'), '*', models.Value(Decimal('0.001'))), '/', django.db.models.functions.comparison.NullIf(models.F('portions'), 0)), 2), '*', models.Value(Decimal('1000'))), ManjaBook.fixed_point.FixedPointField(decimal_places=2, max_digits=10)), output_field=ManjaBook.fixed_point.FixedPointField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['time_to_cook', 'calories_per_portion'], name='recipe_time_calories_pp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['time_to_cook', 'protein_per_portion'], name='recipe_time_protein_pp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['calories_per_portion', 'protein_per_portion'], name='recipe_calories_protein_pp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['protein_per_portion', 'calories_per_portion'], name='recipe_protein_calories_pp_idx'),
+        ),
+    ]
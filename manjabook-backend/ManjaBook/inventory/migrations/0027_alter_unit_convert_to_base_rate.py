@@ -0,0 +1,20 @@
+# Generated by Django 5.1.8 on 2026-10-18 15:03
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0026_nutrients_fixed_point'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='unit',
+            name='convert_to_base_rate',
+            field=models.DecimalField(decimal_places=3, max_digits=7, validators=[django.core.validators.MinValueValidator(Decimal('0.001'))]),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.8 on 2026-10-18 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0027_alter_unit_convert_to_base_rate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_pending_upload',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='recipescollection',
+            name='image_pending_upload',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+    ]
@@ -1,18 +1,28 @@
 from decimal import Decimal, ROUND_HALF_UP
 
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinLengthValidator, MinValueValidator, MaxValueValidator
 from django.db import models
 from django.utils.text import slugify
 from unidecode import unidecode
 
 from ManjaBook.accounts.models import Profile
-from ManjaBook.inventory.abstract_classes import ProductNutrientsInfo, RecipeNutrientsInfo, BasicRecipeInfo
+from ManjaBook.fixed_point import value_in_units
+from ManjaBook.inventory.abstract_classes import ProductNutrientsInfo, RecipeNutrientsInfo, BasicRecipeInfo, \
+    RecipeTotalNutrientsInfo, RecipePortionNutrientsInfo, NUTRIENT_FIELDS
 from ManjaBook.inventory.choices import NutritionPerChoices
+from ManjaBook.inventory.managers import RecipeProductQuerySet, RecipeQuerySet
+from ManjaBook.inventory.unit_registry import unit_registry
 
 UserModel = get_user_model()
 
 
+def quantize_value(value):
+    return Decimal(value).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
 class Shop(models.Model):
     name = models.CharField(max_length=20,
                             validators=[MinLengthValidator(1,
@@ -31,6 +41,12 @@ class Product(ProductNutrientsInfo):
 
     shopped_from = models.ManyToManyField(Shop, related_name='products', blank=True)
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=['name'], name='product_name_trgm_idx', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['brand'], name='product_brand_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
+
     def __str__(self):
         return f'{self.name} ({self.brand})'
 
@@ -48,41 +64,35 @@ class Unit(models.Model):
         return self.name
 
 
-class Recipe(BasicRecipeInfo):
+class Recipe(BasicRecipeInfo, RecipeTotalNutrientsInfo, RecipePortionNutrientsInfo):
     products = models.ManyToManyField(Product, through='RecipeProduct', related_name='recipes', blank=True)
 
     slug = models.SlugField(max_length=100, editable=False)
     image = models.ImageField(upload_to='recipes-images/', null=True, blank=True,
                               default='common/default-recipe-image.png')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    image_pending_upload = models.CharField(max_length=32, blank=True, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     last_edit_at = models.DateTimeField(auto_now=True)
 
     created_by = models.ForeignKey(Profile, on_delete=models.SET_NULL, null=True, blank=True)
 
-    def calculate_total_nutrients(self):
-        total_nutrients = {
-            'calories': 0,
-            'protein': 0,
-            'carbohydrates': 0,
-            'sugars': 0,
-            'fats': 0,
-            'saturated_fats': 0,
-            'salt': 0,
-            'fibre': 0,
-        }
-
-        for recipe_product in self.recipe_products.all():
-            total_nutrients['calories'] += recipe_product.calories
-            total_nutrients['protein'] += recipe_product.protein
-            total_nutrients['carbohydrates'] += recipe_product.carbohydrates
-            total_nutrients['sugars'] += recipe_product.sugars
-            total_nutrients['fats'] += recipe_product.fats
-            total_nutrients['saturated_fats'] += recipe_product.saturated_fats
-            total_nutrients['salt'] += recipe_product.salt
-            total_nutrients['fibre'] += recipe_product.fibre
-
-        return total_nutrients
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='recipe_created_at_id_idx'),
+            models.Index(fields=['created_by', 'created_at', 'id'], name='recipe_creator_created_at_idx'),
+            GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+            models.Index(fields=['time_to_cook', 'calories_per_portion'], name='recipe_time_calories_pp_idx'),
+            models.Index(fields=['time_to_cook', 'protein_per_portion'], name='recipe_time_protein_pp_idx'),
+            models.Index(fields=['calories_per_portion', 'protein_per_portion'], name='recipe_calories_protein_pp_idx'),
+            models.Index(fields=['protein_per_portion', 'calories_per_portion'], name='recipe_protein_calories_pp_idx'),
+            models.Index(fields=['calories', 'protein'], name='recipe_calories_protein_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -118,26 +128,35 @@ class RecipeProduct(RecipeNutrientsInfo):
                                     blank=True, null=True,
                                     on_delete=models.SET_NULL)
 
+    objects = RecipeProductQuerySet.as_manager()
+
     def get_unit_convert_to_base_rate(self):
-        rate_to_return = self.custom_unit.custom_convert_to_base_rate \
-            if self.custom_unit else self.unit.convert_to_base_rate
-        return rate_to_return
+        # Read from the unit registry, so calculating the nutrients of a row loads no unit.
+        return unit_registry.snapshot().convert_to_base_rate(self.unit_id, self.custom_unit_id)
+
+    def get_base_quantity(self):
+        # In hundreds of the base unit, the amount the product's nutrients are given for.
+        return quantize_value((self.get_unit_convert_to_base_rate() * self.quantity) / 100)
+
+    def calculate_nutrients(self):
+        quantity_converted_to_base = self.get_base_quantity()
+
+        for field in NUTRIENT_FIELDS:
+            nutrient = quantize_value(quantity_converted_to_base * value_in_units(self.product, field))
+            setattr(self, field, self._meta.get_field(field).to_stored(nutrient))
+
+    def exceeds_column_limits(self):
+        """
+        Tell in advance whether saving the quantity and calculated nutrients would raise a DataError.
+        """
+        for field_name in ('quantity',) + NUTRIENT_FIELDS:
+            field = self._meta.get_field(field_name)
+            if abs(value_in_units(self, field_name)) >= Decimal(10) ** (field.max_digits - field.decimal_places):
+                return True
+        return False
 
     def save(self, *args, **kwargs):
-        def quantize_value(value):
-            return Decimal(value).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-        quantity_converted_to_base = quantize_value((self.get_unit_convert_to_base_rate() * self.quantity) / 100)
-
-        self.calories = quantize_value(quantity_converted_to_base * self.product.calories)
-        self.protein = quantize_value(quantity_converted_to_base * self.product.protein)
-        self.carbohydrates = quantize_value(quantity_converted_to_base * self.product.carbohydrates)
-        self.sugars = quantize_value(quantity_converted_to_base * self.product.sugars)
-        self.fats = quantize_value(quantity_converted_to_base * self.product.fats)
-        self.saturated_fats = quantize_value(quantity_converted_to_base * self.product.saturated_fats)
-        self.salt = quantize_value(quantity_converted_to_base * self.product.salt)
-        self.fibre = quantize_value(quantity_converted_to_base * self.product.fibre)
-
+        self.calculate_nutrients()
         super().save(*args, **kwargs)
 
 
@@ -149,6 +168,8 @@ class RecipesCollection(models.Model):
     image = models.ImageField(upload_to='recipes-collections-images/',
                               default="common/default-collections-photo.png",
                               null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    image_pending_upload = models.CharField(max_length=32, blank=True, editable=False)
     is_private = models.BooleanField(default=False)
 
     created_by = models.ForeignKey(Profile, related_name='owned_collections',
@@ -156,6 +177,12 @@ class RecipesCollection(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='collection_created_at_id_idx'),
+            models.Index(fields=['created_by', 'created_at', 'id'], name='collection_creator_created_idx'),
+        ]
+
 
 class SavedRecipesCollection(models.Model):
     user = models.ForeignKey(
@@ -169,3 +196,8 @@ class SavedRecipesCollection(models.Model):
         on_delete=models.CASCADE
     )
     saved_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['saved_at', 'id'], name='saved_collection_saved_id_idx'),
+        ]
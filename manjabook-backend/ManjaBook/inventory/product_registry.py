@@ -0,0 +1,73 @@
+from django.apps import apps
+
+from ManjaBook.cache_versions import PRODUCT_NUTRIENTS
+from ManjaBook.fixed_point import SCALE, FixedPointField
+from ManjaBook.inventory.abstract_classes import NUTRIENT_FIELDS
+from ManjaBook.inventory.unit_registry import SnapshotRegistry
+
+
+def round_half_up(numerator, denominator):
+    # Integer division rounding like ROUND_HALF_UP: halves away from zero.
+    quotient = (abs(numerator) + denominator // 2) // denominator
+    return quotient if numerator >= 0 else -quotient
+
+
+class ProductNutrientsSnapshot:
+    """
+    The name and nutrients of every Product, as loaded at one version of the PRODUCT_NUTRIENTS data: a row
+    per product with a column per NUTRIENT_FIELDS entry, all in thousandths (the calories too). The rows are
+    shared between requests and threads, so they are only read.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.product_model = apps.get_model('inventory', 'Product')
+        # Columns stored in units, i.e. the calories, are scaled to thousandths like the others.
+        self.scales = tuple(1 if isinstance(self.product_model._meta.get_field(field), FixedPointField) else SCALE
+                            for field in NUTRIENT_FIELDS)
+        self.names, self.rows = self.load(self.product_model.objects.all())
+
+    def load(self, queryset):
+        names, rows = {}, {}
+        for pk, name, *nutrients in queryset.values_list('id', 'name', *NUTRIENT_FIELDS):
+            names[pk] = name
+            rows[pk] = tuple(value * scale for value, scale in zip(nutrients, self.scales))
+        return names, rows
+
+    def in_bulk(self, ids):
+        """
+        `({id: name}, {id: nutrients})` for the products in `ids` that exist. Products created since the
+        snapshot was loaded, which other processes may not have seen the version of yet, are read from the
+        database.
+        """
+        names = {pk: self.names[pk] for pk in ids if pk in self.names}
+        rows = {pk: self.rows[pk] for pk in names}
+        missing = set(ids) - names.keys()
+        if missing:
+            missing_names, missing_rows = self.load(self.product_model.objects.filter(pk__in=missing))
+            names.update(missing_names)
+            rows.update(missing_rows)
+        return names, rows
+
+    @staticmethod
+    def calculate_nutrients(nutrients, base_quantity):
+        """
+        The nutrients RecipeProduct.calculate_nutrients() stores for `base_quantity` (in hundreds of the base
+        unit, rounded to 2 decimal places) of a product with the `nutrients` row: each one rounded half up to
+        hundredths of its unit, in thousandths. Integer arithmetic gives the same values as the Decimals there.
+        """
+        base_hundredths = int(base_quantity.scaleb(2))
+        return tuple(round_half_up(base_hundredths * value, 1000) * 10 for value in nutrients)
+
+
+class ProductNutrientsRegistry(SnapshotRegistry):
+    """
+    Per-process copy of the product nutrients, so a draft recipe's nutrients are calculated without loading
+    its products.
+    """
+    snapshot_class = ProductNutrientsSnapshot
+    version_namespace = PRODUCT_NUTRIENTS
+    settings_name = 'PRODUCT_NUTRIENTS_REGISTRY'
+
+
+product_registry = ProductNutrientsRegistry.from_settings()
@@ -1,3 +1,6 @@
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import DataError, transaction
 from rest_framework import serializers
 from django.utils.text import slugify
@@ -6,10 +9,19 @@ from rest_framework.exceptions import ValidationError
 from unidecode import unidecode
 
 from ManjaBook.accounts.permissions import is_allowed_in_inventory
-from ManjaBook.accounts.serializers import BaseProfileSerializer
+from ManjaBook.accounts.serializers import BaseProfileSerializer, BaseProfileValuesSerializer
+from ManjaBook.inventory.abstract_classes import NUTRIENT_FIELDS
 from ManjaBook.inventory.choices import NutritionPerChoices
 from ManjaBook.inventory.models import Shop, Product, Unit, CustomUnit, RecipeProduct, Recipe, RecipesCollection, \
     SavedRecipesCollection
+from ManjaBook.inventory.product_registry import product_registry
+from ManjaBook.inventory.signals import deferred_recipe_products_refresh
+from ManjaBook.inventory.unit_registry import RegisteredUnitField, unit_registry
+from ManjaBook.fixed_point import FixedPointFieldsMixin
+from ManjaBook.images import SrcsetField
+from ManjaBook.media_urls import MediaImageField, MediaURLFieldsMixin
+from ManjaBook.uploads import StagedUploadsMixin
+from ManjaBook.values_serializers import ValuesSerializer, Srcset, decimal_converter
 
 
 class ShopSerializer(serializers.ModelSerializer):
@@ -18,7 +30,7 @@ class ShopSerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
 
 
-class ProductBaseSerializer(serializers.ModelSerializer):
+class ProductBaseSerializer(FixedPointFieldsMixin, serializers.ModelSerializer):
     nutrition_per = serializers.ChoiceField(choices=NutritionPerChoices.choices)
     shopped_from = ShopSerializer(many=True)
 
@@ -30,6 +42,39 @@ class ProductBaseSerializer(serializers.ModelSerializer):
                   'saturated_fats', 'salt', 'fibre']
 
 
+class ProductValuesSerializer(ValuesSerializer):
+    """
+    `.values()` counterpart of ProductBaseSerializer; the shops of a page are loaded with one query.
+    """
+    model = Product
+    fields = {
+        'id': 'id',
+        'name': 'name',
+        'brand': 'brand',
+        'shopped_from': None,
+        'nutrition_per': 'nutrition_per',
+        **{field: field for field in NUTRIENT_FIELDS},
+    }
+
+    def prefetch(self, rows):
+        self.shops = defaultdict(list)
+        product_ids = [row[f'{self.prefix}id'] for row in rows]
+        for product_id, shop_id, shop_name in (Product.shopped_from.through.objects
+                                               .filter(product_id__in=product_ids)
+                                               .order_by('shop_id')
+                                               .values_list('product_id', 'shop_id', 'shop__name')):
+            self.shops[product_id].append({'id': shop_id, 'name': shop_name})
+
+    def get_shopped_from(self, row):
+        return self.shops.get(row[f'{self.prefix}id'], [])
+
+
+class ProductAutocompleteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'brand']
+
+
 class ProductCreateSerializer(ProductBaseSerializer):
     shopped_from = serializers.PrimaryKeyRelatedField(
         queryset=Shop.objects.all(), many=True
@@ -77,10 +122,10 @@ class CustomUnitCreateSerializer(CustomUnitBaseSerializer):
         return instance
 
 
-class RecipeProductSerializer(serializers.ModelSerializer):
+class RecipeProductSerializer(FixedPointFieldsMixin, serializers.ModelSerializer):
     product = ProductBaseSerializer()
-    unit = UnitBaseSerializer()
-    custom_unit = CustomUnitBaseSerializer()
+    unit = RegisteredUnitField(UnitBaseSerializer)
+    custom_unit = RegisteredUnitField(CustomUnitBaseSerializer)
 
     class Meta:
         model = RecipeProduct
@@ -108,17 +153,47 @@ class BaseRecipeSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'slug', 'created_by']
 
 
-class SimpleRecipeSerializer(BaseRecipeSerializer):
+# The stored thousandths of the recipe totals as the strings of units the API shows
+TOTAL_NUTRIENT_FORMATTERS = {field: Recipe._meta.get_field(field).format_units for field in NUTRIENT_FIELDS}
+
+
+class SimpleRecipeSerializer(MediaURLFieldsMixin, BaseRecipeSerializer):
     total_nutrients = serializers.SerializerMethodField(read_only=True)
     created_by = BaseProfileSerializer(read_only=True)
+    image_srcset = SrcsetField('image')
 
     class Meta(BaseRecipeSerializer.Meta):
         fields = (BaseRecipeSerializer.Meta.fields +
-                  ['quick_description', 'time_to_cook', 'time_to_prepare', 'image', 'total_nutrients'])
+                  ['quick_description', 'time_to_cook', 'time_to_prepare', 'image', 'image_srcset',
+                   'total_nutrients'])
         read_only_fields = BaseRecipeSerializer.Meta.read_only_fields + ['total_nutrients']
 
     def get_total_nutrients(self, obj):
-        return obj.calculate_total_nutrients()
+        return {field: TOTAL_NUTRIENT_FORMATTERS[field](value) for field, value in obj.total_nutrients.items()}
+
+
+class SimpleRecipeValuesSerializer(ValuesSerializer):
+    """
+    `.values()` counterpart of SimpleRecipeSerializer.
+    """
+    model = Recipe
+    fields = {
+        'id': 'id',
+        'name': 'name',
+        'slug': 'slug',
+        'created_by': BaseProfileValuesSerializer,
+        'quick_description': 'quick_description',
+        'time_to_cook': 'time_to_cook',
+        'time_to_prepare': 'time_to_prepare',
+        'image': 'image',
+        'image_srcset': Srcset('image'),
+        'total_nutrients': None,
+    }
+    method_lookups = NUTRIENT_FIELDS
+
+    def get_total_nutrients(self, row):
+        return {field: format_units(row[self.prefix + field])
+                for field, format_units in TOTAL_NUTRIENT_FORMATTERS.items()}
 
 
 class RecipeDetailSerializer(SimpleRecipeSerializer):
@@ -136,8 +211,160 @@ class RecipeDetailSerializer(SimpleRecipeSerializer):
         return False
 
 
-class RecipeUpdateSerializer(serializers.ModelSerializer):
-    products = RecipeProductCreateSerializer(many=True, source='recipe_products', required=False)
+def quantity_too_large_error(product, quantity, unit):
+    return ValidationError({'products': f"Product {product.name} - "
+                                        f"Quantity {quantity} too large "
+                                        f"for the specified unit - {unit.name}!"})
+
+
+def missing_related_objects_error(model, missing_ids):
+    return ValidationError({'products': f"{model._meta.verbose_name.capitalize()} with id "
+                                        f"{', '.join(map(str, sorted(missing_ids)))} does not exist."})
+
+
+class RecipeProductsBulkWriteMixin:
+    """
+    Writes the RecipeProducts of a recipe in bulk. Rows are built in memory, with every referenced Product loaded
+    by a single `in_bulk` query and the Units and CustomUnits taken from the unit registry, and the nutrients
+    are calculated before anything is written.
+    """
+    related_fields = ('product', 'unit', 'custom_unit')
+
+    def build_recipe_products(self, recipe, products_data):
+        recipe_products = self.parse_recipe_products(recipe, products_data)
+        self.resolve_related_objects(recipe_products)
+
+        for recipe_product in recipe_products:
+            recipe_product.calculate_nutrients()
+            if recipe_product.exceeds_column_limits():
+                raise quantity_too_large_error(recipe_product.product, recipe_product.quantity, recipe_product.unit)
+
+        return recipe_products
+
+    def parse_recipe_products(self, recipe, products_data):
+        recipe_products = []
+        for product_data in products_data:
+            try:
+                recipe_product = RecipeProduct(
+                    recipe=recipe,
+                    quantity=RecipeProduct._meta.get_field('quantity').to_python(product_data.get('quantity')),
+                    **{f'{field_name}_id': RecipeProduct._meta.get_field(field_name)
+                       .to_python(product_data.get(f'{field_name}_id')) for field_name in self.related_fields},
+                )
+            except (AttributeError, DjangoValidationError):
+                raise ValidationError({'products': "Invalid product data provided."})
+
+            if recipe_product.quantity is None or recipe_product.product_id is None or recipe_product.unit_id is None:
+                raise ValidationError({'products': "Each product needs a product, a quantity and a unit."})
+
+            try:
+                # The rows skip the nested serializer, so the model's limits on the quantity are checked here.
+                RecipeProduct._meta.get_field('quantity').run_validators(recipe_product.quantity)
+            except DjangoValidationError as error:
+                raise ValidationError({'products': error.messages})
+
+            recipe_products.append(recipe_product)
+
+        return recipe_products
+
+    def resolve_related_objects(self, recipe_products, field_names=None):
+        units = unit_registry.snapshot()
+        for field_name in field_names or self.related_fields:
+            related_model = RecipeProduct._meta.get_field(field_name).related_model
+            related_ids = {getattr(recipe_product, f'{field_name}_id') for recipe_product in recipe_products}
+            related_ids.discard(None)
+
+            if units.holds(related_model):
+                related_objects = units.in_bulk(related_model, related_ids)
+            else:
+                related_objects = related_model.objects.in_bulk(related_ids)
+            missing_ids = related_ids - related_objects.keys()
+            if missing_ids:
+                raise missing_related_objects_error(related_model, missing_ids)
+
+            for recipe_product in recipe_products:
+                related_id = getattr(recipe_product, f'{field_name}_id')
+                setattr(recipe_product, field_name, related_objects[related_id] if related_id is not None else None)
+
+    @staticmethod
+    def diff_recipe_products(existing_recipe_products, incoming_recipe_products):
+        """
+        Pair the incoming rows with the existing ones of the same product and split them into
+        (unchanged, changed, new, removed). Changed rows are existing rows that take over the incoming values.
+        """
+        existing_by_product = defaultdict(list)
+        for recipe_product in existing_recipe_products:
+            existing_by_product[recipe_product.product_id].append(recipe_product)
+
+        def is_same(existing, incoming):
+            return (existing.quantity == incoming.quantity and
+                    existing.unit_id == incoming.unit_id and
+                    existing.custom_unit_id == incoming.custom_unit_id)
+
+        unchanged, unmatched = [], []
+        for incoming in incoming_recipe_products:
+            candidates = existing_by_product[incoming.product_id]
+            match = next((existing for existing in candidates if is_same(existing, incoming)), None)
+            if match is None:
+                unmatched.append(incoming)
+            else:
+                candidates.remove(match)
+                unchanged.append(match)
+
+        changed, new = [], []
+        for incoming in unmatched:
+            candidates = existing_by_product[incoming.product_id]
+            if not candidates:
+                new.append(incoming)
+                continue
+
+            existing = candidates.pop(0)
+            existing.product = incoming.product
+            existing.quantity = incoming.quantity
+            existing.unit = incoming.unit
+            existing.custom_unit = incoming.custom_unit
+            changed.append(existing)
+
+        removed = [recipe_product for candidates in existing_by_product.values() for recipe_product in candidates]
+        return unchanged, changed, new, removed
+
+    def apply_recipe_products_diff(self, recipe, incoming_recipe_products):
+        """
+        Write only the difference between the stored and the incoming products of a recipe:
+        one bulk_update for the changed rows, one bulk_create for the new ones and one DELETE for the rest.
+        """
+        unchanged, changed, new, removed = self.diff_recipe_products(recipe.recipe_products.all(),
+                                                                     incoming_recipe_products)
+
+        for recipe_product in changed + new:
+            recipe_product.calculate_nutrients()
+            if recipe_product.exceeds_column_limits():
+                raise quantity_too_large_error(recipe_product.product, recipe_product.quantity, recipe_product.unit)
+
+        try:
+            if changed:
+                RecipeProduct.objects.bulk_update(changed, ['quantity', 'unit', 'custom_unit', *NUTRIENT_FIELDS])
+            if new:
+                RecipeProduct.objects.bulk_create(new)
+        except DataError:
+            raise ValidationError({'products': "Quantity too large for the specified unit!"})
+
+        if removed:
+            # The recipe is refreshed once by its own save, not once per deleted row.
+            with deferred_recipe_products_refresh():
+                RecipeProduct.objects.filter(id__in=[recipe_product.id for recipe_product in removed]).delete()
+
+        return unchanged, changed, new, removed
+
+    def bulk_create_recipe_products(self, recipe_products):
+        try:
+            RecipeProduct.objects.bulk_create(recipe_products)
+        except DataError:
+            raise ValidationError({'products': "Quantity too large for the specified unit!"})
+
+
+class RecipeUpdateSerializer(RecipeProductsBulkWriteMixin, serializers.ModelSerializer):
+    products = serializers.JSONField(write_only=True, required=False)
     is_owner = serializers.SerializerMethodField(read_only=True)
 
     def get_is_owner(self, obj):
@@ -158,47 +385,35 @@ class RecipeUpdateSerializer(serializers.ModelSerializer):
         if 'name' in validated_data:
             instance.slug = slugify(unidecode(validated_data['name']))
 
-        products_data = validated_data.pop('recipe_products', [])
-        if not products_data:
+        products_data = validated_data.pop('products', [])
+        if not products_data or not isinstance(products_data, list):
             raise serializers.ValidationError({'products': "No products provided."})
 
-        existing_product_ids = set(instance.recipe_products.values_list('id', flat=True))
+        incoming_recipe_products = self.build_recipe_products(instance, products_data)
 
-        incoming_product_ids = set()
+        with transaction.atomic():
+            self.apply_recipe_products_diff(instance, incoming_recipe_products)
+            return super().update(instance, validated_data)
 
-        for product_data in products_data:
-            try:
-                recipe_product, created = (RecipeProduct.objects.
-                                           update_or_create(recipe=instance,
-                                                            quantity=product_data['quantity'],
-                                                            unit=product_data['unit'],
-                                                            custom_unit=product_data['custom_unit'],
-                                                            product=product_data['product'],
-                                                            ))
-                incoming_product_ids.add(recipe_product.id)
-            except DataError:
-                error_unit = product_data['unit']
-                error_quantity = product_data['quantity']
-                error_product = product_data['product']
-                raise ValidationError({'products': f"Product {error_product.name} - "
-                                                   f"Quantity {error_quantity} too large "
-                                                   f"for the specified unit - {error_unit.name}!"})
-        products_to_delete = existing_product_ids - incoming_product_ids
-        RecipeProduct.objects.filter(id__in=products_to_delete).delete()
-        return super().update(instance, validated_data)
-
-
-class RecipeImageUpdateSerializer(serializers.ModelSerializer):
-    image = serializers.ImageField(required=True)
+    def to_representation(self, instance):
+        response = super().to_representation(instance)
+        response['products'] = RecipeProductCreateSerializer(instance.recipe_products.all(), many=True).data
+        return response
+
+
+class RecipeImageUpdateSerializer(StagedUploadsMixin, serializers.ModelSerializer):
+    staged_upload_fields = ('image',)
+    image = MediaImageField(required=True)
 
     class Meta:
         model = Recipe
         fields = ['image']
 
 
-class RecipeCreateSerializer(serializers.ModelSerializer):
+class RecipeCreateSerializer(StagedUploadsMixin, RecipeProductsBulkWriteMixin, serializers.ModelSerializer):
+    staged_upload_fields = ('image',)
     products = serializers.JSONField()
-    image = serializers.ImageField(required=False, allow_null=True)
+    image = MediaImageField(required=False, allow_null=True)
 
     class Meta:
         model = Recipe
@@ -207,45 +422,31 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         products_data = validated_data.pop('products', [])
-        if not products_data:
+        if not products_data or not isinstance(products_data, list):
             raise serializers.ValidationError({'products': "No products provided."})
 
         with transaction.atomic():
             recipe = Recipe.objects.create(**validated_data)
 
-            for product_data in products_data:
-                error_dict = {}
-                try:
-                    recipe_product = RecipeProduct(recipe=recipe, **product_data)
-                    error_dict = {
-                        "unit": recipe_product.unit,
-                        "quantity": recipe_product.quantity,
-                        "product": recipe_product.product,
-                    }
-
-                    recipe_product.save()
-                except DataError:
-                    error_unit = error_dict["unit"]
-                    error_quantity = error_dict["quantity"]
-                    error_product = error_dict["product"]
-                    raise ValidationError({'products': f"Product {error_product.name} - "
-                                                       f"Quantity {error_quantity} too large "
-                                                       f"for the specified unit - {error_unit.name}!"})
+            self.bulk_create_recipe_products(self.build_recipe_products(recipe, products_data))
+            Recipe.objects.filter(pk=recipe.pk).refresh_recipe_products_fields()
 
         return recipe
 
     def to_representation(self, instance):
-        response = RecipeDetailSerializer(instance=instance).data
+        response = RecipeDetailSerializer(instance=Recipe.objects.with_products().get(pk=instance.pk)).data
         return response
 
 
-class BaseRecipesCollectionSerializer(serializers.ModelSerializer):
+class BaseRecipesCollectionSerializer(StagedUploadsMixin, serializers.ModelSerializer):
+    staged_upload_fields = ('image',)
     recipes = BaseRecipeSerializer(many=True, read_only=True)
-    image = serializers.ImageField(required=False, allow_null=True)
+    image = MediaImageField(required=False, allow_null=True)
+    image_srcset = SrcsetField('image')
 
     class Meta:
         model = RecipesCollection
-        fields = ['id', 'name', 'created_by', 'recipes', 'image', 'is_private', 'created_at']
+        fields = ['id', 'name', 'created_by', 'recipes', 'image', 'image_srcset', 'is_private', 'created_at']
         read_only_fields = ['id', 'created_at', 'created_by']
 
 
@@ -261,6 +462,41 @@ class RecipesCollectionDetailSerializer(SimpleRecipesCollectionSerializer):
     recipes = SimpleRecipeSerializer(many=True)
 
 
+class RecipesCollectionDetailValuesSerializer(ValuesSerializer):
+    """
+    `.values()` counterpart of RecipesCollectionDetailSerializer, with the recipes of the collections
+    loaded by one query over the through table, in the order they were added.
+    """
+    model = RecipesCollection
+    fields = {
+        'id': 'id',
+        'name': 'name',
+        'created_by': 'created_by',
+        'recipes': None,
+        'image': 'image',
+        'image_srcset': Srcset('image'),
+        'is_private': 'is_private',
+        'created_at': 'created_at',
+    }
+
+    def __init__(self, context=None, prefix=''):
+        super().__init__(context, prefix)
+        self.recipe_serializer = SimpleRecipeValuesSerializer(self.context, prefix='recipe__')
+
+    def prefetch(self, rows):
+        self.recipes = defaultdict(list)
+        recipe_rows = (RecipesCollection.recipes.through.objects
+                       .filter(recipescollection_id__in=[row[f'{self.prefix}id'] for row in rows])
+                       .order_by('id')
+                       .values('recipescollection_id', *self.recipe_serializer.lookups))
+        for recipe_row in recipe_rows:
+            self.recipes[recipe_row['recipescollection_id']].append(
+                self.recipe_serializer.to_representation(recipe_row))
+
+    def get_recipes(self, row):
+        return self.recipes.get(row[f'{self.prefix}id'], [])
+
+
 class RecipesCollectionModifySerializer(SimpleRecipesCollectionSerializer):
     ...
 
@@ -287,3 +523,60 @@ class SavedRecipesCollectionCreateSerializer(serializers.ModelSerializer):
 
 class SavedRecipesCollectionDetailSerializer(SavedRecipesCollectionBaseSerializer):
     ...
+
+
+# The stored thousandths of a recipe product's nutrients as the strings of units the API shows
+RECIPE_PRODUCT_NUTRIENT_FORMATTERS = {field: RecipeProduct._meta.get_field(field).format_units
+                                      for field in NUTRIENT_FIELDS}
+
+
+class RecipeNutrientsPreviewSerializer(RecipeProductsBulkWriteMixin, serializers.Serializer):
+    """
+    Nutrients of a draft recipe's products, as saving the recipe would calculate and store them, and their
+    totals. Products come from the product registry and units from the unit registry, so the products of
+    the draft are neither loaded nor written.
+    """
+    products = serializers.JSONField()
+
+    format_quantity = staticmethod(decimal_converter(RecipeProduct._meta.get_field('quantity')))
+
+    def validate(self, attrs):
+        products_data = attrs['products']
+        if not products_data or not isinstance(products_data, list):
+            raise serializers.ValidationError({'products': "No products provided."})
+
+        recipe_products = self.parse_recipe_products(None, products_data)
+        self.resolve_related_objects(recipe_products, ('unit', 'custom_unit'))
+
+        products = product_registry.snapshot()
+        names, nutrients = products.in_bulk({recipe_product.product_id for recipe_product in recipe_products})
+        missing_ids = {recipe_product.product_id for recipe_product in recipe_products} - names.keys()
+        if missing_ids:
+            raise missing_related_objects_error(Product, missing_ids)
+
+        for recipe_product in recipe_products:
+            recipe_product.product = Product(pk=recipe_product.product_id, name=names[recipe_product.product_id])
+            row = products.calculate_nutrients(nutrients[recipe_product.product_id],
+                                               recipe_product.get_base_quantity())
+            for field, value in zip(NUTRIENT_FIELDS, row):
+                setattr(recipe_product, field, value)
+            if recipe_product.exceeds_column_limits():
+                raise quantity_too_large_error(recipe_product.product, recipe_product.quantity, recipe_product.unit)
+
+        return {'products': recipe_products}
+
+    def to_representation(self, data):
+        recipe_products = data['products']
+        return {
+            'products': [{
+                'product_id': recipe_product.product_id,
+                'quantity': self.format_quantity(recipe_product.quantity),
+                'unit_id': recipe_product.unit_id,
+                'custom_unit_id': recipe_product.custom_unit_id,
+                **{field: format_units(getattr(recipe_product, field))
+                   for field, format_units in RECIPE_PRODUCT_NUTRIENT_FORMATTERS.items()},
+            } for recipe_product in recipe_products],
+            'total_nutrients': {field: format_units(sum(getattr(recipe_product, field)
+                                                        for recipe_product in recipe_products))
+                                for field, format_units in TOTAL_NUTRIENT_FORMATTERS.items()},
+        }
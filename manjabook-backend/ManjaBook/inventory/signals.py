@@ -1,6 +1,37 @@
-from django.db.models.signals import post_save
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, pre_save, post_save, post_delete
 from django.dispatch import receiver
-from ManjaBook.inventory.models import RecipesCollection, SavedRecipesCollection
+from ManjaBook.cache_versions import PRODUCT_NUTRIENTS, PRODUCTS, SHOPS, UNITS, bump_versions
+from ManjaBook.images import assign_default_image_variants, queue_image_derivatives
+from ManjaBook.inventory.abstract_classes import NUTRIENT_FIELDS
+from ManjaBook.inventory.models import RecipesCollection, SavedRecipesCollection, Recipe, RecipeProduct, Product, \
+    Shop, Unit, CustomUnit
+from ManjaBook.inventory.product_registry import product_registry
+from ManjaBook.inventory.tasks import queue_product_nutrients_propagation, refresh_product_recipes_search_vectors
+from ManjaBook.inventory.unit_registry import unit_registry
+
+RECIPE_DERIVED_SOURCE_FIELDS = {'name', 'quick_description', 'preparation', *NUTRIENT_FIELDS}
+
+# Product fields copied into its recipes; a save only reaches the recipes when one of them changed.
+PRODUCT_RECIPE_SOURCE_FIELDS = ('name', *NUTRIENT_FIELDS)
+
+_recipe_products_refresh_deferred = ContextVar('recipe_products_refresh_deferred', default=False)
+
+
+@contextmanager
+def deferred_recipe_products_refresh():
+    """
+    Skip the per-row recipe refresh of RecipeProduct saves and deletes inside the block,
+    for bulk writes that refresh the recipe once themselves afterwards.
+    """
+    token = _recipe_products_refresh_deferred.set(True)
+    try:
+        yield
+    finally:
+        _recipe_products_refresh_deferred.reset(token)
 
 
 @receiver(post_save, sender=RecipesCollection)
@@ -10,3 +41,98 @@ def auto_save_collection(sender, instance, created, **kwargs):
             user=instance.created_by,
             recipes_collection=instance
         )
+
+
+@receiver([post_save, post_delete], sender=RecipeProduct)
+def refresh_recipe_products_fields(sender, instance, **kwargs):
+    if _recipe_products_refresh_deferred.get():
+        return
+
+    Recipe.objects.filter(pk=instance.recipe_id).refresh_recipe_products_fields()
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_derived_fields(sender, instance, update_fields=None, **kwargs):
+    # A full save() writes the in-memory nutrient totals back, so they are recalculated with the search document.
+    if update_fields is not None and not RECIPE_DERIVED_SOURCE_FIELDS.intersection(update_fields):
+        return
+
+    Recipe.objects.filter(pk=instance.pk).refresh_recipe_products_fields()
+
+
+@receiver(pre_save, sender=Product)
+def remember_stored_product_fields(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Read before the row is overwritten, so post_save receivers can tell which of these fields changed.
+    field_names = [field_name for field_name in PRODUCT_RECIPE_SOURCE_FIELDS
+                   if update_fields is None or field_name in update_fields]
+    instance._stored_recipe_source_fields = {}
+    if instance.pk is not None and field_names and not raw:
+        instance._stored_recipe_source_fields = (Product.objects.filter(pk=instance.pk)
+                                                 .values(*field_names).first() or {})
+
+
+def changed_product_fields(instance):
+    """
+    The PRODUCT_RECIPE_SOURCE_FIELDS of a product that its last save changed.
+    """
+    stored = getattr(instance, '_stored_recipe_source_fields', {})
+    return {field_name for field_name, value in stored.items() if getattr(instance, field_name) != value}
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_recipes_search_vector(sender, instance, created, **kwargs):
+    if created or 'name' not in changed_product_fields(instance):
+        return
+
+    refresh_product_recipes_search_vectors(instance)
+
+
+@receiver(post_save, sender=Product)
+def propagate_product_nutrients(sender, instance, created, **kwargs):
+    if created or not set(NUTRIENT_FIELDS).intersection(changed_product_fields(instance)):
+        return
+
+    queue_product_nutrients_propagation(instance)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver(m2m_changed, sender=Product.shopped_from.through)
+def bump_products_version(sender, **kwargs):
+    bump_versions(PRODUCTS)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def bump_product_nutrients_version(sender, update_fields=None, **kwargs):
+    if update_fields is not None and not {'name', *NUTRIENT_FIELDS}.intersection(update_fields):
+        return
+
+    product_registry.clear()
+    bump_versions(PRODUCT_NUTRIENTS)
+    # Bumped again once committed, so no process keeps rows it read before the commit under the new version.
+    transaction.on_commit(lambda: bump_versions(PRODUCT_NUTRIENTS))
+
+
+@receiver([post_save, post_delete], sender=Shop)
+def bump_shops_version(sender, **kwargs):
+    bump_versions(SHOPS)
+
+
+@receiver([post_save, post_delete], sender=Unit)
+@receiver([post_save, post_delete], sender=CustomUnit)
+def bump_units_version(sender, **kwargs):
+    unit_registry.clear()
+    bump_versions(UNITS)
+    # Bumped again once committed, so no process keeps rows it read before the commit under the new version.
+    transaction.on_commit(lambda: bump_versions(UNITS))
+
+
+@receiver(pre_save, sender=Recipe)
+@receiver(pre_save, sender=RecipesCollection)
+def assign_inventory_default_image_variants(sender, instance, **kwargs):
+    assign_default_image_variants(instance, 'image')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=RecipesCollection)
+def queue_inventory_image_derivatives(sender, instance, **kwargs):
+    queue_image_derivatives(instance, 'image')
@@ -0,0 +1,72 @@
+from django.conf import settings
+
+from ManjaBook.inventory.models import Recipe, RecipeProduct
+from ManjaBook.jobs.queue import enqueue, task
+
+
+@task('inventory.propagate_product_nutrients', atomic=False)
+def propagate_product_nutrients(product_id):
+    """
+    Recalculate the nutrients of the recipe products using a product, and the totals of their recipes,
+    after its nutrients changed.
+
+    Runs in batches of `NUTRIENT_PROPAGATION['BATCH_SIZE']` recipe products, each committed on its own
+    so that no lock is held on thousands of recipes at once. A failed batch is retried with the job;
+    batches already committed are then found up to date and skipped.
+    """
+    batch_size = settings.NUTRIENT_PROPAGATION['BATCH_SIZE']
+    last_id = 0
+
+    while True:
+        batch_ids = list(RecipeProduct.objects.filter(product_id=product_id, id__gt=last_id)
+                         .order_by('id')
+                         .values_list('id', flat=True)[:batch_size])
+        if not batch_ids:
+            break
+
+        RecipeProduct.objects.filter(id__in=batch_ids).refresh_nutrients()
+        last_id = batch_ids[-1]
+
+
+def queue_product_nutrients_propagation(product):
+    # Not deduplicated with a key: a job already running may have passed the rows a newer change affects.
+    enqueue('inventory.propagate_product_nutrients', product_id=product.pk)
+
+
+@task('inventory.refresh_product_recipes_search_vector', atomic=False)
+def refresh_product_recipes_search_vector(product_id):
+    """
+    Rebuild the search documents of the recipes using a product after it was renamed, in batches of
+    `RECIPE_SEARCH_REFRESH['BATCH_SIZE']` recipes, each committed on its own.
+    """
+    batch_size = settings.RECIPE_SEARCH_REFRESH['BATCH_SIZE']
+    last_id = 0
+
+    while True:
+        batch_ids = list(Recipe.objects.filter(recipe_products__product_id=product_id, id__gt=last_id)
+                         .order_by('id')
+                         .values_list('id', flat=True)
+                         .distinct()[:batch_size])
+        if not batch_ids:
+            break
+
+        Recipe.objects.filter(id__in=batch_ids).refresh_search_vector()
+        last_id = batch_ids[-1]
+
+
+def refresh_product_recipes_search_vectors(product):
+    """
+    Rebuild the search documents of the recipes using a renamed product: inline for up to
+    `RECIPE_SEARCH_REFRESH['INLINE_LIMIT']` recipes, by a job for more.
+    """
+    inline_limit = settings.RECIPE_SEARCH_REFRESH['INLINE_LIMIT']
+    recipe_ids = list(Recipe.objects.filter(recipe_products__product=product)
+                      .order_by()
+                      .values_list('id', flat=True)
+                      .distinct()[:inline_limit + 1])
+
+    if len(recipe_ids) <= inline_limit:
+        Recipe.objects.filter(id__in=recipe_ids).refresh_search_vector()
+    else:
+        # Not deduplicated with a key, like the nutrient propagation: a running job may be past renamed rows.
+        enqueue('inventory.refresh_product_recipes_search_vector', product_id=product.pk)
@@ -1,3 +1,1252 @@
-from django.test import TestCase
+import json
+import os
+from base64 import urlsafe_b64encode
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage, storages
+from django.conf import settings
+from django.core import signing
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from storages.backends.s3 import S3Storage
+
+from ManjaBook.inventory import urls, views
+from ManjaBook.cache_versions import UNITS, bump_versions, check_shared_cache
+from ManjaBook.images import record_image_derivatives
+from ManjaBook.inventory.abstract_classes import NUTRIENT_FIELDS
+from ManjaBook.inventory.models import Product, Recipe, RecipeProduct, RecipesCollection, Shop, CustomUnit, Unit
+from ManjaBook.inventory.serializers import CustomUnitBaseSerializer, UnitBaseSerializer
+from ManjaBook.inventory.tasks import queue_product_nutrients_propagation
+from ManjaBook.inventory.unit_registry import unit_registry
+from ManjaBook.jobs.choices import JobStatusChoices
+from ManjaBook.jobs.models import Job
+from ManjaBook.jobs.queue import run_due_jobs
+from ManjaBook.media_urls import media_url_resolver
+from ManjaBook.uploads import UPLOAD_TOKEN_SALT, store_staged_upload
+from ManjaBook.testing import QueryBudgetTestCase, S3StorageMixin, image_file, url_names
+
+# Maximum number of SQL queries per request, independent of how many rows are serialized.
+QUERY_BUDGETS = {
+    'api_products_list': 2,
+    'api_products_autocomplete': 1,
+    'api_products_detail': 2,
+    'api_shops_list': 1,
+    'api_units_list': 1,
+    'api_units_detail': 1,
+    'api_custom_units_list': 1,
+    'api_custom_units_detail': 1,
+    # Includes loading the unit registry, 2 queries a process makes once per change of the units.
+    'api_recipes_products_list': 4,
+    'api_recipes_products_detail': 4,
+    'api_recipes_list': 1,
+    'api_recipes_detail': 8,
+    # Includes loading the unit and product registries, 3 queries a process makes once per change of their data.
+    'api_recipes_nutrients_preview': 4,
+    'api_recipes_detail_multipart': 1,
+    'api_recipes_image_upload': 2,
+    'api_recipes_image_upload_confirm': 3,
+    'api_recipes_collection_list': 2,
+    'api_recipes_collection_detail': 3,
+    'api_recipes_collection_image_upload': 2,
+    'api_recipes_collection_image_upload_confirm': 3,
+    'api_saved_recipes_collection_list': 2,
+    'api_saved_recipes_collection_detail': 2,
+}
+
+# Creating a row with the default image looks its recorded derivatives up once per cold cache.
+RECIPE_CREATE_BUDGET = 16
+RECIPE_UPDATE_BUDGET = 17
+
+# Revalidating an unchanged response only checks its freshness; the serializers never run.
+NOT_MODIFIED_BUDGETS = {
+    'api_products_detail': 0,
+    'api_shops_list': 0,
+    'api_units_list': 0,
+    'api_units_detail': 0,
+    'api_recipes_detail': 2,
+    'api_recipes_collection_detail': 1,
+}
+
+
+class InventoryQueryBudgetTests(QueryBudgetTestCase):
+    def test_every_url_has_a_query_budget(self):
+        self.assertSetEqual(url_names(urls.urlpatterns), set(QUERY_BUDGETS))
+
+    def test_products_list(self):
+        response = self.assertQueryBudget(QUERY_BUDGETS['api_products_list'], 'get',
+                                          reverse('api_products_list'), {'page_size': 100}, expected_status=200)
+        self.assertEqual(len(response.data['results']), self.PRODUCTS)
+
+    def test_products_autocomplete(self):
+        self.assertQueryBudget(QUERY_BUDGETS['api_products_autocomplete'], 'get',
+                               reverse('api_products_autocomplete'), {'search': 'Product 1'}, expected_status=200)
+
+    def test_products_detail(self):
+        self.assertQueryBudget(QUERY_BUDGETS['api_products_detail'], 'get',
+                               reverse('api_products_detail', args=[self.products[0].pk]), expected_status=200)
+
+    def test_shops_list(self):
+        self.assertQueryBudget(QUERY_BUDGETS['api_shops_list'], 'get', reverse('api_shops_list'), expected_status=200)
+
+    def test_units_list(self):
+        self.assertQueryBudget(QUERY_BUDGETS['api_units_list'], 'get', reverse('api_units_list'), expected_status=200)
+
+    def test_units_detail(self):
+        self.assertQueryBudget(QUERY_BUDGETS['api_units_detail'], 'get',
+                               reverse('api_units_detail', args=[self.units[0].pk]), expected_status=200)
+
+    def test_custom_units_list(self):
+        response = self.assertQueryBudget(QUERY_BUDGETS['api_custom_units_list'], 'get',
+                                          reverse('api_custom_units_list'), expected_status=200)
+        self.assertEqual(len(response.data['results']), len(self.custom_units))
+
+    def test_custom_units_detail(self):
+        self.assertQueryBudget(QUERY_BUDGETS['api_custom_units_detail'], 'get',
+                               reverse('api_custom_units_detail', args=[self.custom_units[0].pk]),
+                               expected_status=200)
+
+    def test_recipes_products_list(self):
+        response = self.assertQueryBudget(QUERY_BUDGETS['api_recipes_products_list'], 'get',
+                                          reverse('api_recipes_products_list'), {'page_size': 100},
+                                          expected_status=200)
+        self.assertEqual(len(response.data['results']), 100)
+
+    def test_recipes_products_detail(self):
+        recipe_product = self.recipes[0].recipe_products.first()
+        self.assertQueryBudget(QUERY_BUDGETS['api_recipes_products_detail'], 'get',
+                               reverse('api_recipes_products_detail', args=[recipe_product.pk]),
+                               expected_status=200)
+
+    def test_recipes_list(self):
+        response = self.assertQueryBudget(QUERY_BUDGETS['api_recipes_list'], 'get',
+                                          reverse('api_recipes_list'), {'page_size': 50}, expected_status=200)
+        self.assertEqual(len(response.data['results']), 50)
+
+    def test_recipes_list_search_and_filters(self):
+        self.assertQueryBudget(QUERY_BUDGETS['api_recipes_list'], 'get', reverse('api_recipes_list'),
+                               {'search': 'recipe', 'calories_per_portion__lte': 10000, 'time_to_cook__gte': 20},
+                               expected_status=200)
+
+    def test_recipes_detail(self):
+        self.authenticate()
+        response = self.assertQueryBudget(QUERY_BUDGETS['api_recipes_detail'], 'get',
+                                          reverse('api_recipes_detail', args=[self.recipes[0].pk]),
+                                          expected_status=200)
+        self.assertEqual(len(response.data['products']), self.PRODUCTS_PER_RECIPE)
+        self.assertTrue(response.data['is_owner'])
+
+    def test_recipes_detail_multipart_rejects_json(self):
+        self.authenticate()
+        self.assertQueryBudget(QUERY_BUDGETS['api_recipes_detail_multipart'], 'patch',
+                               reverse('api_recipes_detail_multipart', args=[self.recipes[0].pk]),
+                               {'name': 'Renamed'}, format='json', expected_status=415)
+
+    def test_recipes_image_upload_needs_an_object_store(self):
+        self.authenticate()
+        self.assertQueryBudget(QUERY_BUDGETS['api_recipes_image_upload'], 'post',
+                               reverse('api_recipes_image_upload', args=[self.recipes[0].pk]),
+                               {'content_type': 'image/png', 'size': 100}, format='json', expected_status=501)
+
+    def test_recipes_collection_list(self):
+        response = self.assertQueryBudget(QUERY_BUDGETS['api_recipes_collection_list'], 'get',
+                                          reverse('api_recipes_collection_list'), expected_status=200)
+        self.assertEqual(len(response.data['results']), len(self.collections))
+
+    def test_recipes_collection_detail(self):
+        self.assertQueryBudget(QUERY_BUDGETS['api_recipes_collection_detail'], 'get',
+                               reverse('api_recipes_collection_detail', args=[self.collections[0].pk]),
+                               expected_status=200)
+
+    def test_saved_recipes_collection_list(self):
+        self.assertQueryBudget(QUERY_BUDGETS['api_saved_recipes_collection_list'], 'get',
+                               reverse('api_saved_recipes_collection_list'), expected_status=200)
+
+    def test_saved_recipes_collection_detail(self):
+        saved_collection = self.user.profile.saved_collections.first()
+        self.assertQueryBudget(QUERY_BUDGETS['api_saved_recipes_collection_detail'], 'get',
+                               reverse('api_saved_recipes_collection_detail', args=[saved_collection.pk]),
+                               expected_status=200)
+
+    def test_recipes_nutrients_preview(self):
+        self.authenticate()
+        response = self.assertQueryBudget(QUERY_BUDGETS['api_recipes_nutrients_preview'], 'post',
+                                          reverse('api_recipes_nutrients_preview'),
+                                          {'products': self.recipe_payload(50)['products']}, format='json',
+                                          expected_status=200)
+        self.assertEqual(len(response.data['products']), 50)
+
+    def recipe_payload(self, products_count, recipe=None):
+        return {
+            'name': 'Budget recipe',
+            'quick_description': 'Fast and filling.',
+            'portions': 4,
+            'time_to_cook': 15,
+            'time_to_prepare': 5,
+            'preparation': 'Cook everything together.',
+            'products': [{'product_id': product.pk, 'quantity': '150.00', 'unit_id': self.units[0].pk,
+                          **({'recipe_id': recipe.pk} if recipe else {})}
+                         for product in self.products[:products_count]],
+        }
+
+    def test_recipe_create_does_not_grow_with_products(self):
+        self.authenticate()
+        for products_count in (2, 20):
+            self.assertQueryBudget(RECIPE_CREATE_BUDGET, 'post', reverse('api_recipes_list'),
+                                   self.recipe_payload(products_count), format='json', expected_status=201)
+
+    def test_recipe_update_does_not_grow_with_products(self):
+        self.authenticate()
+        recipe = self.recipes[0]
+        for products_count in (2, 20):
+            self.assertQueryBudget(RECIPE_UPDATE_BUDGET, 'put', reverse('api_recipes_detail', args=[recipe.pk]),
+                                   self.recipe_payload(products_count, recipe), format='json', expected_status=200)
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).recipe_products.count(), 20)
+
+
+class KeysetPaginationTests(QueryBudgetTestCase):
+    def traverse(self, url, link):
+        pages = []
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            pages.append([result['id'] for result in response.data['results']])
+            url = response.data[link]
+        return pages, response
+
+    def test_pages_are_traversed_both_ways(self):
+        expected = list(Recipe.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        forward, last_page = self.traverse(f"{reverse('api_recipes_list')}?page_size=7", 'next')
+        self.assertEqual([recipe_id for page in forward for recipe_id in page], expected)
+        self.assertTrue(all(len(page) == 7 for page in forward[:-1]))
+
+        backward, first_page = self.traverse(last_page.data['previous'], 'previous')
+        self.assertEqual(backward, forward[-2::-1])
+        self.assertIsNone(first_page.data['previous'])
+
+    @staticmethod
+    def cursor(position, reverse=False):
+        return urlsafe_b64encode(json.dumps({'p': position, **({'r': 1} if reverse else {})}).encode()).decode()
+
+    def test_invalid_cursors_are_not_found(self):
+        url = reverse('api_recipes_list')
+        for cursor in ('not base64!', self.cursor('x'), self.cursor([1]), self.cursor(['notadate', 'x']),
+                       self.cursor(['2026-01-01T00:00:00+00:00', 'x'], reverse=True),
+                       self.cursor([[1], {}])):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+
+class RecipeSearchVectorTests(QueryBudgetTestCase):
+    def search(self, term):
+        response = self.client.get(reverse('api_recipes_list'), {'search': term, 'page_size': 100})
+        return {result['id'] for result in response.data['results']}
+
+    def product_recipe_ids(self, product):
+        return set(Recipe.objects.filter(recipe_products__product=product).values_list('id', flat=True))
+
+    def test_renaming_a_product_refreshes_its_recipes(self):
+        product = self.products[5]
+        product.name = 'Quinoa'
+        product.save()
+
+        self.assertEqual(self.search('quinoa'), self.product_recipe_ids(product))
+        self.assertFalse(Job.objects.filter(task='inventory.refresh_product_recipes_search_vector').exists())
+
+    def test_saving_an_unchanged_name_leaves_the_recipes_alone(self):
+        product = self.products[6]
+        Recipe.objects.filter(recipe_products__product=product).update(search_vector=None)
+        product.brand = 'Another brand'
+        product.save()
+
+        self.assertFalse(Recipe.objects.filter(recipe_products__product=product, search_vector__isnull=False).exists())
+
+    def test_large_rebuilds_are_queued(self):
+        product = self.products[7]
+        product.name = 'Buckwheat'
+        with self.settings(RECIPE_SEARCH_REFRESH={'INLINE_LIMIT': 2, 'BATCH_SIZE': 3}):
+            product.save()
+            self.assertEqual(self.search('buckwheat'), set())
+            self.assertEqual(Job.objects.filter(task='inventory.refresh_product_recipes_search_vector').count(), 1)
+            run_due_jobs()
+
+        self.assertEqual(self.search('buckwheat'), self.product_recipe_ids(product))
+
+
+class ReferenceDataCacheTests(QueryBudgetTestCase):
+    def assertCached(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        second = self.assertQueryBudget(0, 'get', url, expected_status=200)
+        self.assertEqual(second.data, first.data)
+        return second
+
+    def test_reference_data_is_served_from_the_cache(self):
+        self.assertCached(reverse('api_shops_list'))
+        self.assertCached(reverse('api_units_list'))
+        self.assertCached(reverse('api_units_detail', args=[self.units[0].pk]))
+        self.assertCached(reverse('api_custom_units_list'))
+        self.assertCached(reverse('api_products_detail', args=[self.products[0].pk]))
+
+    def test_shop_change_invalidates_shops_and_products(self):
+        shop = Shop.objects.order_by('id').first()
+        product = self.products[0]
+        product.shopped_from.set([shop])
+        shops_url = reverse('api_shops_list')
+        product_url = reverse('api_products_detail', args=[product.pk])
+        self.assertCached(shops_url)
+        self.assertCached(product_url)
+
+        shop.name = 'Renamed shop'
+        shop.save()
+
+        self.assertEqual(self.client.get(shops_url).data['results'][0]['name'], 'Renamed shop')
+        self.assertEqual(self.client.get(product_url).data['shopped_from'][0]['name'], 'Renamed shop')
+
+    def test_product_shops_change_invalidates_product(self):
+        product = self.products[0]
+        url = reverse('api_products_detail', args=[product.pk])
+        self.assertCached(url)
+
+        product.shopped_from.add(Shop.objects.create(name='New shop'))
+
+        self.assertIn('New shop', [shop['name'] for shop in self.client.get(url).data['shopped_from']])
+
+    def test_custom_unit_change_invalidates_custom_units(self):
+        url = reverse('api_custom_units_list')
+        count = len(self.assertCached(url).data['results'])
+
+        CustomUnit.objects.create(unit=self.units[-1], custom_convert_to_base_rate=42)
+
+        self.assertEqual(len(self.client.get(url).data['results']), count + 1)
+
+    def test_deployments_need_a_shared_cache(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['cache_versions.E001'])
+
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                               'LOCATION': self.enterContext(TemporaryDirectory())}}):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class ValuesSerializerEquivalenceTests(QueryBudgetTestCase):
+    """
+    The `.values()` read paths must render exactly what the DRF serializers they replace do.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Cover the null branches: a recipe whose author was deleted and one without an image.
+        Recipe.objects.filter(pk=cls.recipes[0].pk).update(created_by=None)
+        Recipe.objects.filter(pk=cls.recipes[1].pk).update(image='')
+        cls.recipes[2].image.save('uploaded.png', image_file())
+
+    def assertSameResponse(self, view_class, url, data=None, normalize=None):
+        fast = self.client.get(url, data)
+        with mock.patch.object(view_class, 'values_serializer_class', None):
+            drf = self.client.get(url, data)
+
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(drf.status_code, 200)
+        if normalize is None:
+            # Byte for byte, so the renderer was given values of the same types too.
+            self.assertEqual(fast.content, drf.content)
+        else:
+            self.assertEqual(normalize(fast.json()), normalize(drf.json()))
+
+    @staticmethod
+    def sort_shops(data):
+        for product in data['results']:
+            product['shopped_from'].sort(key=lambda shop: shop['id'])
+        return data
+
+    @staticmethod
+    def sort_recipes(data):
+        data['recipes'].sort(key=lambda recipe: recipe['id'])
+        return data
+
+    def test_products_list(self):
+        url = reverse('api_products_list')
+        self.assertSameResponse(views.ProductListView, url, {'page_size': 100}, normalize=self.sort_shops)
+        cursor = self.client.get(url, {'page_size': 7}).data['next']
+        self.assertSameResponse(views.ProductListView, cursor, normalize=self.sort_shops)
+
+    def test_recipes_list(self):
+        url = reverse('api_recipes_list')
+        self.assertSameResponse(views.RecipeListView, url, {'page_size': 100})
+        self.assertSameResponse(views.RecipeListView, self.client.get(url, {'page_size': 9}).data['next'])
+
+    def test_recipes_list_search(self):
+        self.assertSameResponse(views.RecipeListView, reverse('api_recipes_list'),
+                                {'search': 'recipe', 'protein_per_portion__gte': 1})
+
+    def test_recipes_collection_detail(self):
+        collection = self.collections[0]
+        collection.recipes.add(self.recipes[0], self.recipes[1])
+        self.assertSameResponse(views.RecipesCollectionDetailView,
+                                reverse('api_recipes_collection_detail', args=[collection.pk]),
+                                normalize=self.sort_recipes)
+
+
+class RendererTests(QueryBudgetTestCase):
+    def test_json_is_rendered_like_drf(self):
+        self.authenticate()
+        for url in (reverse('api_recipes_detail', args=[self.recipes[0].pk]),
+                    reverse('api_recipes_list') + '?page_size=100',
+                    reverse('api_products_list') + '?page_size=100'):
+            response = self.client.get(url)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_msgpack_is_negotiated(self):
+        self.authenticate()
+        url = reverse('api_recipes_detail', args=[self.recipes[0].pk])
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), self.client.get(url).json())
+
+    def test_msgpack_requests_are_parsed(self):
+        self.authenticate()
+        payload = {'name': 'Packed recipe', 'quick_description': 'Sent as MessagePack.', 'portions': 2,
+                   'time_to_cook': 5, 'time_to_prepare': 5, 'preparation': 'Unpack it.',
+                   'products': [{'product_id': self.products[0].pk, 'quantity': '100.00',
+                                 'unit_id': self.units[0].pk}]}
+        response = self.client.post(reverse('api_recipes_list'), msgpack.packb(payload),
+                                    content_type='application/msgpack', HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(msgpack.unpackb(response.content)['name'], 'Packed recipe')
+
+    def test_each_representation_has_its_own_etag(self):
+        url = reverse('api_units_list')
+        json_response = self.client.get(url)
+        msgpack_response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+
+        self.assertNotEqual(json_response['ETag'], msgpack_response['ETag'])
+        self.assertIn('Accept', json_response['Vary'])
+        self.assertEqual(self.client.get(url, HTTP_ACCEPT='application/msgpack',
+                                         HTTP_IF_NONE_MATCH=json_response['ETag']).status_code, 200)
+
+
+class ConditionalGetTests(QueryBudgetTestCase):
+    def assertRevalidated(self, url_name, *args):
+        url = reverse(url_name, args=args)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response.headers)
+        self.assertIn('Last-Modified', response.headers)
+
+        not_modified = self.assertQueryBudget(NOT_MODIFIED_BUDGETS[url_name], 'get', url,
+                                              HTTP_IF_NONE_MATCH=response.headers['ETag'], expected_status=304)
+        self.assertEqual(not_modified.headers['ETag'], response.headers['ETag'])
+        self.assertQueryBudget(NOT_MODIFIED_BUDGETS[url_name], 'get', url,
+                               HTTP_IF_MODIFIED_SINCE=response.headers['Last-Modified'], expected_status=304)
+        return response
+
+    def test_catalog_reads_are_revalidated(self):
+        self.assertRevalidated('api_products_detail', self.products[0].pk)
+        self.assertRevalidated('api_shops_list')
+        self.assertRevalidated('api_units_list')
+        self.assertRevalidated('api_units_detail', self.units[0].pk)
+
+    def test_recipes_collection_detail_is_revalidated(self):
+        self.assertRevalidated('api_recipes_collection_detail', self.collections[0].pk)
+
+    def test_recipes_detail_is_revalidated(self):
+        self.authenticate()
+        response = self.assertRevalidated('api_recipes_detail', self.recipes[0].pk)
+        self.assertIn('private', response.headers['Cache-Control'])
+
+    def test_recipes_detail_etag_depends_on_ownership(self):
+        url = reverse('api_recipes_detail', args=[self.recipes[0].pk])
+        anonymous_etag = self.client.get(url).headers['ETag']
+        self.authenticate()
+        self.assertNotEqual(self.client.get(url).headers['ETag'], anonymous_etag)
+
+    def test_product_change_invalidates_product_and_recipe(self):
+        self.authenticate()
+        product_url = reverse('api_products_detail', args=[self.products[0].pk])
+        recipe = Recipe.objects.filter(recipe_products__product=self.products[0]).first()
+        recipe_url = reverse('api_recipes_detail', args=[recipe.pk])
+        product_etag = self.client.get(product_url).headers['ETag']
+        recipe_etag = self.client.get(recipe_url).headers['ETag']
+
+        self.products[0].name = 'Renamed product'
+        self.products[0].save()
+
+        self.assertEqual(self.client.get(product_url, HTTP_IF_NONE_MATCH=product_etag).status_code, 200)
+        self.assertEqual(self.client.get(recipe_url, HTTP_IF_NONE_MATCH=recipe_etag).status_code, 200)
+
+    def test_recipe_product_change_invalidates_recipe(self):
+        self.authenticate()
+        recipe = self.recipes[0]
+        url = reverse('api_recipes_detail', args=[recipe.pk])
+        etag = self.client.get(url).headers['ETag']
+
+        RecipeProduct.objects.filter(recipe=recipe).first().delete()
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ImageDerivativesTests(QueryBudgetTestCase):
+    def upload_recipe_image(self, recipe, content):
+        self.authenticate()
+        return self.client.patch(reverse('api_recipes_detail_multipart', args=[recipe.pk]),
+                                 {'image': content}, format='multipart')
+
+    def test_upload_is_stored_and_processed_by_the_worker(self):
+        recipe = self.recipes[0]
+        default = recipe.image.name
+        content = image_file(width=800, height=400)
+        content.name = 'upload.png'
+        self.assertEqual(self.upload_recipe_image(recipe, content).status_code, 200)
+
+        # The request only staged the file; the recipe keeps its image until a worker stores the new one.
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image.name, default)
+        staged_name = Job.objects.get(task='uploads.store', status=JobStatusChoices.QUEUED).payload['staged_name']
+        self.assertTrue(storages['staging'].exists(staged_name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            run_due_jobs()
+
+        recipe.refresh_from_db()
+        self.assertTrue(recipe.image.name.startswith('recipes-images/upload'))
+        self.assertEqual(recipe.image_variants['source'], recipe.image.name)
+        self.assertFalse(storages['staging'].exists(staged_name))
+        srcset = self.client.get(reverse('api_recipes_detail', args=[recipe.pk])).data['image_srcset']
+        self.assertEqual(set(srcset), {'webp', 'jpeg'})
+        # The widths wider than the original are capped at its width.
+        self.assertEqual([candidate.rsplit(' ', 1)[1] for candidate in srcset['webp'].split(', ')],
+                         ['160w', '320w', '640w', '800w'])
+        for name in recipe.image_variants['formats']['jpeg'].values():
+            self.assertTrue(default_storage.exists(name))
+
+    def test_older_upload_stored_last_does_not_replace_a_newer_one(self):
+        recipe = self.recipes[0]
+        for name in ('older.png', 'newer.png'):
+            content = image_file()
+            content.name = name
+            self.upload_recipe_image(recipe, content)
+        older, newer = Job.objects.filter(task='uploads.store').order_by('id')
+
+        # The worker storing the older upload finishes after the one storing the newer upload.
+        with self.captureOnCommitCallbacks(execute=True):
+            store_staged_upload(**newer.payload)
+            store_staged_upload(**older.payload)
+
+        recipe.refresh_from_db()
+        self.assertTrue(recipe.image.name.startswith('recipes-images/newer'))
+        self.assertEqual(recipe.image_pending_upload, '')
+        self.assertFalse(storages['staging'].exists(older.payload['staged_name']))
+        # The older upload was copied to the storage before the worker found it replaced, and deleted again.
+        self.assertFalse([name for name in default_storage.listdir('recipes-images')[1] if name.startswith('older')])
+
+    def test_stored_upload_invalidates_conditional_gets(self):
+        url = reverse('api_recipes_detail', args=[self.recipes[0].pk])
+        etag = self.client.get(url)['ETag']
+        content = image_file()
+        content.name = 'upload.png'
+        self.upload_recipe_image(self.recipes[0], content)
+        self.client.cookies.clear()
+
+        run_due_jobs()
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_default_image_derivatives_are_shared(self):
+        default = Recipe._meta.get_field('image').default
+        variants = {recipe.image_variants['source'] for recipe in Recipe.objects.all()}
+        self.assertEqual(variants, {default})
+        self.assertEqual(len({str(recipe.image_variants) for recipe in Recipe.objects.all()}), 1)
+
+    def test_row_saved_while_the_job_for_its_image_runs_is_queued_again(self):
+        first, second = self.recipes[:2]
+        first.image.save('shared.png', image_file())
+        # A worker took the job and already looked up the rows showing the image.
+        Job.objects.filter(task='images.record_derivatives').update(status=JobStatusChoices.RUNNING)
+
+        second.image = first.image.name
+        second.save()
+        run_due_jobs()
+
+        second.refresh_from_db()
+        self.assertEqual(second.image_variants['source'], first.image.name)
+        # The running job finds the derivatives recorded and does not generate them again.
+        self.assertEqual(record_image_derivatives(Recipe, 'image', first.image.name), 0)
+
+    def test_unreadable_image_has_no_srcset_and_is_retried(self):
+        recipe = self.recipes[0]
+        recipe.image.save('broken.png', ContentFile(b'not an image'))
+        with self.assertLogs('ManjaBook.jobs', 'WARNING'):
+            run_due_jobs()
+
+        job = Job.objects.get(task='images.record_derivatives', payload__name=recipe.image.name)
+        self.assertEqual((job.status, job.attempts), (JobStatusChoices.QUEUED, 1))
+        self.assertIn('UnidentifiedImageError', job.last_error)
+        self.assertEqual(self.client.get(reverse('api_recipes_detail', args=[recipe.pk])).data['image_srcset'], {})
+
+    def test_stale_derivatives_are_hidden_and_backfilled(self):
+        collection = self.collections[0]
+        RecipesCollection.objects.filter(pk=collection.pk).update(image='recipes-collections-images/other.png')
+        default_storage.save('recipes-collections-images/other.png', image_file())
+        self.assertEqual(
+            self.client.get(reverse('api_recipes_collection_detail', args=[collection.pk])).data['image_srcset'], {})
+
+        call_command('backfill_image_derivatives', stdout=StringIO())
+
+        collection.refresh_from_db()
+        self.assertEqual(collection.image_variants['source'], 'recipes-collections-images/other.png')
+        self.assertEqual(
+            set(self.client.get(reverse('api_recipes_collection_detail', args=[collection.pk])).data['image_srcset']),
+            {'webp', 'jpeg'})
+
+
+class DirectUploadTests(S3StorageMixin, QueryBudgetTestCase):
+    def png(self, **kwargs):
+        return image_file(**kwargs).read()
+
+    def request_upload(self, url_name, pk, content, content_type='image/png'):
+        return self.assertQueryBudget(QUERY_BUDGETS[url_name], 'post', reverse(url_name, args=[pk]),
+                                      {'content_type': content_type, 'size': len(content)}, format='json',
+                                      expected_status=201).data
+
+    def confirm_upload(self, url_name, pk, upload, expected_status=200):
+        return self.assertQueryBudget(QUERY_BUDGETS[url_name], 'post', reverse(url_name, args=[pk]),
+                                      {'token': upload['token']}, format='json', expected_status=expected_status)
+
+    def test_recipe_image(self):
+        self.authenticate()
+        recipe = self.recipes[0]
+        content = self.png(width=700, height=350)
+        upload = self.request_upload('api_recipes_image_upload', recipe.pk, content)
+        self.assertEqual(upload['fields']['Content-Type'], 'image/png')
+        self.assertEqual(self.post_to_storage(upload, content, 'image/png').status_code, 204)
+
+        response = self.confirm_upload('api_recipes_image_upload_confirm', recipe.pk, upload)
+
+        recipe.refresh_from_db()
+        self.assertTrue(recipe.image.name.startswith('recipes-images/'))
+        self.assertTrue(recipe.image.name.endswith('.png'))
+        self.assertIn(recipe.image.name, response.data['image'])
+        run_due_jobs()
+        recipe.refresh_from_db()
+        self.assertEqual(list(recipe.image_variants['formats']['webp']), ['160', '320', '640', '700'])
+
+    def test_staged_upload_stored_after_a_direct_upload_is_dropped(self):
+        self.authenticate()
+        recipe = self.recipes[0]
+        staged = image_file()
+        staged.name = 'staged.png'
+        self.client.patch(reverse('api_recipes_detail_multipart', args=[recipe.pk]), {'image': staged},
+                          format='multipart')
+        content = self.png()
+        upload = self.request_upload('api_recipes_image_upload', recipe.pk, content)
+        self.post_to_storage(upload, content, 'image/png')
+        self.confirm_upload('api_recipes_image_upload_confirm', recipe.pk, upload)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            run_due_jobs()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image.name, upload['fields']['key'])
+        self.assertEqual(Job.objects.get(task='uploads.store').status, JobStatusChoices.DONE)
+
+    def test_recipes_collection_image(self):
+        self.authenticate()
+        collection = self.collections[0]
+        content = self.png()
+        upload = self.request_upload('api_recipes_collection_image_upload', collection.pk, content)
+        self.post_to_storage(upload, content, 'image/png')
+
+        self.confirm_upload('api_recipes_collection_image_upload_confirm', collection.pk, upload)
+
+        collection.refresh_from_db()
+        self.assertTrue(collection.image.name.startswith('recipes-collections-images/'))
+
+    def test_invalid_upload_is_rejected_and_deleted(self):
+        self.authenticate()
+        recipe = self.recipes[0]
+        upload = self.request_upload('api_recipes_image_upload', recipe.pk, b'not an image')
+        self.post_to_storage(upload, b'not an image', 'image/png')
+        name = signing.loads(upload['token'], salt=UPLOAD_TOKEN_SALT)['name']
+
+        response = self.confirm_upload('api_recipes_image_upload_confirm', recipe.pk, upload, expected_status=400)
+
+        self.assertIn('image', response.data)
+        self.assertFalse(default_storage.exists(name))
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).image.name, recipe.image.name)
+
+    def test_upload_with_another_content_type_is_rejected(self):
+        self.authenticate()
+        content = image_file(image_format='JPEG').read()
+        upload = self.request_upload('api_recipes_image_upload', self.recipes[0].pk, content)
+        self.post_to_storage(upload, content, 'image/png')
+
+        self.confirm_upload('api_recipes_image_upload_confirm', self.recipes[0].pk, upload, expected_status=400)
+
+    def test_oversized_upload_is_rejected(self):
+        self.authenticate()
+        content = self.png()
+        upload = self.request_upload('api_recipes_image_upload', self.recipes[0].pk, content)
+        self.post_to_storage(upload, content, 'image/png')
+
+        with self.settings(DIRECT_UPLOADS={**settings.DIRECT_UPLOADS, 'MAX_SIZE': len(content) - 1}):
+            self.confirm_upload('api_recipes_image_upload_confirm', self.recipes[0].pk, upload, expected_status=400)
+
+    def test_confirm_needs_the_uploaded_object(self):
+        self.authenticate()
+        upload = self.request_upload('api_recipes_image_upload', self.recipes[0].pk, self.png())
+
+        self.confirm_upload('api_recipes_image_upload_confirm', self.recipes[0].pk, upload, expected_status=400)
+
+    def test_token_is_bound_to_its_recipe(self):
+        self.authenticate()
+        content = self.png()
+        upload = self.request_upload('api_recipes_image_upload', self.recipes[0].pk, content)
+        self.post_to_storage(upload, content, 'image/png')
+
+        self.confirm_upload('api_recipes_image_upload_confirm', self.recipes[1].pk, upload, expected_status=400)
+
+    def test_intent_validates_the_declared_file(self):
+        self.authenticate()
+        url = reverse('api_recipes_image_upload', args=[self.recipes[0].pk])
+        self.assertEqual(self.client.post(url, {'content_type': 'image/gif', 'size': 100}, format='json').status_code,
+                         400)
+        too_large = settings.DIRECT_UPLOADS['MAX_SIZE'] + 1
+        self.assertEqual(self.client.post(url, {'content_type': 'image/png', 'size': too_large},
+                                          format='json').status_code, 400)
+
+    def test_only_owners_upload(self):
+        self.authenticate(self.users[1])
+        response = self.client.post(reverse('api_recipes_image_upload', args=[self.recipes[0].pk]),
+                                    {'content_type': 'image/png', 'size': 100}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class MediaURLTests(S3StorageMixin, QueryBudgetTestCase):
+    def count_signatures(self):
+        return mock.patch.object(S3Storage, 'url', autospec=True, side_effect=S3Storage.url)
+
+    def test_recipes_list_signs_each_image_once(self):
+        with self.count_signatures() as url:
+            response = self.client.get(reverse('api_recipes_list'), {'page_size': 100})
+        self.assertEqual(response.status_code, 200)
+        signed = [call.args[1] for call in url.call_args_list]
+        self.assertTrue(signed)
+        self.assertEqual(len(signed), len(set(signed)))
+        self.assertIn('Signature=', response.data['results'][0]['image'])
+
+        with self.count_signatures() as url:
+            self.assertEqual(self.client.get(reverse('api_recipes_list'), {'page_size': 100}).data['results'],
+                             response.data['results'])
+        url.assert_not_called()
+
+    def test_signed_urls_are_renewed_before_they_expire(self):
+        resolve = media_url_resolver(default_storage)
+        lifetime = default_storage.querystring_expire - settings.MEDIA_URLS['SIGNED_URL_MARGIN']
+
+        with mock.patch('ManjaBook.media_urls.time.monotonic', return_value=1000.0) as monotonic, \
+                self.count_signatures() as url:
+            resolve('common/default-recipe-image.png')
+            monotonic.return_value += lifetime - 1
+            resolve('common/default-recipe-image.png')
+            self.assertEqual(url.call_count, 1)
+
+            monotonic.return_value += 1
+            resolve('common/default-recipe-image.png')
+            self.assertEqual(url.call_count, 2)
+
+    def test_cache_keeps_the_recently_used_urls_within_its_size(self):
+        with self.settings(MEDIA_URLS={**settings.MEDIA_URLS, 'CACHE_SIZE': 2}):
+            resolve = media_url_resolver(default_storage)
+            for name in ('a.png', 'b.png', 'a.png', 'c.png'):
+                resolve(name)
+            self.assertEqual(list(resolve.urls), ['a.png', 'c.png'])
+
+            # Request threads share the resolver.
+            names = [f'{index % 7}.png' for index in range(500)]
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                urls = list(executor.map(resolve, names))
+            self.assertEqual(len(urls), len(names))
+            self.assertLessEqual(len(resolve.urls), 2)
+
+    def test_public_bucket_urls_are_built_from_media_url(self):
+        with self.settings(MEDIA_URL='http://localhost:9000/manjabook-test/',
+                           MEDIA_URLS={**settings.MEDIA_URLS, 'PUBLIC_STORAGES': ('default',)}), \
+                self.count_signatures() as url:
+            self.assertEqual(media_url_resolver(default_storage)('recipes-images/pasta al forno.png'),
+                             'http://localhost:9000/manjabook-test/recipes-images/pasta%20al%20forno.png')
+            response = self.client.get(reverse('api_recipes_list'))
+
+        url.assert_not_called()
+        self.assertEqual(response.data['results'][0]['image'],
+                         'http://localhost:9000/manjabook-test/common/default-recipe-image.png')
+
+
+class RecipeTotalNutrientsTests(QueryBudgetTestCase):
+    """
+    The nutrient totals stored on a recipe stay the sum of its products through every write.
+    """
+
+    def assertTotalsInSync(self, recipe):
+        recipe.refresh_from_db()
+        recipe_products = list(recipe.recipe_products.all())
+        self.assertEqual({field: getattr(recipe, field) for field in NUTRIENT_FIELDS},
+                         {field: sum(getattr(recipe_product, field) for recipe_product in recipe_products)
+                          for field in NUTRIENT_FIELDS})
+
+    def recipe_data(self, products):
+        return {'name': 'Totals recipe', 'quick_description': 'Summed up.', 'portions': 2, 'time_to_cook': 5,
+                'time_to_prepare': 5, 'preparation': 'Mix it.',
+                'products': [{'product_id': product.pk, 'quantity': quantity, 'unit_id': self.units[0].pk}
+                             for product, quantity in products]}
+
+    def test_created_recipe_totals(self):
+        self.authenticate()
+        response = self.client.post(reverse('api_recipes_list'),
+                                    self.recipe_data([(self.products[4], '120'), (self.products[7], '35')]),
+                                    format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+        recipe = Recipe.objects.get(name='Totals recipe')
+        # 5 g of protein per 100 g for 120 g, and 8 g per 100 g for 35 g, in milligrams
+        self.assertEqual(recipe.protein, 6000 + 2800)
+        self.assertTotalsInSync(recipe)
+
+    def test_updated_recipe_totals(self):
+        self.authenticate()
+        recipe = self.recipes[0]
+        response = self.client.put(reverse('api_recipes_detail', args=[recipe.pk]),
+                                   self.recipe_data([(self.products[1], '10'), (self.products[50], '999')]),
+                                   format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        self.assertEqual(recipe.recipe_products.count(), 2)
+        self.assertTotalsInSync(recipe)
+
+    def test_recipe_product_writes_refresh_the_totals(self):
+        recipe = self.recipes[1]
+        recipe_product = recipe.recipe_products.first()
+        recipe_product.quantity = Decimal('321.5')
+        recipe_product.save()
+        self.assertTotalsInSync(recipe)
+
+        recipe_product.delete()
+        self.assertTotalsInSync(recipe)
+
+        recipe.recipe_products.all().delete()
+        self.assertTotalsInSync(recipe)
+        self.assertEqual(recipe.calories, 0)
+
+    def test_stale_totals_are_found(self):
+        self.assertFalse(Recipe.objects.with_stale_total_nutrients().exists())
+
+        Recipe.objects.filter(pk=self.recipes[2].pk).update(fibre=0)
+        self.assertEqual(list(Recipe.objects.with_stale_total_nutrients()), [self.recipes[2]])
+
+        Recipe.objects.filter(pk=self.recipes[2].pk).refresh_total_nutrients()
+        self.assertFalse(Recipe.objects.with_stale_total_nutrients().exists())
+
+
+class RecipeProductsDiffTests(QueryBudgetTestCase):
+    """
+    Updating a recipe writes only the difference between its stored and incoming products.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate()
+        self.recipe = self.recipes[3]
+
+    def stored_products(self):
+        return [{'product_id': recipe_product.product_id, 'quantity': str(recipe_product.quantity),
+                 'unit_id': recipe_product.unit_id, 'custom_unit_id': recipe_product.custom_unit_id}
+                for recipe_product in self.recipe.recipe_products.order_by('id')]
+
+    def put(self, products):
+        data = {'name': self.recipe.name, 'quick_description': self.recipe.quick_description,
+                'portions': self.recipe.portions, 'time_to_cook': self.recipe.time_to_cook,
+                'time_to_prepare': self.recipe.time_to_prepare, 'preparation': self.recipe.preparation,
+                'products': products}
+        return self.client.put(reverse('api_recipes_detail', args=[self.recipe.pk]), data, format='json')
+
+    def put_products(self, products):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.put(products)
+        self.assertEqual(response.status_code, 200, response.content)
+
+        return Counter(query['sql'].split(' ', 1)[0] for query in queries.captured_queries
+                       if query['sql'].startswith(('INSERT INTO "inventory_recipeproduct"',
+                                                   'UPDATE "inventory_recipeproduct"',
+                                                   'DELETE FROM "inventory_recipeproduct"')))
+
+    def test_unchanged_products_write_nothing(self):
+        products = self.stored_products()
+        ids_before = list(self.recipe.recipe_products.order_by('id').values_list('id', flat=True))
+
+        self.assertEqual(self.put_products(products[::-1]), Counter())
+        self.assertEqual(list(self.recipe.recipe_products.order_by('id').values_list('id', flat=True)), ids_before)
+
+    def test_changes_are_written_in_one_statement_each(self):
+        products = self.stored_products()
+        kept_id, changed_id, *removed_ids = self.recipe.recipe_products.order_by('id').values_list('id', flat=True)
+        products = [products[0], {**products[1], 'quantity': '42.50'},
+                    {'product_id': self.products[59].pk, 'quantity': '10', 'unit_id': self.units[1].pk},
+                    {'product_id': self.products[58].pk, 'quantity': '20', 'unit_id': self.units[0].pk}]
+
+        self.assertEqual(self.put_products(products), Counter({'INSERT': 1, 'UPDATE': 1, 'DELETE': 1}))
+
+        stored = {recipe_product.id: recipe_product for recipe_product in self.recipe.recipe_products.all()}
+        self.assertEqual(len(stored), 4)
+        self.assertIn(kept_id, stored)
+        self.assertEqual(stored[changed_id].quantity, Decimal('42.50'))
+        self.assertFalse(set(removed_ids) & stored.keys())
+        self.assertCountEqual([recipe_product.product_id for recipe_product in stored.values()],
+                              [product['product_id'] for product in products])
+        self.assertFalse(Recipe.objects.with_stale_total_nutrients().exists())
+
+    def test_quantities_are_validated(self):
+        products = self.stored_products()
+
+        for quantity, message in (('-50', "Quantity must be at least 0.01."), ('0', "Quantity must be at least 0.01."),
+                                  ('1000.02', "Quantity must be lower than 1000!"),
+                                  ('1.234', "Ensure that there are no more than 2 decimal places.")):
+            with self.subTest(quantity=quantity):
+                response = self.put([{**products[0], 'quantity': quantity}, *products[1:]])
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(message, response.data['products'])
+
+        self.assertEqual(self.stored_products(), products)
+        self.assertFalse(Recipe.objects.with_stale_total_nutrients().exists())
+
+    def test_rows_of_a_product_are_paired_by_their_values(self):
+        product, unit = self.products[0], self.units[0]
+        rows = [{'product_id': product.pk, 'quantity': quantity, 'unit_id': unit.pk} for quantity in ('5', '7')]
+        RecipeProduct.objects.filter(recipe=self.recipe).delete()
+        RecipeProduct.objects.bulk_create(RecipeProduct(recipe=self.recipe, product=product, unit=unit,
+                                                        quantity=Decimal(row['quantity'])) for row in rows)
+
+        self.assertEqual(self.put_products(rows[::-1]), Counter())
+        self.assertEqual(self.put_products([rows[1], {**rows[0], 'quantity': '9'}]), Counter({'UPDATE': 1}))
+        self.assertCountEqual(self.recipe.recipe_products.values_list('quantity', flat=True),
+                              [Decimal(7), Decimal(9)])
+
+
+class RecipeProductNutrientsTests(QueryBudgetTestCase):
+    def assertRecipeProductsUpToDate(self, recipe_products):
+        recipe_products = list(recipe_products.select_related('product', 'unit', 'custom_unit'))
+        self.assertTrue(recipe_products)
+        for recipe_product in recipe_products:
+            stored = {field: getattr(recipe_product, field) for field in NUTRIENT_FIELDS}
+            recipe_product.calculate_nutrients()
+            self.assertEqual(stored, {field: getattr(recipe_product, field) for field in NUTRIENT_FIELDS})
+        self.assertFalse(Recipe.objects.with_stale_total_nutrients().exists())
+
+    def test_nutrient_change_reaches_recipes(self):
+        product = self.products[0]
+        edited_before = dict(Recipe.objects.filter(recipe_products__product=product).values_list('id', 'last_edit_at'))
+        product.calories, product.salt = 150, 1275
+        product.save()
+
+        self.assertEqual(Job.objects.filter(task='inventory.propagate_product_nutrients').count(), 1)
+        run_due_jobs()
+
+        self.assertRecipeProductsUpToDate(RecipeProduct.objects.filter(product=product))
+        for recipe_id, last_edit_at in Recipe.objects.filter(id__in=edited_before).values_list('id', 'last_edit_at'):
+            self.assertGreater(last_edit_at, edited_before[recipe_id])
+
+    def test_recipe_products_are_updated_in_batches(self):
+        product = self.products[1]
+        product.protein = 33330
+        with self.settings(NUTRIENT_PROPAGATION={'BATCH_SIZE': 2}):
+            product.save()
+            run_due_jobs()
+
+        self.assertRecipeProductsUpToDate(RecipeProduct.objects.filter(product=product))
+
+    def test_unchanged_nutrients_write_nothing(self):
+        product = self.products[2]
+        edited_before = list(Recipe.objects.order_by('id').values_list('last_edit_at', flat=True))
+        product.brand = 'Another brand'
+        product.save()
+        self.assertFalse(Job.objects.filter(task='inventory.propagate_product_nutrients').exists())
+
+        # A job queued before the stored nutrients changed back finds every row up to date.
+        queue_product_nutrients_propagation(product)
+        run_due_jobs()
+
+        self.assertEqual(list(Recipe.objects.order_by('id').values_list('last_edit_at', flat=True)), edited_before)
+
+    def overflow_recipe_product(self, product):
+        recipe_product = RecipeProduct.objects.filter(product=product).order_by('id').first()
+        # 1000 kg instead of grams: its calculated nutrients no longer fit the columns.
+        RecipeProduct.objects.filter(pk=recipe_product.pk).update(quantity=Decimal(1000), unit=self.units[1])
+        return recipe_product
+
+    def test_overflowing_nutrients_are_left_unchanged(self):
+        product = self.products[4]
+        overflowing = self.overflow_recipe_product(product)
+        product.calories += 1
+        product.save()
+
+        with self.assertLogs('ManjaBook.nutrients', 'WARNING') as logs:
+            run_due_jobs()
+
+        self.assertIn(f': {overflowing.pk}', logs.output[0])
+        stored = RecipeProduct.objects.get(pk=overflowing.pk)
+        self.assertEqual({field: getattr(stored, field) for field in NUTRIENT_FIELDS},
+                         {field: getattr(overflowing, field) for field in NUTRIENT_FIELDS})
+        self.assertRecipeProductsUpToDate(RecipeProduct.objects.filter(product=product).exclude(pk=overflowing.pk))
+
+    def test_other_fields_do_not_propagate(self):
+        product = self.products[3]
+        product.name = 'Renamed product'
+        product.save(update_fields=['name'])
+
+        self.assertFalse(Job.objects.filter(task='inventory.propagate_product_nutrients').exists())
+
+    def rebuild_nutrients(self, *args, **kwargs):
+        stdout = StringIO()
+        kwargs.setdefault('checkpoint', os.path.join(self.enterContext(TemporaryDirectory()), 'checkpoint.json'))
+        call_command('rebuild_nutrients', *args, workers=1, partition_size=100, batch_size=30, stdout=stdout,
+                     **kwargs)
+        return stdout.getvalue()
+
+    def test_rebuild_after_a_unit_rate_correction(self):
+        Unit.objects.filter(pk=self.units[0].pk).update(convert_to_base_rate=Decimal('1.5'))
+
+        output = self.rebuild_nutrients('--dry-run')
+        self.assertIn(f'would change {RecipeProduct.objects.filter(custom_unit=None).count()}.', output)
+        self.assertIn('calories', output)
+        self.assertFalse(Recipe.objects.with_stale_total_nutrients().exists())
+
+        self.rebuild_nutrients()
+        self.assertRecipeProductsUpToDate(RecipeProduct.objects.all())
+
+    def test_rebuild_reports_overflowing_recipe_products(self):
+        overflowing = self.overflow_recipe_product(self.products[5])
+        stored = RecipeProduct.objects.filter(pk=overflowing.pk).values(*NUTRIENT_FIELDS).get()
+
+        report = f'Left 1 recipe products unchanged, their calculated nutrients overflow the columns: {overflowing.pk}'
+
+        stderr = StringIO()
+        self.rebuild_nutrients('--dry-run', stderr=stderr)
+        self.assertIn(report, stderr.getvalue())
+
+        stderr = StringIO()
+        with self.assertLogs('ManjaBook.nutrients', 'WARNING'):
+            self.rebuild_nutrients(stderr=stderr)
+        self.assertIn(report, stderr.getvalue())
+
+        self.assertEqual(RecipeProduct.objects.filter(pk=overflowing.pk).values(*NUTRIENT_FIELDS).get(), stored)
+
+    def write_checkpoint(self, done):
+        checkpoint = os.path.join(self.enterContext(TemporaryDirectory()), 'checkpoint.json')
+        with open(checkpoint, 'w') as file:
+            json.dump({'partition_size': 100, 'last_id': RecipeProduct.objects.aggregate(last=Max('id'))['last'],
+                       'started_at': '2026-10-17T08:00:00+00:00', 'done': done}, file)
+        return checkpoint
+
+    def test_rebuild_resumes_from_its_checkpoint(self):
+        Unit.objects.filter(pk=self.units[0].pk).update(convert_to_base_rate=Decimal('1.5'))
+        first_id = RecipeProduct.objects.order_by('id').values_list('id', flat=True).first()
+        checkpoint = self.write_checkpoint([first_id // 100 * 100])
+
+        output = self.rebuild_nutrients('--resume', checkpoint=checkpoint)
+
+        self.assertIn('Resuming the rebuild started at 2026-10-17T08:00:00+00:00', output)
+        self.assertIn('ranges already rebuilt', output)
+        self.assertFalse(os.path.exists(checkpoint))
+        skipped = RecipeProduct.objects.filter(id__lt=first_id // 100 * 100 + 100, custom_unit=None)
+        self.assertTrue(RecipeProduct.objects.filter(pk__in=skipped).with_stale_nutrients().exists())
+        self.assertFalse(RecipeProduct.objects.exclude(pk__in=skipped).with_stale_nutrients().exists())
+
+
+    def test_rebuild_only_resumes_on_request(self):
+        checkpoint = self.write_checkpoint([])
+
+        with self.assertRaisesMessage(CommandError, 'records a rebuild started at 2026-10-17T08:00:00+00:00'):
+            self.rebuild_nutrients(checkpoint=checkpoint)
+
+        self.rebuild_nutrients('--restart', checkpoint=checkpoint)
+        self.assertFalse(os.path.exists(checkpoint))
+
+
+class FixedPointNutrientsTests(QueryBudgetTestCase):
+    """
+    Nutrients are stored in integer thousandths, but entered, validated, filtered and shown in units.
+    """
+
+    def create_product(self, **nutrients):
+        self.authenticate()
+        return self.client.post(reverse('api_products_list'), {'name': 'Oats', 'brand': 'Mill', 'nutrition_per': 'g',
+                                                               'shopped_from': [], **nutrients}, format='json')
+
+    def test_nutrients_are_entered_and_shown_in_units(self):
+        response = self.create_product(calories=389, protein='16.89', salt='0.005', fibre='10.6')
+        self.assertEqual(response.status_code, 201, response.content)
+
+        product = Product.objects.get(pk=response.data['id'])
+        self.assertEqual((product.calories, product.protein, product.salt, product.fibre), (389, 16890, 5, 10600))
+        detail = self.client.get(reverse('api_products_detail', args=[product.pk])).json()
+        self.assertEqual((detail['protein'], detail['salt'], detail['fibre']), ('16.89', '0.005', '10.60'))
+
+    def test_nutrients_are_validated_in_units(self):
+        response = self.create_product(protein='250.01', fats='1.234')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['protein'], ['Ensure this value is less than or equal to 250.'])
+        self.assertEqual(response.data['fats'], ['Ensure that there are no more than 2 decimal places.'])
+
+    def test_recipe_totals_are_the_sum_of_the_shown_nutrients(self):
+        recipe = self.client.get(reverse('api_recipes_detail', args=[self.recipes[0].pk])).json()
+
+        for field in NUTRIENT_FIELDS:
+            self.assertEqual(Decimal(recipe['total_nutrients'][field]),
+                             sum(Decimal(product[field]) for product in recipe['products']))
+        self.assertRegex(recipe['total_nutrients']['salt'], r'^\d+\.\d{3}$')
+
+    def test_range_filters_take_units(self):
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        per_portion = Recipe._meta.get_field('protein_per_portion').output_field.to_units(recipe.protein_per_portion)
+
+        def recipe_ids(filters):
+            response = self.client.get(reverse('api_recipes_list'), {'page_size': 100, **filters})
+            return {result['id'] for result in response.data['results']}
+
+        self.assertIn(recipe.pk, recipe_ids({'protein_per_portion__gte': per_portion,
+                                             'protein_per_portion__lte': per_portion}))
+        self.assertNotIn(recipe.pk, recipe_ids({'protein_per_portion__gte': per_portion + Decimal('0.01')}))
+        self.assertEqual(recipe_ids({'calories__gte': '1e30'}), set())
+
+
+class RecipeNutrientsPreviewTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.authenticate()
+
+    def draft_products(self):
+        return [{'product_id': product.pk, 'quantity': f'{i % 7 + 1}.25', 'unit_id': self.units[i % 4].pk,
+                 'custom_unit_id': self.custom_units[i % 10].pk if i % 3 == 0 else None}
+                for i, product in enumerate(self.products[:50])]
+
+    def preview(self, products):
+        return self.client.post(reverse('api_recipes_nutrients_preview'), {'products': products}, format='json')
+
+    def test_preview_matches_the_saved_recipe(self):
+        products = self.draft_products()
+        preview = self.preview(products)
+        self.assertEqual(preview.status_code, 200, preview.content)
+
+        response = self.client.post(reverse('api_recipes_list'), {
+            'name': 'Previewed recipe', 'quick_description': 'Checked before saving.', 'portions': 2,
+            'time_to_cook': 5, 'time_to_prepare': 5, 'preparation': 'Mix it.', 'products': products,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        recipe = self.client.get(reverse('api_recipes_detail',
+                                         args=[Recipe.objects.get(name='Previewed recipe').pk])).json()
+
+        self.assertEqual(preview.json()['total_nutrients'], recipe['total_nutrients'])
+        self.assertCountEqual([(product['product_id'], *(product[field] for field in NUTRIENT_FIELDS))
+                               for product in preview.json()['products']],
+                              [(product['product']['id'], *(product[field] for field in NUTRIENT_FIELDS))
+                               for product in recipe['products']])
+
+    def test_warm_preview_makes_no_queries(self):
+        self.preview(self.draft_products())
+        with self.assertNumQueries(0):
+            self.assertEqual(self.preview(self.draft_products()).status_code, 200)
+
+    def test_saving_a_product_reloads_the_registry(self):
+        product = self.products[0]
+        draft = [{'product_id': product.pk, 'quantity': '100', 'unit_id': self.units[0].pk}]
+        self.assertEqual(self.preview(draft).data['products'][0]['protein'], '1.00')
+
+        product.protein = 42420
+        product.save()
+        self.assertEqual(self.preview(draft).data['products'][0]['protein'], '42.42')
+
+    def test_invalid_drafts_are_rejected(self):
+        missing = self.preview([{'product_id': 0, 'quantity': '100', 'unit_id': self.units[0].pk}])
+        self.assertEqual(missing.status_code, 400)
+        self.assertEqual(missing.data['products'], ["Product with id 0 does not exist."])
+
+        too_large = self.preview([{'product_id': self.products[9].pk, 'quantity': '900', 'unit_id': self.units[1].pk}])
+        self.assertEqual(too_large.status_code, 400)
+        self.assertIn('too large', too_large.data['products'][0])
+
+        self.assertEqual(self.preview([]).status_code, 400)
+
+    def test_quantities_are_validated_like_saved_recipes(self):
+        for quantity in ('-50', '0', '0.001', '1000.02'):
+            with self.subTest(quantity=quantity):
+                response = self.preview([{'product_id': self.products[0].pk, 'quantity': quantity,
+                                          'unit_id': self.units[0].pk}])
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('products', response.data)
+
+
+class UnitRegistryTests(QueryBudgetTestCase):
+    def test_warm_registry_embeds_units_without_queries(self):
+        url = reverse('api_recipes_products_list')
+        cold = self.client.get(url, {'page_size': 100}).data['results']
+        warm = self.assertQueryBudget(2, 'get', url, {'page_size': 100}, expected_status=200).data['results']
+
+        self.assertEqual(warm, cold)
+        recipe_product = RecipeProduct.objects.get(pk=cold[0]['id'])
+        self.assertEqual(cold[0]['unit'], UnitBaseSerializer(recipe_product.unit).data)
+        with_custom_unit = next(row for row in cold if row['custom_unit'] is not None)
+        custom_unit = CustomUnit.objects.get(pk=with_custom_unit['custom_unit']['id'])
+        self.assertEqual(with_custom_unit['custom_unit'], CustomUnitBaseSerializer(custom_unit).data)
+
+    def test_saving_a_unit_reloads_the_registry(self):
+        unit_registry.snapshot()
+        unit = self.units[0]
+        unit.convert_to_base_rate = Decimal('2.5')
+        unit.save()
+
+        self.assertEqual(unit_registry.snapshot().convert_to_base_rate(unit.pk), Decimal('2.5'))
+
+    def test_changes_from_other_processes_are_seen_at_the_next_version_check(self):
+        unit = self.units[0]
+        unit_registry.snapshot()
+        # As another process would: the rows and the shared version change, not this process's registry.
+        Unit.objects.filter(pk=unit.pk).update(convert_to_base_rate=Decimal('2.5'))
+        bump_versions(UNITS)
+
+        with mock.patch.object(unit_registry, 'version_check_interval', 60):
+            self.assertEqual(unit_registry.snapshot().convert_to_base_rate(unit.pk), Decimal(1))
+        with mock.patch.object(unit_registry, 'version_check_interval', 0):
+            self.assertEqual(unit_registry.snapshot().convert_to_base_rate(unit.pk), Decimal('2.5'))
+
+    def test_snapshots_expire_without_a_version_change(self):
+        unit = self.units[0]
+        unit_registry.snapshot()
+        # As a process that never sees the version bumped elsewhere, e.g. without a shared cache
+        Unit.objects.filter(pk=unit.pk).update(convert_to_base_rate=Decimal('2.5'))
+
+        with mock.patch.object(unit_registry, 'version_check_interval', 0):
+            self.assertEqual(unit_registry.snapshot().convert_to_base_rate(unit.pk), Decimal(1))
+            with mock.patch.object(unit_registry, 'max_age', 0):
+                self.assertEqual(unit_registry.snapshot().convert_to_base_rate(unit.pk), Decimal('2.5'))
+
+    def test_rows_missing_from_the_snapshot_are_read_from_the_database(self):
+        snapshot = unit_registry.snapshot()
+        custom_unit, = CustomUnit.objects.bulk_create([CustomUnit(unit=self.units[2], custom_convert_to_base_rate=7)])
+
+        self.assertEqual(snapshot.convert_to_base_rate(self.units[2].pk, custom_unit.pk), Decimal(7))
+        self.assertEqual(snapshot.representation(CustomUnitBaseSerializer, custom_unit.pk)['id'], custom_unit.pk)
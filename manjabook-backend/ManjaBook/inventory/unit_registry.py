@@ -0,0 +1,147 @@
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.utils.functional import cached_property
+from rest_framework import serializers
+
+from ManjaBook.cache_versions import UNITS, get_versions
+
+
+class UnitSnapshot:
+    """
+    Every Unit and CustomUnit row, as loaded at one version of the UNITS data. The instances are shared
+    between requests and threads, so they are only read.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.unit_model = apps.get_model('inventory', 'Unit')
+        self.custom_unit_model = apps.get_model('inventory', 'CustomUnit')
+
+        units = self.unit_model.objects.in_bulk()
+        custom_units = self.custom_unit_model.objects.in_bulk()
+        for custom_unit in custom_units.values():
+            custom_unit.unit = units[custom_unit.unit_id]
+
+        self.rows = {self.unit_model: units, self.custom_unit_model: custom_units}
+        self.representations = {}
+
+    def holds(self, model):
+        return model in self.rows
+
+    def in_bulk(self, model, ids):
+        """
+        Like `model.objects.in_bulk(ids)`. Rows created since the snapshot was loaded, which other processes
+        may not have seen the version of yet, are read from the database.
+        """
+        rows = self.rows[model]
+        found = {pk: rows[pk] for pk in ids if pk in rows}
+        missing = set(ids) - found.keys()
+        if missing:
+            queryset = model.objects.all()
+            if model is self.custom_unit_model:
+                queryset = queryset.select_related('unit')
+            found.update(queryset.in_bulk(missing))
+        return found
+
+    def get(self, model, pk):
+        return self.in_bulk(model, [pk]).get(pk)
+
+    def convert_to_base_rate(self, unit_id, custom_unit_id=None):
+        if custom_unit_id is not None:
+            return self.get(self.custom_unit_model, custom_unit_id).custom_convert_to_base_rate
+        return self.get(self.unit_model, unit_id).convert_to_base_rate
+
+    def representation(self, serializer_class, pk):
+        """
+        The output of the ModelSerializer `serializer_class` for a row, serialized once per snapshot.
+        """
+        key = (serializer_class, pk)
+        if key not in self.representations:
+            self.representations[key] = serializer_class(self.get(serializer_class.Meta.model, pk)).data
+        return dict(self.representations[key])
+
+
+class SnapshotRegistry:
+    """
+    Per-process snapshot of some tables, built by `snapshot_class(version)` and stamped with the
+    `version_namespace` version of ManjaBook.cache_versions, which every change of the rows bumps in any
+    process. Other processes compare it at most every `version_check_interval` seconds, while the process
+    making the change drops its snapshot right away (see ManjaBook.inventory.signals).
+
+    Snapshots are reloaded once `max_age` seconds old whatever their version, which bounds how long a process
+    that misses a version bump, e.g. without a shared cache, keeps using changed rows.
+    """
+    snapshot_class = None
+    version_namespace = None
+    settings_name = None
+
+    def __init__(self, version_check_interval=1.0, max_age=300.0):
+        self.version_check_interval = version_check_interval
+        self.max_age = max_age
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(**{option.lower(): value for option, value in getattr(settings, cls.settings_name, {}).items()})
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at < self.version_check_interval:
+            return snapshot
+
+        # Read before loading the rows, so a change committed meanwhile only ever makes the next call reload.
+        version, = get_versions(self.version_namespace)
+        with self._lock:
+            if (self._snapshot is None or self._snapshot.version != version or
+                    now - self._loaded_at >= self.max_age):
+                self._snapshot = self.snapshot_class(version)
+                self._loaded_at = now
+            self._checked_at = now
+            return self._snapshot
+
+    def clear(self):
+        with self._lock:
+            self._snapshot = None
+
+
+class UnitRegistry(SnapshotRegistry):
+    """
+    Per-process copy of the Unit and CustomUnit tables, which are small and read by every recipe product
+    write (conversion rates) and read (embedded units).
+    """
+    snapshot_class = UnitSnapshot
+    version_namespace = UNITS
+    settings_name = 'UNIT_REGISTRY'
+
+
+unit_registry = UnitRegistry.from_settings()
+
+
+class RegisteredUnitField(serializers.Field):
+    """
+    Read-only representation of the Unit or CustomUnit a foreign key points to, by `serializer_class`,
+    taken from the unit registry instead of a loaded related object.
+    """
+
+    def __init__(self, serializer_class, **kwargs):
+        self.serializer_class = serializer_class
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    @cached_property
+    def units(self):
+        # One snapshot for all the rows of a serializer.
+        return unit_registry.snapshot()
+
+    def get_attribute(self, instance):
+        return getattr(instance, f'{self.source}_id')
+
+    def to_representation(self, pk):
+        return self.units.representation(self.serializer_class, pk)
@@ -5,6 +5,7 @@ from ManjaBook.inventory import views
 urlpatterns = [
     path('products/', include([
         path('', views.ProductListView.as_view(), name='api_products_list'),
+        path('autocomplete/', views.ProductAutocompleteView.as_view(), name='api_products_autocomplete'),
         path('<int:pk>/', views.ProductDetailView.as_view(), name='api_products_detail'),
     ])),
     path('shops/', views.ShopListView.as_view(), name='api_shops_list'),
@@ -22,15 +23,25 @@ urlpatterns = [
     ])),
     path('recipes/', include([
         path('', views.RecipeListView.as_view(), name='api_recipes_list'),
+        path('nutrients-preview/', views.RecipeNutrientsPreviewView.as_view(), name='api_recipes_nutrients_preview'),
 
         path('<int:pk>/', include([
             path('', views.RecipeDetailView.as_view(), name='api_recipes_detail'),
             path('image/', views.RecipeMultipartUpdateView.as_view(), name='api_recipes_detail_multipart'),
+            path('image/upload/', views.RecipeImageUploadIntentView.as_view(), name='api_recipes_image_upload'),
+            path('image/upload/confirm/', views.RecipeImageUploadConfirmView.as_view(),
+                 name='api_recipes_image_upload_confirm'),
     ])),
     ])),
     path('recipes-collections/', include([
         path('', views.RecipesCollectionListView.as_view(), name='api_recipes_collection_list'),
-        path('<int:pk>/', views.RecipesCollectionDetailView.as_view(), name='api_recipes_collection_detail'),
+        path('<int:pk>/', include([
+            path('', views.RecipesCollectionDetailView.as_view(), name='api_recipes_collection_detail'),
+            path('image/upload/', views.RecipesCollectionImageUploadIntentView.as_view(),
+                 name='api_recipes_collection_image_upload'),
+            path('image/upload/confirm/', views.RecipesCollectionImageUploadConfirmView.as_view(),
+                 name='api_recipes_collection_image_upload_confirm'),
+        ])),
     ])),
     path('saved-recipes-collections/', include([
         path('', views.SavedRecipesCollectionListView.as_view(), name='api_saved_recipes_collection_list'),
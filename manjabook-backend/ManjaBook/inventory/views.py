@@ -1,6 +1,22 @@
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import TrigramWordSimilarity, SearchQuery, SearchRank
+from django.db.models import Prefetch, Q, F, FloatField, Max, Count
+from django.db.models.functions import Greatest, Cast
+from django.shortcuts import get_object_or_404
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
-from ManjaBook.accounts.permissions import IsOwnerOrAdmin
+from ManjaBook.accounts.permissions import IsOwnerOrAdmin, is_allowed_in_inventory
+from ManjaBook.cache_versions import PRODUCTS, SHOPS, UNITS, PROFILES, version_to_datetime
+from ManjaBook.conditional import ConditionalGetMixin, make_etag
+from ManjaBook.fixed_point import FixedPointField
+from ManjaBook.inventory.abstract_classes import NUTRIENT_FIELDS
+from ManjaBook.response_cache import CachedResponseMixin, VersionedViewMixin
+from ManjaBook.uploads import DirectUploadIntentView, DirectUploadConfirmView
+from ManjaBook.values_serializers import ValuesListMixin
 from ManjaBook.inventory.models import Product, Shop, Unit, CustomUnit, Recipe, RecipeProduct, RecipesCollection, \
     SavedRecipesCollection
 from rest_framework import generics as api_views, permissions, status
@@ -10,10 +26,31 @@ from ManjaBook.inventory.serializers import ProductCreateSerializer, ShopSeriali
     RecipesCollectionCreateSerializer, RecipesCollectionDetailSerializer, \
     SavedRecipesCollectionBaseSerializer, SavedRecipesCollectionCreateSerializer, \
     SavedRecipesCollectionDetailSerializer, RecipesCollectionModifySerializer, \
-    SimpleRecipesCollectionSerializer, RecipeProductCreateSerializer, RecipeUpdateSerializer, RecipeImageUpdateSerializer
+    SimpleRecipesCollectionSerializer, RecipeProductCreateSerializer, RecipeUpdateSerializer, \
+    RecipeImageUpdateSerializer, ProductAutocompleteSerializer, ProductValuesSerializer, \
+    SimpleRecipeValuesSerializer, RecipesCollectionDetailValuesSerializer, RecipeNutrientsPreviewSerializer
 
+UserModel = get_user_model()
 
-class ShopListView(api_views.ListCreateAPIView):
+
+class PublicConditionalGetMixin(ConditionalGetMixin, VersionedViewMixin):
+    """
+    Conditional GET for anonymous catalog reads, whose responses are the same for everyone
+    and can be revalidated by shared caches as well.
+    """
+    cache_control = {'public': True, 'no_cache': True}
+    vary_headers = ('Accept',)
+
+    def get_etag(self, request):
+        return make_etag(request.get_full_path(), *self.get_data_versions())
+
+    def get_last_modified(self, request):
+        return version_to_datetime(max(self.get_data_versions()))
+
+
+class ShopListView(PublicConditionalGetMixin, CachedResponseMixin, api_views.ListCreateAPIView):
+    version_namespaces = (SHOPS,)
+    ordering = ('id',)
     queryset = Shop.objects.all()
     serializer_class = ShopSerializer
 
@@ -28,10 +65,12 @@ class ShopListView(api_views.ListCreateAPIView):
         return super().get_authenticators()
 
 
-class ProductListView(api_views.ListCreateAPIView):
-    queryset = Product.objects.all()
+class ProductListView(ValuesListMixin, api_views.ListCreateAPIView):
+    queryset = Product.objects.prefetch_related('shopped_from')
+    ordering = ('id',)
 
     list_serializer_class = ProductBaseSerializer
+    values_serializer_class = ProductValuesSerializer
     create_serializer_class = ProductCreateSerializer
 
     serializer_class = list_serializer_class
@@ -57,8 +96,46 @@ class ProductListView(api_views.ListCreateAPIView):
         return queryset
 
 
-class ProductDetailView(api_views.RetrieveAPIView):
-    queryset = Product.objects.all()
+class ProductAutocompleteView(api_views.ListAPIView):
+    """
+    Typeahead over product names and brands, served by the pg_trgm GIN indexes and ranked by similarity.
+    """
+    serializer_class = ProductAutocompleteSerializer
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    pagination_class = None
+
+    min_search_length = 2
+    default_limit = 10
+    max_limit = 20
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def get_queryset(self):
+        search_term = self.request.query_params.get('search', '').strip()
+        if len(search_term) < self.min_search_length:
+            return Product.objects.none()
+
+        similarity = Greatest(TrigramWordSimilarity(search_term, 'name'),
+                              TrigramWordSimilarity(search_term, 'brand'))
+
+        return (Product.objects
+                .filter(Q(name__icontains=search_term) |
+                        Q(brand__icontains=search_term) |
+                        Q(name__trigram_word_similar=search_term))
+                .annotate(similarity=similarity)
+                .order_by('-similarity', 'name', 'id')
+                .only('id', 'name', 'brand')[:self.get_limit()])
+
+
+class ProductDetailView(PublicConditionalGetMixin, CachedResponseMixin, api_views.RetrieveAPIView):
+    version_namespaces = (PRODUCTS, SHOPS)
+    queryset = Product.objects.prefetch_related('shopped_from')
     serializer_class = ProductBaseSerializer
     permission_classes = (permissions.AllowAny,)
 
@@ -68,9 +145,11 @@ class ProductDetailView(api_views.RetrieveAPIView):
         return super().get_authenticators()
 
 
-class UnitListView(api_views.ListCreateAPIView):
+class UnitListView(PublicConditionalGetMixin, CachedResponseMixin, api_views.ListCreateAPIView):
+    version_namespaces = (UNITS,)
     queryset = Unit.objects.all()
     serializer_class = UnitBaseSerializer
+    ordering = ('id',)
 
     def get_permissions(self):
         if self.request.method == 'POST':
@@ -83,17 +162,20 @@ class UnitListView(api_views.ListCreateAPIView):
         return super().get_authenticators()
 
 
-class UnitDetailView(api_views.RetrieveAPIView):
+class UnitDetailView(PublicConditionalGetMixin, CachedResponseMixin, api_views.RetrieveAPIView):
+    version_namespaces = (UNITS,)
     queryset = Unit.objects.all()
     serializer_class = UnitBaseSerializer
     permission_classes = (permissions.AllowAny,)
 
 
-class CustomUnitCreateView(api_views.ListCreateAPIView):
+class CustomUnitCreateView(PublicConditionalGetMixin, CachedResponseMixin, api_views.ListCreateAPIView):
+    version_namespaces = (UNITS,)
     list_serializer_class = CustomUnitListSerializer
     create_serializer_class = CustomUnitCreateSerializer
 
     serializer_class = list_serializer_class
+    ordering = ('id',)
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def get_serializer_class(self):
@@ -104,6 +186,11 @@ class CustomUnitCreateView(api_views.ListCreateAPIView):
     def get_queryset(self):
         return CustomUnit.objects.select_related('unit')
 
+    def get_authenticators(self):
+        if self.request.method == 'GET':
+            return []
+        return super().get_authenticators()
+
 
 class CustomUnitDetailView(api_views.RetrieveAPIView):
     queryset = CustomUnit.objects.all()
@@ -115,9 +202,12 @@ class RecipeProductListView(api_views.ListCreateAPIView):
     list_serializer_class = RecipeProductSerializer
     create_serializer_class = RecipeProductCreateSerializer
 
-    queryset = RecipeProduct.objects.all()
+    queryset = (RecipeProduct.objects
+                .select_related('product')
+                .prefetch_related('product__shopped_from'))
     serializer_class = list_serializer_class
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    ordering = ('id',)
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -129,7 +219,9 @@ class RecipeProductDetailView(api_views.RetrieveUpdateDestroyAPIView):
     list_serializer_class = RecipeProductSerializer
     create_serializer_class = RecipeProductCreateSerializer
 
-    queryset = RecipeProduct.objects.all()
+    queryset = (RecipeProduct.objects
+                .select_related('product')
+                .prefetch_related('product__shopped_from'))
     serializer_class = list_serializer_class
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
@@ -139,49 +231,120 @@ class RecipeProductDetailView(api_views.RetrieveUpdateDestroyAPIView):
         return self.create_serializer_class
 
 
-class RecipeListView(api_views.ListCreateAPIView):
+class RecipeListView(ValuesListMixin, api_views.ListCreateAPIView):
     list_serializer_class = SimpleRecipeSerializer
+    values_serializer_class = SimpleRecipeValuesSerializer
     create_serializer_class = RecipeCreateSerializer
 
     serializer_class = list_serializer_class
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    range_filter_fields = (NUTRIENT_FIELDS +
+                           tuple(f'{field}_per_portion' for field in NUTRIENT_FIELDS) +
+                           ('time_to_cook', 'time_to_prepare'))
+    range_filter_lookups = ('gte', 'lte')
+
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return self.create_serializer_class
         return self.serializer_class
 
     def get_queryset(self):
-        queryset = (Recipe.objects.select_related('created_by')
-                    .prefetch_related('recipe_products'))
+        queryset = Recipe.objects.select_related('created_by__user').defer('search_vector')
 
         search_term = self.request.query_params.get('search', None)
         if search_term:
-            queryset = queryset.filter(name__icontains=search_term)
-
-        limit = self.request.query_params.get('limit', None)
-        if limit:
-            try:
-                limit = int(limit)
-                queryset = queryset.order_by('-created_at')[:limit]
-            except ValueError:
-                pass
-
-        return queryset
+            search_query = SearchQuery(search_term, search_type='websearch', config=settings.RECIPE_SEARCH_CONFIG)
+            queryset = (queryset
+                        .filter(search_vector=search_query)
+                        .annotate(search_rank=Cast(SearchRank(F('search_vector'), search_query), FloatField())))
+            self.ordering = ('-search_rank', '-id')
+
+        return self.filter_ranges(queryset)
+
+    def filter_ranges(self, queryset):
+        """
+        Apply filters like `?protein_per_portion__gte=30&time_to_cook__lte=30`, served by the composite indexes.
+        """
+        filters = {}
+        for field in self.range_filter_fields:
+            for lookup in self.range_filter_lookups:
+                param = f'{field}__{lookup}'
+                value = self.request.query_params.get(param, None)
+                if value is None:
+                    continue
+
+                try:
+                    number = Decimal(value)
+                except InvalidOperation:
+                    raise ValidationError({param: "A valid number is required."})
+
+                if not number.is_finite():
+                    raise ValidationError({param: "A valid number is required."})
+                filters[param] = self.range_filter_value(field, number)
+
+        return queryset.filter(**filters)
+
+    @staticmethod
+    def range_filter_value(field, number):
+        # Nutrients are compared in their stored thousandths; numbers past the column's range match like its limit.
+        model_field = Recipe._meta.get_field(field)
+        model_field = getattr(model_field, 'output_field', model_field)
+        if not isinstance(model_field, FixedPointField):
+            return number
+
+        limit = Decimal(10) ** (model_field.max_digits - model_field.decimal_places)
+        return model_field.to_stored(max(-limit, min(number, limit)))
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user.profile)
 
 
-class RecipeDetailView(api_views.RetrieveUpdateDestroyAPIView):
+class RecipeNutrientsPreviewView(api_views.GenericAPIView):
+    """
+    Nutrients of a draft recipe's products and their totals, calculated as saving it would without writing it.
+    """
+    serializer_class = RecipeNutrientsPreviewSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.data)
+
+
+class RecipeDetailView(ConditionalGetMixin, VersionedViewMixin, api_views.RetrieveUpdateDestroyAPIView):
     detail_serializer_class = RecipeDetailSerializer
     update_serializer_class = RecipeUpdateSerializer
     serializer_class = detail_serializer_class
+    version_namespaces = (PRODUCTS, SHOPS, UNITS, PROFILES)
 
     def get_queryset(self):
-        return (Recipe.objects
-                .prefetch_related('recipe_products')
-                .prefetch_related('recipe_products__unit', 'recipe_products__custom_unit'))
+        return Recipe.objects.with_products()
+
+    def get_freshness(self):
+        if not hasattr(self, '_freshness'):
+            self._freshness = (Recipe.objects.filter(pk=self.kwargs['pk'])
+                               .values('last_edit_at', 'created_by')
+                               .first())
+        return self._freshness
+
+    def get_etag(self, request):
+        freshness = self.get_freshness()
+        if freshness is None:
+            return None
+
+        # The representation embeds is_owner, so it differs between owners and everyone else.
+        is_owner = (request.user.is_authenticated and freshness['created_by'] is not None and
+                    is_allowed_in_inventory(request.user, UserModel(pk=freshness['created_by'])))
+        return make_etag('recipe', self.kwargs['pk'], freshness['last_edit_at'].isoformat(), is_owner,
+                         *self.get_data_versions())
+
+    def get_last_modified(self, request):
+        freshness = self.get_freshness()
+        if freshness is None:
+            return None
+
+        return max(freshness['last_edit_at'], version_to_datetime(max(self.get_data_versions())))
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -199,10 +362,7 @@ class RecipeMultipartUpdateView(api_views.UpdateAPIView):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrAdmin]
 
     def get_queryset(self):
-        return (Recipe.objects
-                .prefetch_related('recipe_products')
-                .prefetch_related('recipe_products__unit',
-                                  'recipe_products__custom_unit'))
+        return Recipe.objects.prefetch_related('recipe_products')
 
     def update(self, request, *args, **kwargs):
         if not request.content_type.startswith('multipart/form-data'):
@@ -220,6 +380,18 @@ class RecipeMultipartUpdateView(api_views.UpdateAPIView):
         return self.serializer_class
 
 
+class RecipeImageUploadIntentView(DirectUploadIntentView):
+    queryset = Recipe.objects.select_related('created_by__user').defer('search_vector')
+    permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
+    image_field_name = 'image'
+
+
+class RecipeImageUploadConfirmView(DirectUploadConfirmView):
+    queryset = Recipe.objects.select_related('created_by__user').defer('search_vector')
+    permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
+    image_field_name = 'image'
+
+
 class RecipesCollectionListView(api_views.ListCreateAPIView):
     list_serializer_class = SimpleRecipesCollectionSerializer
     create_serializer_class = RecipesCollectionCreateSerializer
@@ -228,7 +400,9 @@ class RecipesCollectionListView(api_views.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
-        queryset = RecipesCollection.objects.select_related('created_by').prefetch_related('recipes')
+        queryset = (RecipesCollection.objects
+                    .select_related('created_by')
+                    .prefetch_related(Prefetch('recipes', queryset=Recipe.objects.only('id'))))
         user_id = self.request.query_params.get('userId', None)
         if user_id:
             queryset = queryset.filter(created_by=user_id)
@@ -244,15 +418,54 @@ class RecipesCollectionListView(api_views.ListCreateAPIView):
         serializer.save(created_by=self.request.user.profile)
 
 
-class RecipesCollectionDetailView(api_views.RetrieveUpdateDestroyAPIView):
+class RecipesCollectionDetailView(ConditionalGetMixin, VersionedViewMixin, api_views.RetrieveUpdateDestroyAPIView):
     detail_serializer_class = RecipesCollectionDetailSerializer
     modify_serializer_class = RecipesCollectionModifySerializer
     serializer_class = RecipesCollectionDetailSerializer
+    values_serializer_class = RecipesCollectionDetailValuesSerializer
+    version_namespaces = (PROFILES,)
+
+    def get_freshness(self):
+        if not hasattr(self, '_freshness'):
+            self._freshness = (RecipesCollection.objects.filter(pk=self.kwargs['pk'])
+                               .annotate(recipes_edited_at=Max('recipes__last_edit_at'),
+                                         recipes_count=Count('recipes'))
+                               .values('updated_at', 'recipes_edited_at', 'recipes_count')
+                               .first())
+        return self._freshness
+
+    def get_etag(self, request):
+        freshness = self.get_freshness()
+        if freshness is None:
+            return None
+
+        recipes_edited_at = freshness['recipes_edited_at']
+        return make_etag('collection', self.kwargs['pk'], freshness['updated_at'].isoformat(),
+                         recipes_edited_at.isoformat() if recipes_edited_at else None,
+                         freshness['recipes_count'], *self.get_data_versions())
+
+    def get_last_modified(self, request):
+        freshness = self.get_freshness()
+        if freshness is None:
+            return None
+
+        return max(filter(None, (freshness['updated_at'], freshness['recipes_edited_at'],
+                                 version_to_datetime(*self.get_data_versions()))))
 
     def get_queryset(self):
         return (RecipesCollection.objects
                 .select_related('created_by')
-                .prefetch_related('recipes'))
+                .prefetch_related(Prefetch('recipes',
+                                           queryset=Recipe.objects.select_related('created_by__user'))))
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.values_serializer_class is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        # GET is open to everyone (see get_permissions), so there are no object permissions to check.
+        serializer = self.values_serializer_class(context=self.get_serializer_context())
+        row = get_object_or_404(RecipesCollection.objects.values(*serializer.lookups), pk=self.kwargs['pk'])
+        return Response(serializer.serialize_many([row])[0])
 
     def get_permissions(self):
         if self.request.method == 'GET':
@@ -265,12 +478,25 @@ class RecipesCollectionDetailView(api_views.RetrieveUpdateDestroyAPIView):
         return self.modify_serializer_class
 
 
+class RecipesCollectionImageUploadIntentView(DirectUploadIntentView):
+    queryset = RecipesCollection.objects.select_related('created_by__user')
+    permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
+    image_field_name = 'image'
+
+
+class RecipesCollectionImageUploadConfirmView(DirectUploadConfirmView):
+    queryset = RecipesCollection.objects.select_related('created_by__user')
+    permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
+    image_field_name = 'image'
+
+
 class SavedRecipesCollectionListView(api_views.ListCreateAPIView):
     list_serializer_class = SavedRecipesCollectionBaseSerializer
     create_serializer_class = SavedRecipesCollectionCreateSerializer
 
     serializer_class = list_serializer_class
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    ordering = ('-saved_at', '-id')
 
     def get_queryset(self):
         return (SavedRecipesCollection.objects
@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from ManjaBook.jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'status', 'attempts', 'max_attempts', 'run_at', 'created_at', 'finished_at')
+    list_filter = ('status', 'task')
+    search_fields = ('task', 'key')
+    ordering = ('-id',)
+    readonly_fields = ('id', 'created_at', 'started_at', 'finished_at', 'locked_until', 'last_error')
+    actions = ('requeue',)
+
+    @admin.action(description="Queue the selected jobs again")
+    def requeue(self, request, queryset):
+        queryset.requeue()
@@ -0,0 +1,14 @@
+from importlib import import_module
+
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'ManjaBook.jobs'
+
+    def ready(self):
+        # Tasks register themselves on import, so workers know them without serving any request first.
+        for module in settings.JOB_QUEUE['TASK_MODULES']:
+            import_module(module)
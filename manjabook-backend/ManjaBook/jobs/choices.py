@@ -0,0 +1,11 @@
+from django.db import models
+
+
+class JobStatusChoices(models.TextChoices):
+    QUEUED = ('queued', 'Queued')
+    RUNNING = ('running', 'Running')
+    DONE = ('done', 'Done')
+    DEAD = ('dead', 'Dead')
+
+
+PENDING_STATUSES = (JobStatusChoices.QUEUED, JobStatusChoices.RUNNING)
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, F, Min
+from django.utils import timezone
+
+from ManjaBook.jobs.choices import JobStatusChoices
+from ManjaBook.jobs.models import Job
+
+
+class Command(BaseCommand):
+    help = ("Report the job queue per task: pending, dead and finished jobs, throughput and latency over the "
+            "last --window minutes. Optionally requeue dead jobs or delete old finished ones.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=60,
+                            help="Minutes of finished jobs the throughput and latency are computed over.")
+        parser.add_argument('--requeue-dead', action='store_true',
+                            help="Queue the dead jobs again, with a fresh set of attempts.")
+        parser.add_argument('--purge-done', type=int, metavar='DAYS',
+                            help="Delete the jobs done more than DAYS days ago.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+
+        if options['requeue_dead']:
+            requeued = Job.objects.filter(status=JobStatusChoices.DEAD).requeue()
+            self.stdout.write(self.style.SUCCESS(f"Requeued {requeued} dead jobs."))
+
+        if options['purge_done'] is not None:
+            purged, _ = Job.objects.filter(status=JobStatusChoices.DONE,
+                                           finished_at__lt=now - timedelta(days=options['purge_done'])).delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {purged} done jobs."))
+
+        counts = {(row['task'], row['status']): row for row in (
+            Job.objects.values('task', 'status')
+            .annotate(count=Count('id'), oldest_run_at=Min('run_at')))}
+
+        window = timedelta(minutes=options['window'])
+        finished = {row['task']: row for row in (
+            Job.objects.filter(status=JobStatusChoices.DONE, finished_at__gte=now - window)
+            .values('task')
+            .annotate(count=Count('id'), latency=Avg(F('finished_at') - F('created_at')),
+                      run_time=Avg(F('finished_at') - F('started_at'))))}
+
+        self.stdout.write(f"{'task':<28}{'queued':>8}{'running':>9}{'dead':>6}{'oldest due':>12}"
+                          f"{'done/min':>10}{'latency s':>11}{'run s':>8}")
+        for task in sorted({task for task, _ in counts} | set(finished)):
+            def count(status):
+                return counts.get((task, status), {}).get('count', 0)
+
+            oldest = counts.get((task, JobStatusChoices.QUEUED), {}).get('oldest_run_at')
+            done = finished.get(task, {'count': 0, 'latency': None, 'run_time': None})
+            self.stdout.write(
+                f"{task:<28}{count(JobStatusChoices.QUEUED):>8}{count(JobStatusChoices.RUNNING):>9}"
+                f"{count(JobStatusChoices.DEAD):>6}"
+                f"{self.seconds(now - oldest if oldest and oldest <= now else None):>12}"
+                f"{done['count'] / options['window']:>10.2f}"
+                f"{self.seconds(done['latency']):>11}{self.seconds(done['run_time']):>8}")
+
+    @staticmethod
+    def seconds(duration):
+        return '-' if duration is None else f'{duration.total_seconds():.1f}'
@@ -0,0 +1,52 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ManjaBook.cache_versions import cache_is_process_local
+from ManjaBook.jobs.queue import WorkerStats, run_batch
+
+
+class Command(BaseCommand):
+    help = ("Run queued background jobs (image uploads and derivatives). Any number of workers can run "
+            "side by side; they claim disjoint jobs. Stops after the current batch on SIGINT/SIGTERM.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Run the jobs that are due, then exit instead of polling.")
+        parser.add_argument('--batch-size', type=int, default=settings.JOB_QUEUE['BATCH_SIZE'],
+                            help="Number of jobs claimed at a time.")
+        parser.add_argument('--poll-interval', type=float, default=settings.JOB_QUEUE['POLL_INTERVAL'],
+                            help="Seconds to wait before polling again once the queue is empty.")
+        parser.add_argument('--stats-interval', type=float, default=settings.JOB_QUEUE['STATS_INTERVAL'],
+                            help="Seconds between throughput logs on the ManjaBook.jobs logger.")
+
+    def handle(self, *args, **options):
+        if cache_is_process_local():
+            self.stderr.write(self.style.WARNING(
+                "The default cache is local to this process: the changes jobs make to cached data will not reach "
+                "the web server processes. Configure a shared CACHE_BACKEND."))
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        stats = WorkerStats()
+        while not self.stopping:
+            close_old_connections()
+            processed = run_batch(stats, options['batch_size'])
+
+            if options['once'] and not processed:
+                break
+            if time.monotonic() - stats.started >= options['stats_interval']:
+                stats.log()
+                stats.reset()
+            if not processed:
+                time.sleep(options['poll_interval'])
+
+        stats.log()
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,17 @@
+from django.db import models
+from django.utils import timezone
+
+from ManjaBook.jobs.choices import JobStatusChoices, PENDING_STATUSES
+
+
+class JobQuerySet(models.QuerySet):
+    def requeue(self):
+        """
+        Queue finished or dead jobs again with a fresh set of attempts, except those whose key
+        is already taken by a pending job.
+        """
+        pending_keys = self.model.objects.filter(status__in=PENDING_STATUSES, key__isnull=False).values('key')
+        return (self.exclude(status__in=PENDING_STATUSES)
+                .exclude(key__in=pending_keys)
+                .update(status=JobStatusChoices.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None,
+                        last_error=''))
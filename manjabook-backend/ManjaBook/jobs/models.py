@@ -0,0 +1,40 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from ManjaBook.jobs.choices import JobStatusChoices, PENDING_STATUSES
+from ManjaBook.jobs.managers import JobQuerySet
+
+
+class Job(models.Model):
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # Jobs sharing a key are deduplicated while one of them is pending.
+    key = models.CharField(max_length=255, null=True, blank=True)
+
+    status = models.CharField(max_length=10, choices=JobStatusChoices.choices, default=JobStatusChoices.QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run_at', 'id'], condition=Q(status__in=PENDING_STATUSES),
+                         name='jobs_job_pending_idx'),
+            models.Index(fields=['status', 'finished_at'], name='jobs_job_finished_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=Q(status__in=PENDING_STATUSES),
+                                    name='jobs_job_pending_key_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.task} #{self.pk} ({self.status})'
@@ -0,0 +1,174 @@
+import logging
+import time
+import traceback
+from collections import Counter
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ManjaBook.jobs.choices import JobStatusChoices
+from ManjaBook.jobs.models import Job
+
+logger = logging.getLogger('ManjaBook.jobs')
+
+TASKS = {}
+
+
+def task(name, atomic=True):
+    """
+    Register a function as the task `name`. Its keyword arguments are the JSON payload of the job.
+
+    Tasks run in a transaction, unless `atomic` is False for the ones committing their work in batches.
+    """
+
+    def register(function):
+        function.atomic = atomic
+        TASKS[name] = function
+        return function
+
+    return register
+
+
+def enqueue(task_name, key=None, max_attempts=None, **payload):
+    """
+    Queue a call of a registered task, committed along with the surrounding transaction.
+
+    With a `key`, nothing is queued while a job with the same key is still pending.
+    """
+    if task_name not in TASKS:
+        raise LookupError(f"Unknown task '{task_name}'.")
+
+    job = Job(task=task_name, payload=payload, key=key,
+              max_attempts=max_attempts or settings.JOB_QUEUE['MAX_ATTEMPTS'])
+    Job.objects.bulk_create([job], ignore_conflicts=key is not None)
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff before the next attempt of a job that failed `attempts` times.
+    """
+    return timedelta(seconds=min(settings.JOB_QUEUE['RETRY_BACKOFF'] * 2 ** (attempts - 1),
+                                 settings.JOB_QUEUE['MAX_RETRY_BACKOFF']))
+
+
+def claim_jobs(limit):
+    """
+    Lease up to `limit` due jobs to this worker and return them.
+
+    `SELECT ... FOR UPDATE SKIP LOCKED` lets concurrent workers claim disjoint batches without waiting
+    on each other. Jobs whose lease expired, because their worker died, are claimed again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(Job.objects
+                   .select_for_update(skip_locked=True)
+                   .filter(Q(status=JobStatusChoices.QUEUED, run_at__lte=now) |
+                           Q(status=JobStatusChoices.RUNNING, locked_until__lt=now))
+                   .order_by('run_at', 'id')
+                   .values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+
+        Job.objects.filter(id__in=ids).update(
+            status=JobStatusChoices.RUNNING, attempts=F('attempts') + 1, started_at=now,
+            locked_until=now + timedelta(seconds=settings.JOB_QUEUE['LEASE']))
+
+    return list(Job.objects.filter(id__in=ids).order_by('run_at', 'id'))
+
+
+def run_job(job):
+    """
+    Run a claimed job and record its outcome: done, queued again after a backoff, or dead once
+    it failed `max_attempts` times. Returns the new status.
+    """
+    try:
+        function = TASKS.get(job.task)
+        if function is None:
+            raise LookupError(f"Unknown task '{job.task}'.")
+
+        with transaction.atomic() if function.atomic else nullcontext():
+            function(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            logger.error("Job %s failed %d times, giving up.", job, job.attempts, exc_info=True)
+            status, run_at, finished_at = JobStatusChoices.DEAD, job.run_at, timezone.now()
+        else:
+            logger.warning("Job %s failed, attempt %d of %d.", job, job.attempts, job.max_attempts, exc_info=True)
+            status, run_at, finished_at = JobStatusChoices.QUEUED, timezone.now() + retry_delay(job.attempts), None
+    else:
+        error, status, run_at, finished_at = '', JobStatusChoices.DONE, job.run_at, timezone.now()
+
+    # A worker whose lease expired meanwhile must not overwrite the outcome of the one that took over.
+    Job.objects.filter(pk=job.pk, locked_until=job.locked_until).update(
+        status=status, run_at=run_at, finished_at=finished_at, locked_until=None, last_error=error)
+    return status
+
+
+class WorkerStats:
+    """
+    Throughput of a worker: jobs run per outcome, time spent running them and time they waited
+    in the queue after becoming due.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.started = time.monotonic()
+        self.outcomes = Counter()
+        self.run_time = 0.0
+        self.wait_time = 0.0
+
+    @property
+    def processed(self):
+        return sum(self.outcomes.values())
+
+    def record(self, job, status, duration):
+        self.outcomes[status] += 1
+        self.run_time += duration
+        self.wait_time += max((job.started_at - job.run_at).total_seconds(), 0.0)
+
+    def log(self):
+        elapsed = time.monotonic() - self.started
+        processed = self.processed
+        logger.info(
+            'jobs processed=%d done=%d retried=%d dead=%d rate=%.2f/s run=%.1fms wait=%.1fms',
+            processed, self.outcomes[JobStatusChoices.DONE], self.outcomes[JobStatusChoices.QUEUED],
+            self.outcomes[JobStatusChoices.DEAD], processed / elapsed if elapsed else 0.0,
+            self.run_time * 1000 / processed if processed else 0.0,
+            self.wait_time * 1000 / processed if processed else 0.0,
+            extra={
+                'processed': processed,
+                'outcomes': dict(self.outcomes),
+                'elapsed': elapsed,
+            },
+        )
+
+
+def run_batch(stats, batch_size):
+    """
+    Claim and run one batch of due jobs, and return how many ran.
+    """
+    jobs = claim_jobs(batch_size)
+    for job in jobs:
+        start = time.perf_counter()
+        status = run_job(job)
+        stats.record(job, status, time.perf_counter() - start)
+    return len(jobs)
+
+
+def run_due_jobs(stats=None, batch_size=None):
+    """
+    Run jobs until none is due, and return how many ran.
+    """
+    stats = stats if stats is not None else WorkerStats()
+    batch_size = batch_size or settings.JOB_QUEUE['BATCH_SIZE']
+    processed = 0
+    while ran := run_batch(stats, batch_size):
+        processed += ran
+    return processed
@@ -0,0 +1,127 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ManjaBook.jobs.choices import JobStatusChoices
+from ManjaBook.jobs.models import Job
+from ManjaBook.jobs.queue import claim_jobs, enqueue, run_due_jobs, run_job, task
+
+CALLS = []
+
+
+@task('tests.record')
+def record_call(value):
+    CALLS.append(value)
+
+
+@task('tests.fail')
+def fail(value):
+    raise ValueError(value)
+
+
+@override_settings(JOB_QUEUE={'TASK_MODULES': (), 'MAX_ATTEMPTS': 3, 'RETRY_BACKOFF': 10, 'MAX_RETRY_BACKOFF': 25,
+                              'LEASE': 60, 'BATCH_SIZE': 2, 'POLL_INTERVAL': 0, 'STATS_INTERVAL': 60})
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def make_due(self):
+        Job.objects.filter(status=JobStatusChoices.QUEUED).update(run_at=timezone.now())
+
+    def test_jobs_run_in_order_across_batches(self):
+        for value in range(5):
+            enqueue('tests.record', value=value)
+
+        self.assertEqual(run_due_jobs(), 5)
+        self.assertEqual(CALLS, [0, 1, 2, 3, 4])
+        self.assertFalse(Job.objects.exclude(status=JobStatusChoices.DONE).exists())
+
+    def test_unknown_tasks_are_rejected(self):
+        with self.assertRaises(LookupError):
+            enqueue('tests.missing')
+
+    def test_keyed_jobs_are_deduplicated_while_pending(self):
+        enqueue('tests.record', key='same', value=1)
+        enqueue('tests.record', key='same', value=2)
+        self.assertEqual(Job.objects.count(), 1)
+
+        run_due_jobs()
+        enqueue('tests.record', key='same', value=3)
+        run_due_jobs()
+        self.assertEqual(CALLS, [1, 3])
+
+    def test_failures_are_retried_with_backoff_then_dead(self):
+        enqueue('tests.fail', value='boom')
+
+        delays = []
+        with self.assertLogs('ManjaBook.jobs', 'WARNING'):
+            for _ in range(3):
+                before = timezone.now()
+                run_due_jobs()
+                job = Job.objects.get()
+                delays.append(round((job.run_at - before).total_seconds()))
+                self.make_due()
+
+        self.assertEqual(job.status, JobStatusChoices.DEAD)
+        self.assertEqual(job.attempts, 3)
+        self.assertIn('ValueError: boom', job.last_error)
+        # 10s then 20s; the dead job is not scheduled again.
+        self.assertEqual(delays[:2], [10, 20])
+
+        self.assertEqual(Job.objects.filter(status=JobStatusChoices.DEAD).requeue(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error), (JobStatusChoices.QUEUED, 0, ''))
+
+    def test_requeue_skips_keys_taken_by_a_pending_job(self):
+        enqueue('tests.fail', key='same', value='boom', max_attempts=1)
+        with self.assertLogs('ManjaBook.jobs', 'ERROR'):
+            run_due_jobs()
+        enqueue('tests.record', key='same', value=1)
+
+        self.assertEqual(Job.objects.filter(status=JobStatusChoices.DEAD).requeue(), 0)
+
+    def test_pending_key_is_unique(self):
+        Job.objects.create(task='tests.record', key='same')
+        with self.assertRaises(IntegrityError):
+            Job.objects.create(task='tests.record', key='same')
+
+    def test_expired_leases_are_claimed_again(self):
+        enqueue('tests.record', value=1)
+        enqueue('tests.record', value=2)
+        first, second = claim_jobs(2)
+        self.assertEqual(claim_jobs(2), [])
+
+        Job.objects.filter(pk=first.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual([job.pk for job in claim_jobs(2)], [first.pk])
+
+        # The worker that lost the lease does not overwrite the outcome of the new owner.
+        run_job(first)
+        self.assertEqual(Job.objects.get(pk=first.pk).status, JobStatusChoices.RUNNING)
+        self.assertEqual(Job.objects.get(pk=first.pk).attempts, 2)
+
+    def test_worker_command_drains_the_queue_and_logs_throughput(self):
+        for value in range(3):
+            enqueue('tests.record', value=value)
+
+        # It would close the connection holding the test transaction.
+        with mock.patch('ManjaBook.jobs.management.commands.run_worker.close_old_connections'), \
+                self.assertLogs('ManjaBook.jobs', 'INFO') as logs:
+            call_command('run_worker', '--once')
+
+        self.assertEqual(CALLS, [0, 1, 2])
+        self.assertIn('processed=3 done=3 retried=0 dead=0', logs.output[-1])
+
+    def test_stats_command(self):
+        enqueue('tests.record', value=1)
+        run_due_jobs()
+        enqueue('tests.record', value=2)
+
+        out = StringIO()
+        call_command('job_stats', stdout=out)
+        row = next(line for line in out.getvalue().splitlines() if line.startswith('tests.record'))
+        self.assertEqual(row.split()[1:4], ['1', '0', '0'])
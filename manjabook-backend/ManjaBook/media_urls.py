@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files.storage import default_storage, storages
+from django.core.signals import setting_changed
+from django.db import models
+from django.dispatch import receiver
+from django.utils.encoding import filepath_to_uri
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+from storages.utils import clean_name
+
+# Process-level URL caches, by storage name (the keys of settings.STORAGES)
+RESOLVERS = {}
+
+
+class MediaURLResolver:
+    """
+    URLs of the files of one storage, memoized per file name.
+
+    With querystring auth, S3Boto3Storage.url() signs every URL (an HMAC per call), again and again
+    for the rows sharing a default image. Signed URLs are reused until `SIGNED_URL_MARGIN` seconds before
+    they expire, and the others never change. Storages listed in `PUBLIC_STORAGES` serve a public bucket:
+    their URLs are built from MEDIA_URL without the storage.
+
+    Resolvers are shared by the threads of a process: the cache is a least recently used one, guarded by a lock.
+    """
+
+    def __init__(self, storage, public=False):
+        is_s3 = hasattr(storage, 'querystring_auth')
+        self.storage = storage
+        self.public = public and is_s3
+        self.lifetime = None
+        if is_s3 and storage.querystring_auth and not self.public:
+            self.lifetime = storage.querystring_expire - settings.MEDIA_URLS['SIGNED_URL_MARGIN']
+        self.max_size = settings.MEDIA_URLS['CACHE_SIZE']
+        self.urls = OrderedDict()
+        self.lock = threading.Lock()
+
+    def build(self, name):
+        if self.public:
+            return f'{settings.MEDIA_URL}{filepath_to_uri(self.storage._normalize_name(clean_name(name)))}'
+        return self.storage.url(name)
+
+    def __call__(self, name):
+        now = time.monotonic()
+        with self.lock:
+            cached = self.urls.get(name)
+            if cached is not None and (cached[1] is None or cached[1] > now):
+                self.urls.move_to_end(name)
+                return cached[0]
+
+        # Built outside the lock, so that signing does not hold up the other threads.
+        url = self.build(name)
+        if self.max_size:
+            with self.lock:
+                self.urls[name] = (url, None if self.lifetime is None else now + self.lifetime)
+                self.urls.move_to_end(name)
+                while len(self.urls) > self.max_size:
+                    self.urls.popitem(last=False)
+        return url
+
+
+def storage_name(storage):
+    if storage is default_storage:
+        return 'default'
+    return next((alias for alias in settings.STORAGES if storages[alias] is storage), None)
+
+
+def media_url_resolver(storage):
+    """
+    Return the cached `name -> URL` function of a configured storage, or its plain `url` for any other one.
+    """
+    alias = storage_name(storage)
+    if alias is None:
+        return storage.url
+
+    resolver = RESOLVERS.get(alias)
+    if resolver is None:
+        # Threads racing here keep the same resolver.
+        resolver = RESOLVERS.setdefault(alias, MediaURLResolver(
+            storages[alias], public=alias in settings.MEDIA_URLS['PUBLIC_STORAGES']))
+    return resolver
+
+
+@receiver(setting_changed)
+def reset_media_url_resolvers(setting, **kwargs):
+    if setting in ('STORAGES', 'MEDIA_URL', 'MEDIA_URLS'):
+        RESOLVERS.clear()
+
+
+class MediaImageField(serializers.ImageField):
+    """
+    ImageField rendering its URL through the cached resolver of the file's storage.
+    """
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        if not getattr(self, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return value.name
+
+        url = media_url_resolver(value.storage)(value.name)
+        request = self.context.get('request', None)
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+class MediaURLFieldsMixin:
+    """
+    ModelSerializer mixin mapping model ImageFields to MediaImageField.
+    """
+    serializer_field_mapping = {**serializers.ModelSerializer.serializer_field_mapping,
+                                models.ImageField: MediaImageField}
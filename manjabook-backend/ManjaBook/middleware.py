@@ -0,0 +1,79 @@
+import logging
+import time
+
+from django.db import connection
+
+logger = logging.getLogger('ManjaBook.queries')
+
+
+class QueryStats:
+    """
+    Collects the number, total duration and slowest statement of the queries run on a connection.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_duration = 0.0
+        self.slowest_sql = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if duration > self.slowest_duration:
+                self.slowest_duration = duration
+                self.slowest_sql = sql
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record the database work of every request and expose it as `Server-Timing` metrics
+    and a structured log record on the `ManjaBook.queries` logger.
+
+    Only durations go into the header; the slowest statement itself is logged, never sent to clients.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        start = time.perf_counter()
+
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+
+        total = time.perf_counter() - start
+        response['Server-Timing'] = self.server_timing(stats, total)
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        logger.info(
+            'db queries=%d time=%.1fms view=%s',
+            stats.count, stats.duration * 1000, resolver_match.view_name if resolver_match else None,
+            extra={
+                'view': resolver_match.view_name if resolver_match else None,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'query_count': stats.count,
+                'query_time_ms': round(stats.duration * 1000, 2),
+                'slowest_query_ms': round(stats.slowest_duration * 1000, 2),
+                'slowest_query': stats.slowest_sql,
+                'total_time_ms': round(total * 1000, 2),
+            },
+        )
+
+        return response
+
+    @staticmethod
+    def server_timing(stats, total):
+        return ', '.join([
+            f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"',
+            f'db-slowest;dur={stats.slowest_duration * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
@@ -0,0 +1,164 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError
+from django.db import DataError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over a unique, indexed ordering.
+
+    The ordering is taken from the view's `ordering` attribute and its last field must be unique,
+    e.g. ('-created_at', '-id'). Pages are fetched with a `WHERE (keys) < (cursor)` condition instead of
+    an OFFSET, so deep pages cost the same as the first one, and no COUNT(*) is ever issued.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(view)
+
+        position, reverse = self.decode_cursor(request)
+
+        ordering = [self._invert(field) for field in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is None:
+            results = list(queryset[:self.page_size + 1])
+        else:
+            try:
+                results = list(queryset.filter(self._keyset_filter(ordering, position))[:self.page_size + 1])
+            except (ValidationError, DataError, TypeError, ValueError):
+                # A well-formed cursor can still hold values the ordering fields reject, e.g. 'x' for a date.
+                raise NotFound(self.invalid_cursor_message)
+
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_ordering(self, view):
+        ordering = getattr(view, 'ordering', None) or self.ordering
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(request.query_params[self.page_size_query_param],
+                                     strict=True,
+                                     cutoff=self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+
+        return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            position, reverse = cursor['p'], bool(cursor.get('r', False))
+        except (TypeError, ValueError, KeyError, BinasciiError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def encode_cursor(self, instance, reverse):
+        position = [self._position_value(instance, field) for field in self.ordering]
+        cursor = {'p': position, 'r': 1} if reverse else {'p': position}
+        encoded = urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    @staticmethod
+    def _position_value(instance, field):
+        name = field.lstrip('-')
+        # Pages are model instances, or `.values()` rows on the fast read paths.
+        value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+        if isinstance(value, (int, float, str)) or value is None:
+            return value
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _keyset_filter(ordering, position):
+        """
+        Build `(a, b, c) > (x, y, z)` as `a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)`,
+        respecting the direction of every key and bounding the leading key for the index scan.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+
+        leading_field, leading_value = ordering[0], position[0]
+        leading_lookup = 'lte' if leading_field.startswith('-') else 'gte'
+        return Q(**{f'{leading_field.lstrip("-")}__{leading_lookup}': leading_value}) & condition
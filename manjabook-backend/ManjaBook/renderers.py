@@ -0,0 +1,50 @@
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Decimals, lazy translations, timedeltas and the like are encoded the way DRF's own JSON renderer does,
+# so switching renderers never changes a value (Decimals stay strings with COERCE_DECIMAL_TO_STRING).
+default_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement of DRF's JSONRenderer backed by orjson, which serializes dicts, lists, strings,
+    numbers and datetimes natively and only calls back into Python for the other types.
+    """
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        options = self.options
+        # orjson only indents by 2 spaces, which is all the browsable API needs.
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+
+        ret = orjson.dumps(data, default=default_encoder.default, option=options)
+        # Like JSONRenderer, keep the output a strict JavaScript subset.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def encode_msgpack_default(obj):
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    return default_encoder.default(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders `application/msgpack` for clients that ask for it in their Accept header.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_msgpack_default)
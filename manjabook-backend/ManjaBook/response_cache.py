@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from ManjaBook.cache_versions import get_versions
+from ManjaBook.conditional import make_etag
+
+
+class VersionedViewMixin:
+    """
+    Views whose responses only depend on the request and on the data versions of `version_namespaces`.
+    """
+    version_namespaces = ()
+
+    def get_data_versions(self):
+        if not hasattr(self, '_data_versions'):
+            self._data_versions = get_versions(*self.version_namespaces)
+        return self._data_versions
+
+
+class CachedResponseMixin(VersionedViewMixin):
+    """
+    Serve successful GET responses from the cache.
+
+    Entries are keyed by the absolute URL and the current data versions, so a signal bumping a version
+    makes every response built from the old data unreachable at once; they then expire after
+    `settings.REFERENCE_DATA_CACHE_TIMEOUT` seconds. A hit does not touch the database.
+    """
+
+    def get_response_cache_key(self, request):
+        return f'response:{make_etag(request.build_absolute_uri(), *self.get_data_versions())}'
+
+    def get(self, request, *args, **kwargs):
+        cache_key = self.get_response_cache_key(request)
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(cache_key, response.data, settings.REFERENCE_DATA_CACHE_TIMEOUT)
+        return response
@@ -23,6 +23,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'storages',
     'rest_framework',
     'rest_framework_simplejwt.token_blacklist',
@@ -30,9 +31,11 @@ INSTALLED_APPS = [
 
     'ManjaBook.accounts',
     'ManjaBook.inventory',
+    'ManjaBook.jobs',
 ]
 
 MIDDLEWARE = [
+    'ManjaBook.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -107,6 +110,16 @@ USE_I18N = True
 
 USE_TZ = True
 
+# PostgreSQL text search configuration used to stem the recipe search documents and queries
+RECIPE_SEARCH_CONFIG = os.getenv('RECIPE_SEARCH_CONFIG', 'english')
+
+# Recipes whose search documents are rebuilt inline when a product they use is renamed. Beyond INLINE_LIMIT,
+# a job rebuilds them in transactions of BATCH_SIZE recipes (see ManjaBook.inventory.tasks)
+RECIPE_SEARCH_REFRESH = {
+    'INLINE_LIMIT': int(os.getenv('RECIPE_SEARCH_REFRESH_INLINE_LIMIT', 100)),
+    'BATCH_SIZE': int(os.getenv('RECIPE_SEARCH_REFRESH_BATCH_SIZE', 1000)),
+}
+
 STATIC_URL = '/static/'
 
 STATICFILES_DIRS = (
@@ -135,7 +148,14 @@ STORAGES = {
     },
     'staticfiles': {
         'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage', # NOT django.core.files.storage.FileSystemStorage
-    }
+    },
+    # Uploads wait here until a worker moves them to MinIO (see ManjaBook.uploads); shared with the workers
+    'staging': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {
+            'location': os.getenv('MEDIA_STAGING_ROOT', BASE_DIR / 'staging'),
+        }
+    },
 }
 
 AUTH_USER_MODEL = 'accounts.AccountUser'
@@ -146,7 +166,21 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
-    )
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'ManjaBook.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
+    # JSON through orjson, or MessagePack for clients sending `Accept: application/msgpack`
+    'DEFAULT_RENDERER_CLASSES': (
+        'ManjaBook.renderers.ORJSONRenderer',
+        'ManjaBook.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'ManjaBook.parsers.ORJSONParser',
+        'ManjaBook.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 SIMPLE_JWT = {
@@ -157,6 +191,119 @@ SIMPLE_JWT = {
     'UPDATE_LAST_LOGIN': True,
 }
 
+# Fixed-width WebP and JPEG versions of uploaded images, exposed to clients as srcsets (see ManjaBook.images)
+IMAGE_DERIVATIVES = {
+    'WIDTHS': (160, 320, 640, 1280),
+    'QUALITY': int(os.getenv('IMAGE_DERIVATIVES_QUALITY', 80)),
+}
+
+# Images uploaded by the browser straight to MinIO with a presigned POST (see ManjaBook.uploads)
+DIRECT_UPLOADS = {
+    # Accepted content types and the extension of the stored files
+    'CONTENT_TYPES': {'image/jpeg': 'jpg', 'image/png': 'png', 'image/webp': 'webp'},
+    'MAX_SIZE': int(os.getenv('DIRECT_UPLOADS_MAX_SIZE', 10 * 1024 * 1024)),
+    'MAX_PIXELS': 40_000_000,
+    # Bytes read to check the format and dimensions, enough for the headers of the accepted formats
+    'HEADER_BYTES': 256 * 1024,
+    # Seconds the presigned POST is valid, and how much longer the upload can be confirmed
+    'EXPIRES': 10 * 60,
+    'CONFIRM_GRACE': 5 * 60,
+}
+
+# Media URLs rendered by the serializers, memoized per process and storage (see ManjaBook.media_urls)
+MEDIA_URLS = {
+    # Storages whose bucket allows anonymous reads: their URLs are built from MEDIA_URL, unsigned
+    'PUBLIC_STORAGES': ('default',) if os.getenv('MINIO_PUBLIC_BUCKET') == 'True' else (),
+    # Signed URLs are reused until this many seconds before they expire
+    'SIGNED_URL_MARGIN': 5 * 60,
+    # URLs kept per storage, 0 disables the cache
+    'CACHE_SIZE': 10_000,
+}
+
+# Per-process copy of the units and custom units (see ManjaBook.inventory.unit_registry)
+UNIT_REGISTRY = {
+    # Seconds between checks of the shared UNITS version, i.e. how long other processes may use changed units
+    'VERSION_CHECK_INTERVAL': 1.0,
+    # Seconds after which the units are reloaded anyway, should a process miss a version change
+    'MAX_AGE': 300.0,
+}
+
+# Per-process copy of the product names and nutrients for nutrient previews (see ManjaBook.inventory.product_registry)
+PRODUCT_NUTRIENTS_REGISTRY = {
+    'VERSION_CHECK_INTERVAL': 1.0,
+    'MAX_AGE': 300.0,
+}
+
+# Recipe products recalculated per transaction after a product's nutrients change (see ManjaBook.inventory.tasks)
+NUTRIENT_PROPAGATION = {
+    'BATCH_SIZE': int(os.getenv('NUTRIENT_PROPAGATION_BATCH_SIZE', 1000)),
+}
+
+# Background jobs in the database, run by `manage.py run_worker` (see ManjaBook.jobs)
+JOB_QUEUE = {
+    'TASK_MODULES': ('ManjaBook.images', 'ManjaBook.uploads', 'ManjaBook.inventory.tasks'),
+    'MAX_ATTEMPTS': 5,
+    # Seconds before the first retry, doubled after every failure up to MAX_RETRY_BACKOFF
+    'RETRY_BACKOFF': 30,
+    'MAX_RETRY_BACKOFF': 60 * 60,
+    # Seconds a worker owns a claimed job; jobs of workers that died are claimed again afterwards
+    'LEASE': 5 * 60,
+    'BATCH_SIZE': 10,
+    'POLL_INTERVAL': float(os.getenv('JOB_QUEUE_POLL_INTERVAL', 2)),
+    'STATS_INTERVAL': 60,
+}
+
+# Any Django cache backend shared by all the processes, e.g. django.core.cache.backends.redis.RedisCache.
+# It carries the versions that tell every process its cached data changed (see ManjaBook.cache_versions), so
+# the per-process default only suits a single process; `manage.py check --deploy` rejects it
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Shops, units, custom units and product responses are cached under the versions of their data
+# (see ManjaBook.cache_versions), so they never go stale; this only bounds how long unused entries stay
+REFERENCE_DATA_CACHE_TIMEOUT = int(os.getenv('REFERENCE_DATA_CACHE_TIMEOUT', 60 * 60))
+
+# Authenticated users are cached per process for LOCAL_TTL seconds in front of the default cache
+AUTH_USER_CACHE = {
+    'LOCAL_TTL': int(os.getenv('AUTH_USER_CACHE_LOCAL_TTL', 30)),
+    'LOCAL_MAX_SIZE': 1024,
+    'SHARED_TTL': int(os.getenv('AUTH_USER_CACHE_SHARED_TTL', 300)),
+}
+
+# Per-request query count, DB time and slowest statement (see ManjaBook.middleware)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'ManjaBook.queries': {
+            'handlers': ['console'],
+            'level': os.getenv('QUERY_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+        # Worker throughput, retries and dead jobs
+        'ManjaBook.jobs': {
+            'handlers': ['console'],
+            'level': os.getenv('JOB_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        # Recipe products whose recalculated nutrients overflow their columns
+        'ManjaBook.nutrients': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 CORS_ALLOWED_ORIGINS = [
     os.getenv('FRONTEND_ENDPOINT'),
 ]
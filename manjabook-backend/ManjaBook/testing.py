@@ -0,0 +1,189 @@
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import URLPattern, URLResolver
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from ManjaBook.accounts.models import AccountUser, Profile
+from ManjaBook.accounts.serializers import CustomTokenObtainPairSerializer
+from ManjaBook.accounts.user_cache import user_cache
+from ManjaBook.inventory.abstract_classes import NUTRIENT_FIELDS
+from ManjaBook.inventory.models import Shop, Product, Unit, CustomUnit, Recipe, RecipeProduct, RecipesCollection, \
+    SavedRecipesCollection
+from ManjaBook.inventory.product_registry import product_registry
+from ManjaBook.inventory.unit_registry import unit_registry
+from ManjaBook.jobs.queue import run_due_jobs
+
+
+def url_names(urlpatterns):
+    """
+    Return the names of all the routes below the given urlpatterns.
+    """
+    names = set()
+    for pattern in urlpatterns:
+        if isinstance(pattern, URLResolver):
+            names |= url_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def image_file(width=800, height=600, image_format='PNG', color=(200, 80, 40)):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, image_format)
+    return ContentFile(buffer.getvalue())
+
+
+def save_default_images():
+    """
+    Put the default images of the image fields in the (in-memory) test storage.
+    """
+    for model, field_name in ((Profile, 'profile_picture'), (Recipe, 'image'), (RecipesCollection, 'image')):
+        name = model._meta.get_field(field_name).default
+        if not default_storage.exists(name):
+            default_storage.save(name, image_file())
+
+
+@override_settings(STORAGES={'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+                             'staging': {'BACKEND': 'django.core.files.storage.InMemoryStorage'}})
+class QueryBudgetTestCase(APITestCase):
+    """
+    Base test case with a realistically sized data set, asserting that endpoints stay within
+    a declared number of SQL queries no matter how many rows they serialize.
+    """
+    USERS = 3
+    SHOPS = 5
+    PRODUCTS = 60
+    RECIPES_PER_USER = 25
+    PRODUCTS_PER_RECIPE = 8
+    COLLECTIONS_PER_USER = 5
+    RECIPES_PER_COLLECTION = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        save_default_images()
+        cls.users = [AccountUser.objects.create_user(email=f'user{i}@manjabook.test', username=f'user{i}',
+                                                     password='budget-Pa55word')
+                     for i in range(cls.USERS)]
+        cls.user = cls.users[0]
+
+        shops = Shop.objects.bulk_create(Shop(name=f'Shop {i}') for i in range(cls.SHOPS))
+        cls.products = Product.objects.bulk_create(
+            Product(name=f'Product {i}', brand=f'Brand {i % 7}', calories=i % 10 + 1,
+                    # In thousandths, like every nutrient but the calories (see ManjaBook.fixed_point)
+                    **{field: (i % 10 + 1) * 1000 for field in NUTRIENT_FIELDS if field not in ('calories', 'salt')},
+                    salt=500)
+            for i in range(cls.PRODUCTS))
+        for i, product in enumerate(cls.products):
+            product.shopped_from.set([shops[i % cls.SHOPS], shops[(i + 1) % cls.SHOPS]])
+
+        cls.units = Unit.objects.bulk_create([
+            Unit(name='Gram', abbreviation='g', convert_to_base_rate=Decimal(1)),
+            Unit(name='Kilogram', abbreviation='kg', convert_to_base_rate=Decimal(1000)),
+            Unit(name='Cup', abbreviation='cup', convert_to_base_rate=Decimal(240), is_customizable=True),
+            Unit(name='Piece', abbreviation='pc', convert_to_base_rate=Decimal(100), is_customizable=True),
+        ])
+        cls.custom_units = CustomUnit.objects.bulk_create(
+            CustomUnit(unit=cls.units[2 + i % 2], custom_convert_to_base_rate=Decimal(50 + i)) for i in range(10))
+
+        cls.recipes = []
+        for user in cls.users:
+            for i in range(cls.RECIPES_PER_USER):
+                cls.recipes.append(Recipe.objects.create(
+                    name=f'{user.username} recipe {i}', quick_description='A quick weeknight dinner.',
+                    preparation='Mix everything and cook it.', portions=2, time_to_prepare=10,
+                    time_to_cook=20 + i, created_by=user.profile))
+
+        recipe_products = []
+        for r, recipe in enumerate(cls.recipes):
+            for p in range(cls.PRODUCTS_PER_RECIPE):
+                recipe_product = RecipeProduct(recipe=recipe, product=cls.products[(r + p) % cls.PRODUCTS],
+                                               quantity=Decimal(100 + p), unit=cls.units[0],
+                                               custom_unit=cls.custom_units[p] if p % 3 == 0 else None)
+                recipe_product.calculate_nutrients()
+                recipe_products.append(recipe_product)
+        RecipeProduct.objects.bulk_create(recipe_products)
+        Recipe.objects.all().refresh_recipe_products_fields()
+
+        cls.collections = []
+        for user in cls.users:
+            for i in range(cls.COLLECTIONS_PER_USER):
+                collection = RecipesCollection.objects.create(name=f'{user.username} collection {i}',
+                                                              is_private=i % 2 == 1, created_by=user.profile)
+                collection.recipes.set(cls.recipes[i:i + cls.RECIPES_PER_COLLECTION])
+                cls.collections.append(collection)
+
+        SavedRecipesCollection.objects.bulk_create(
+            SavedRecipesCollection(user=user.profile, recipes_collection=collection)
+            for user in cls.users for collection in cls.collections[:cls.COLLECTIONS_PER_USER])
+
+        # Record the derivatives of the default images, as a worker would have by now.
+        run_due_jobs()
+        for instance in [*cls.users, *cls.recipes, *cls.collections]:
+            instance.refresh_from_db()
+
+    def setUp(self):
+        # Budgets are declared for a cold start, without users or reference data cached by earlier tests.
+        cache.clear()
+        user_cache.clear()
+        unit_registry.clear()
+        product_registry.clear()
+
+    def authenticate(self, user=None):
+        token = CustomTokenObtainPairSerializer.get_token(user or self.user).access_token
+        self.client.cookies['token'] = str(token)
+
+    def assertQueryBudget(self, budget, method, url, data=None, expected_status=None, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, **kwargs)
+
+        if expected_status is not None:
+            self.assertEqual(response.status_code, expected_status, getattr(response, 'data', None))
+
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{method.upper()} {url} ran {len(queries)} queries, budget is {budget}:\n' +
+            '\n'.join(query['sql'] for query in queries.captured_queries))
+
+        return response
+
+
+class S3StorageMixin:
+    """
+    Swap the default storage of a test case for a bucket in moto's in-process S3 stand-in,
+    for the code paths that talk to the object store directly (presigned uploads).
+
+    moto and requests come from requirements-test.txt, so they are only imported by the tests using them.
+    """
+    BUCKET_NAME = 'manjabook-test'
+
+    def setUp(self):
+        from moto import mock_aws
+
+        super().setUp()
+        self.enterContext(mock_aws())
+        self.enterContext(override_settings(STORAGES={
+            'default': {
+                'BACKEND': 'storages.backends.s3boto3.S3Boto3Storage',
+                'OPTIONS': {'bucket_name': self.BUCKET_NAME, 'region_name': 'us-east-1',
+                            'access_key': 'testing', 'secret_key': 'testing'},
+            },
+            'staging': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+        }))
+        default_storage.connection.meta.client.create_bucket(Bucket=self.BUCKET_NAME)
+
+    @staticmethod
+    def post_to_storage(upload, content, content_type):
+        """
+        Upload a file with a presigned POST, as the browser does.
+        """
+        import requests
+
+        return requests.post(upload['url'], data=upload['fields'], files={'file': ('upload', content, content_type)})
@@ -0,0 +1,254 @@
+import os
+from io import BytesIO
+from uuid import uuid4
+
+from botocore.exceptions import ClientError
+from django.apps import apps
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import storages
+from django.db import transaction
+from PIL import Image, UnidentifiedImageError
+from rest_framework import generics as api_views, serializers, status
+from rest_framework.response import Response
+from storages.utils import clean_name
+
+from ManjaBook.images import queue_image_derivatives, update_image_rows
+from ManjaBook.jobs.queue import enqueue, task
+
+
+def pending_upload_field_name(image_field_name):
+    return f'{image_field_name}_pending_upload'
+
+
+def attach_stored_image(instance, field_name, name, upload_id=None):
+    """
+    Point the image field of a row at a file already in its storage and queue its derivatives.
+
+    With an `upload_id`, the row is only updated while that staged upload is still its latest one.
+    Returns whether the row was updated.
+    """
+    pending_field = pending_upload_field_name(field_name)
+    rows = type(instance).objects.filter(pk=instance.pk)
+    if upload_id is not None:
+        rows = rows.filter(**{pending_field: upload_id})
+
+    # Whatever upload is still being stored is older than this image, so it is dropped.
+    if not update_image_rows(rows, **{field_name: name, pending_field: ''}):
+        return False
+
+    setattr(instance, field_name, name)
+    setattr(instance, pending_field, '')
+    queue_image_derivatives(instance, field_name)
+    return True
+
+
+def stage_upload(instance, field_name, file):
+    """
+    Write an uploaded file to the local staging storage and queue its transfer to the storage of the
+    instance's file field, so the request does not wait on the object store.
+
+    The row records the upload as its latest one, so that an older upload stored later does not replace it.
+    """
+    upload_id = uuid4().hex
+    staged_name = storages['staging'].save(f'{upload_id}/{os.path.basename(file.name)}', file)
+    type(instance).objects.filter(pk=instance.pk).update(**{pending_upload_field_name(field_name): upload_id})
+    enqueue('uploads.store', model=instance._meta.label_lower, pk=instance.pk, field=field_name,
+            staged_name=staged_name, upload_id=upload_id)
+
+
+@task('uploads.store')
+def store_staged_upload(model, pk, field, staged_name, upload_id):
+    """
+    Move a staged upload to the field's storage, point the row at it and queue its derivatives,
+    unless a newer upload replaced it meanwhile.
+    """
+    staging = storages['staging']
+    instance = (apps.get_model(model).objects
+                .filter(pk=pk, **{pending_upload_field_name(field): upload_id})
+                .first())
+
+    if instance is not None:
+        field_file = getattr(instance, field)
+        with staging.open(staged_name) as staged:
+            field_file.save(os.path.basename(staged_name), staged, save=False)
+
+        if not attach_stored_image(instance, field, field_file.name, upload_id):
+            # Replaced while it was being stored.
+            field_file.storage.delete(field_file.name)
+
+    # Kept until the row points at the stored copy, so a failed attempt can be retried.
+    transaction.on_commit(lambda: staging.delete(staged_name))
+
+
+class StagedUploadsMixin:
+    """
+    ModelSerializer mixin staging the files of `staged_upload_fields` instead of saving them
+    with the instance; a worker stores them afterwards (see `store_staged_upload`).
+
+    The representation keeps showing the previous file until then.
+    """
+    staged_upload_fields = ()
+
+    def save(self, **kwargs):
+        staged = {field_name: self.validated_data.pop(field_name) for field_name in self.staged_upload_fields
+                  if self.validated_data.get(field_name)}
+
+        if self.instance is not None and staged and not self.validated_data and not kwargs:
+            instance = self.instance
+        else:
+            instance = super().save(**kwargs)
+
+        for field_name, file in staged.items():
+            stage_upload(instance, field_name, file)
+        return instance
+
+
+UPLOAD_TOKEN_SALT = 'ManjaBook.uploads.direct'
+
+
+def supports_direct_uploads(storage):
+    # Only S3-compatible storages (S3Boto3Storage) can presign uploads.
+    return hasattr(storage, 'bucket') and hasattr(storage, 'connection')
+
+
+def object_key(storage, name):
+    return storage._normalize_name(clean_name(name))
+
+
+def presigned_post(storage, name, content_type, size):
+    """
+    Return the URL and form fields of a browser POST uploading one object to `name`, restricted
+    to the declared content type and size, and valid for `DIRECT_UPLOADS['EXPIRES']` seconds.
+    """
+    return storage.connection.meta.client.generate_presigned_post(
+        Bucket=storage.bucket_name,
+        Key=object_key(storage, name),
+        Fields={'Content-Type': content_type},
+        Conditions=[{'Content-Type': content_type},
+                    ['content-length-range', 1, size]],
+        ExpiresIn=settings.DIRECT_UPLOADS['EXPIRES'],
+    )
+
+
+def validate_uploaded_image(storage, name, content_type):
+    """
+    Check a directly uploaded object without downloading it: its size and content type from
+    a HEAD request, and its format and dimensions from the first bytes of the image.
+    """
+    uploaded = storage.bucket.Object(object_key(storage, name))
+    try:
+        uploaded.load()
+    except ClientError:
+        raise serializers.ValidationError("No file was uploaded.")
+
+    if uploaded.content_length > settings.DIRECT_UPLOADS['MAX_SIZE']:
+        raise serializers.ValidationError("The image is too large.")
+    if uploaded.content_type != content_type:
+        raise serializers.ValidationError("The image does not have the declared content type.")
+
+    head = uploaded.get(Range=f"bytes=0-{settings.DIRECT_UPLOADS['HEADER_BYTES'] - 1}")['Body'].read()
+    try:
+        with Image.open(BytesIO(head)) as image:
+            image_format, (width, height) = image.format, image.size
+    except (UnidentifiedImageError, OSError):
+        raise serializers.ValidationError("Upload a valid image.")
+
+    if Image.MIME.get(image_format) != content_type:
+        raise serializers.ValidationError("The image does not have the declared content type.")
+    if width * height > settings.DIRECT_UPLOADS['MAX_PIXELS']:
+        raise serializers.ValidationError("The image dimensions are too large.")
+
+
+class DirectUploadIntentSerializer(serializers.Serializer):
+    content_type = serializers.CharField()
+    size = serializers.IntegerField(min_value=1)
+
+    def validate_content_type(self, content_type):
+        if content_type not in settings.DIRECT_UPLOADS['CONTENT_TYPES']:
+            raise serializers.ValidationError(
+                f"Unsupported image type, use one of {', '.join(settings.DIRECT_UPLOADS['CONTENT_TYPES'])}.")
+        return content_type
+
+    def validate_size(self, size):
+        if size > settings.DIRECT_UPLOADS['MAX_SIZE']:
+            raise serializers.ValidationError("The image is too large.")
+        return size
+
+
+class DirectUploadConfirmSerializer(serializers.Serializer):
+    token = serializers.CharField()
+
+    def validate_token(self, token):
+        try:
+            # Uploads started right before the presigned POST expired may finish a little later.
+            max_age = settings.DIRECT_UPLOADS['EXPIRES'] + settings.DIRECT_UPLOADS['CONFIRM_GRACE']
+            return signing.loads(token, salt=UPLOAD_TOKEN_SALT, max_age=max_age)
+        except signing.BadSignature:
+            raise serializers.ValidationError("The upload is invalid or has expired.")
+
+
+class DirectUploadView(api_views.GenericAPIView):
+    """
+    Base of the views uploading the image field `image_field_name` of the object straight from
+    the client to the object store, so the bytes never pass through a Django worker:
+
+    1. POST `{content_type, size}` to the intent view returns a presigned POST (`url`, `fields`)
+       and a `token`;
+    2. the client POSTs the file to `url` with `fields`;
+    3. POST `{token}` to the confirm view validates the object and attaches it to the field.
+    """
+    image_field_name = None
+
+    def get_storage(self):
+        return self.get_queryset().model._meta.get_field(self.image_field_name).storage
+
+    def post(self, request, *args, **kwargs):
+        instance = self.get_object()
+        if not supports_direct_uploads(self.get_storage()):
+            return Response({'error': 'Direct uploads are not available.'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.handle_upload(instance, serializer.validated_data)
+
+    def handle_upload(self, instance, data):
+        raise NotImplementedError
+
+
+class DirectUploadIntentView(DirectUploadView):
+    serializer_class = DirectUploadIntentSerializer
+
+    def handle_upload(self, instance, data):
+        content_type = data['content_type']
+        extension = settings.DIRECT_UPLOADS['CONTENT_TYPES'][content_type]
+        field = type(instance)._meta.get_field(self.image_field_name)
+        name = field.generate_filename(instance, f'{uuid4().hex}.{extension}')
+
+        upload = presigned_post(self.get_storage(), name, content_type, data['size'])
+        token = signing.dumps({'model': instance._meta.label_lower, 'pk': instance.pk,
+                               'field': self.image_field_name, 'name': name, 'content_type': content_type},
+                              salt=UPLOAD_TOKEN_SALT)
+        return Response({'url': upload['url'], 'fields': upload['fields'], 'token': token,
+                         'expires_in': settings.DIRECT_UPLOADS['EXPIRES']}, status=status.HTTP_201_CREATED)
+
+
+class DirectUploadConfirmView(DirectUploadView):
+    serializer_class = DirectUploadConfirmSerializer
+
+    def handle_upload(self, instance, data):
+        upload = data['token']
+        if (upload['model'], upload['pk'], upload['field']) != (instance._meta.label_lower, instance.pk,
+                                                                self.image_field_name):
+            raise serializers.ValidationError({'token': "The upload belongs to another image."})
+
+        storage = self.get_storage()
+        try:
+            validate_uploaded_image(storage, upload['name'], upload['content_type'])
+        except serializers.ValidationError as error:
+            storage.delete(upload['name'])
+            raise serializers.ValidationError({self.image_field_name: error.detail})
+
+        attach_stored_image(instance, self.image_field_name, upload['name'])
+        field_file = getattr(instance, self.image_field_name)
+        return Response({self.image_field_name: self.request.build_absolute_uri(field_file.url)})
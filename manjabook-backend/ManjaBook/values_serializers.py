@@ -0,0 +1,163 @@
+from decimal import Decimal
+from operator import itemgetter
+
+from django.db import models
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from ManjaBook.fixed_point import FixedPointField
+from ManjaBook.images import build_srcset, media_url_builder, variants_field_name
+
+
+def decimal_converter(model_field):
+    # Same output as DRF's DecimalField with COERCE_DECIMAL_TO_STRING: a fixed-point string.
+    exponent = Decimal(1).scaleb(-model_field.decimal_places)
+
+    def convert(value):
+        return None if value is None else f'{value.quantize(exponent):f}'
+
+    return convert
+
+
+def fixed_point_converter(model_field):
+    # Same output as FixedPointSerializerField, formatted from the stored integer without a Decimal.
+    format_units = model_field.format_units
+
+    def convert(value):
+        return None if value is None else format_units(value)
+
+    return convert
+
+
+def file_url_converter(model_field, request):
+    # Same output as DRF's FileField/ImageField with UPLOADED_FILES_USE_URL.
+    url = media_url_builder(model_field.storage, request)
+
+    def convert(name):
+        return url(name) if name else None
+
+    return convert
+
+
+class Srcset:
+    """
+    Source of a ValuesSerializer key rendering like `ManjaBook.images.SrcsetField`.
+    """
+
+    def __init__(self, image_field_name):
+        self.image_field_name = image_field_name
+
+
+class ValuesSerializer:
+    """
+    Read-only fast path that reproduces the output of a DRF serializer from `.values()` rows.
+
+    `fields` maps every output key, in the order of the DRF serializer, to one of:
+    - a `.values()` lookup on `model`, converted the way the matching DRF field would;
+    - a nested ValuesSerializer class, reading lookups under `<key>__` from the same row;
+    - a Srcset of an image field;
+    - None, for values computed by a `get_<key>(row)` method from the lookups in `method_lookups`.
+
+    The getter of every key is compiled once, when the serializer is built, so serializing a row
+    is a single dict comprehension over plain values instead of instantiating and walking DRF fields.
+    """
+    model = None
+    fields = {}
+    method_lookups = ()
+    # Lookup that is None when the relation of a nested serializer is empty; it then renders as None.
+    null_lookup = None
+
+    def __init__(self, context=None, prefix=''):
+        self.context = context or {}
+        self.prefix = prefix
+        self.lookups = []
+        self.getters = [(key, self.compile_getter(key, source)) for key, source in self.fields.items()]
+        self.lookups.extend(prefix + lookup for lookup in self.method_lookups)
+        self.lookups = list(dict.fromkeys(self.lookups))
+
+    def compile_getter(self, key, source):
+        if source is None:
+            return getattr(self, f'get_{key}')
+
+        if isinstance(source, type) and issubclass(source, ValuesSerializer):
+            nested = source(self.context, prefix=f'{self.prefix}{key}__')
+            self.lookups.extend(nested.lookups)
+            return nested.to_representation
+
+        if isinstance(source, Srcset):
+            return self.compile_srcset_getter(source.image_field_name)
+
+        lookup = self.prefix + source
+        self.lookups.append(lookup)
+        getter = itemgetter(lookup)
+        convert = self.get_converter(self.resolve_model_field(source))
+        if convert is None:
+            return getter
+        return lambda row: convert(getter(row))
+
+    def compile_srcset_getter(self, image_field_name):
+        image_lookup = self.prefix + image_field_name
+        variants_lookup = self.prefix + variants_field_name(image_field_name)
+        self.lookups.extend((image_lookup, variants_lookup))
+        url = media_url_builder(self.resolve_model_field(image_field_name).storage, self.context.get('request'))
+        return lambda row: build_srcset(row[variants_lookup], row[image_lookup], url)
+
+    def resolve_model_field(self, lookup):
+        model, model_field = self.model, None
+        for part in lookup.split('__'):
+            model_field = model._meta.get_field(part)
+            model = model_field.related_model
+        return model_field
+
+    def get_converter(self, model_field):
+        if isinstance(model_field, FixedPointField):
+            return fixed_point_converter(model_field)
+        if isinstance(model_field, models.DecimalField):
+            return decimal_converter(model_field)
+        if isinstance(model_field, models.FileField):
+            return file_url_converter(model_field, self.context.get('request'))
+        if isinstance(model_field, models.DateTimeField):
+            return serializers.DateTimeField().to_representation
+        return None
+
+    def prefetch(self, rows):
+        """
+        Load whatever the method getters need for `rows` at once, before they are serialized.
+        """
+
+    def to_representation(self, row):
+        if self.null_lookup is not None and row[self.prefix + self.null_lookup] is None:
+            return None
+        return {key: getter(row) for key, getter in self.getters}
+
+    def serialize_many(self, rows):
+        rows = list(rows)
+        self.prefetch(rows)
+        return [self.to_representation(row) for row in rows]
+
+
+class ValuesListMixin:
+    """
+    Opt-in fast path for list GETs: views setting `values_serializer_class` paginate `.values()` rows
+    and render them with it instead of instantiating the DRF serializer per object.
+    """
+    values_serializer_class = None
+
+    def get_values_serializer(self):
+        return self.values_serializer_class(context=self.get_serializer_context())
+
+    def list(self, request, *args, **kwargs):
+        if self.values_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.get_values_serializer()
+        queryset = self.filter_queryset(self.get_queryset())
+        # The keyset paginator reads the cursor position from the row, so the ordering keys are selected too.
+        ordering = self.paginator.get_ordering(self) if self.paginator is not None else ()
+        ordering_lookups = [field.lstrip('-') for field in ordering]
+        rows = queryset.values(*dict.fromkeys(serializer.lookups + ordering_lookups))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize_many(page))
+        return Response(serializer.serialize_many(rows))
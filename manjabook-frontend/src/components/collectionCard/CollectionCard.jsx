@@ -1,4 +1,5 @@
-import {Card, CardContent, CardMedia, Typography} from "@mui/material";
+import {Card, CardContent, Typography} from "@mui/material";
+import ResponsivePicture from "../responsivePicture/ResponsivePicture";
 
 export default function CollectionCard({collection}) {
     return (
@@ -8,10 +9,11 @@ export default function CollectionCard({collection}) {
                 boxShadow: "0 0 0.5em rgba(0,0,0,0.5)",
             }}
         >
-            <CardMedia
-                component="img"
-                image={collection.image}
+            <ResponsivePicture
+                src={collection.image}
+                srcset={collection.image_srcset}
                 alt={collection.name}
+                sizes="(max-width: 600px) 100vw, (max-width: 1200px) 50vw, 33vw"
                 sx={{
                     maxHeight: 350,
                     borderRadius: "1.5em 1.5em 0 0",
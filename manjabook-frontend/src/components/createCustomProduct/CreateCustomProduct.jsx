@@ -2,6 +2,7 @@ import {Box, Button, CircularProgress, FormControl, InputLabel, MenuItem, Select
 import API_ENDPOINTS from "../../apiConfig.js";
 import {useEffect, useState} from "react";
 import {useError} from "../../context/errorProvider/ErrorProvider.jsx";
+import fetchAllPages from "../../utils/fetchAllPages/fetchAllPages.js";
 
 export default function CreateCustomProduct({createProductErrors, setCreateProductErrors,
                                                 createProductFormValues, setCreateProductFormValues,
@@ -14,12 +15,7 @@ export default function CreateCustomProduct({createProductErrors, setCreateProdu
     useEffect(() => {
         const fetchShops = async () => {
             try {
-                const response = await fetch(API_ENDPOINTS.shops);
-
-                if (response.ok) {
-                    const data = await response.json();
-                    setShops(data);
-                }
+                setShops(await fetchAllPages(`${API_ENDPOINTS.shops}?page_size=100`));
             } catch (e) {
                 setError(e.message);
             }
@@ -15,13 +15,13 @@ export default function Home() {
     useEffect(() => {
         const fetchData = async () => {
             try {
-                const recipesResponse = await fetch(`${API_ENDPOINTS.recipes}?limit=9`, {
+                const recipesResponse = await fetch(`${API_ENDPOINTS.recipes}?page_size=9`, {
                     method: "GET",
                     credentials: "include",
                 });
                 if (recipesResponse.ok) {
                     const data = await recipesResponse.json();
-                    setFeaturedRecipes(data);
+                    setFeaturedRecipes(data.results);
                 }
             } catch (e) {
                 setError(e.message);
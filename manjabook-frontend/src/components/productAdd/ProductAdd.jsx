@@ -13,7 +13,7 @@ import ConfigureProduct from "../configureProduct/ConfigureProduct.jsx";
 export default function ProductAdd({units, onSendData, handleModalMode, showProductModal, children}) {
     const {setError} = useError();
     const [activeTab, setActiveTab] = useState(0);
-    const [products, setProducts] = useState([]);
+    const [products, setProducts] = useState({results: [], next: null});
     const [searchedProducts, setSearchedProducts] = useState(null);
     const [currentProduct, setCurrentProduct] = useState({
         product: null,
@@ -54,21 +54,26 @@ export default function ProductAdd({units, onSendData, handleModalMode, showProd
 
     const [isDisabled, setIsDisabled] = useState(false);
 
-    const fetchProducts = async () => {
+    const fetchPage = async (url, setPage, append = false) => {
         try {
-            const response = await fetch(API_ENDPOINTS.products, {
+            const response = await fetch(url, {
                 method: "GET",
                 credentials: "include",
             });
             if (response.ok) {
                 const data = await response.json();
-                setProducts(data);
+                setPage(oldPage => ({
+                    results: append ? [...oldPage.results, ...data.results] : data.results,
+                    next: data.next,
+                }));
             }
         } catch (error) {
-            setError(error);
+            setError(error.message);
         }
     };
 
+    const fetchProducts = () => fetchPage(API_ENDPOINTS.products, setProducts);
+
     useEffect(() => {
         fetchProducts();
     }, []);
@@ -109,16 +114,7 @@ export default function ProductAdd({units, onSendData, handleModalMode, showProd
             return
         }
 
-        try {
-            const response = await fetch(`${API_ENDPOINTS.products}?search=${searchTerm}`);
-
-            if (response.ok) {
-                const data = await response.json();
-                setSearchedProducts(data);
-            }
-        } catch (e) {
-            setError(e.message);
-        }
+        await fetchPage(`${API_ENDPOINTS.products}?search=${encodeURIComponent(searchTerm)}`, setSearchedProducts);
     };
 
     const closeCreateProductMode = () => {
@@ -253,10 +249,20 @@ export default function ProductAdd({units, onSendData, handleModalMode, showProd
                                 gap: 3,
                             }}
                         >
-                            {searchedProducts ?
-                                searchedProducts.map((product) => showProduct(product)) :
-                                products.map((product) => showProduct(product))}
+                            {(searchedProducts || products).results.map((product) => showProduct(product))}
                         </Box>
+                        {(searchedProducts || products).next &&
+                            <Button
+                                variant="contained"
+                                color="primary"
+                                onClick={() => searchedProducts ?
+                                    fetchPage(searchedProducts.next, setSearchedProducts, true) :
+                                    fetchPage(products.next, setProducts, true)}
+                                sx={{alignSelf: "center"}}
+                            >
+                                Load more
+                            </Button>
+                        }
                     </Box>
                     : <Box
                         sx={{
@@ -26,10 +26,10 @@ export default function Profile() {
         user_id: '',
         username: '',
         profile_picture: '',
-        owned_collections: [],
-        recipes: [],
         is_owner: false,
     });
+    const [recipes, setRecipes] = useState({results: [], next: null});
+    const [collections, setCollections] = useState({results: [], next: null});
     const [profileLoading, setProfileLoading] = useState(true);
     const [activeTab, setActiveTab] = useState(0);
     const [drawerOpen, setDrawerOpen] = useState(false);
@@ -58,7 +58,28 @@ export default function Profile() {
         setSelectedCollection(null);
     };
 
+    const fetchPage = async (url, setPage, append = false) => {
+        try {
+            const response = await fetch(url, {
+                method: "GET",
+                credentials: "include",
+            });
+            if (response.ok) {
+                const data = await response.json();
+                setPage(oldPage => ({
+                    results: append ? [...oldPage.results, ...data.results] : data.results,
+                    next: data.next,
+                }));
+            }
+        } catch (e) {
+            setError(e.message);
+        }
+    };
+
     useEffect(() => {
+        fetchPage(`${API_ENDPOINTS.profiles}${userID}/recipes/`, setRecipes);
+        fetchPage(`${API_ENDPOINTS.profiles}${userID}/collections/`, setCollections);
+
         const fetchProfile = async () => {
             try {
                 const profileResponse = await fetch(`${API_ENDPOINTS.profiles}${userID}`, {
@@ -399,11 +420,21 @@ export default function Profile() {
                                 },
                             }}
                         >
-                            {profile.recipes.map((recipe) =>
+                            {recipes.results.map((recipe) =>
                                 <Link to={`/recipes/${recipe.id}/${recipe.slug}`} key={`${recipe.id}-${recipe.name}`}>
                                     <RecipeCard recipe={recipe} withCreator={false}/>
                                 </Link>
                             )}
+                            {recipes.next &&
+                                <Button
+                                    variant="contained"
+                                    color="primary"
+                                    onClick={() => fetchPage(recipes.next, setRecipes, true)}
+                                    sx={{alignSelf: "center"}}
+                                >
+                                    Load more
+                                </Button>
+                            }
                         </Box>
                     }
 
@@ -421,7 +452,7 @@ export default function Profile() {
                             }}
                         >
                             <Box>
-                                {profile.owned_collections?.map((collection) =>
+                                {collections.results.map((collection) =>
                                     <Box
                                         key={`collection-${collection.id}`}
                                          onClick={(e) => handleDrawerOpen(collection)}
@@ -430,6 +461,15 @@ export default function Profile() {
                                         <CollectionCard collection={collection} />
                                     </Box>
                                 )}
+                                {collections.next &&
+                                    <Button
+                                        variant="contained"
+                                        color="primary"
+                                        onClick={() => fetchPage(collections.next, setCollections, true)}
+                                    >
+                                        Load more
+                                    </Button>
+                                }
                             </Box>
 
                             <Drawer anchor="right" open={drawerOpen} onClose={handleDrawerClose}>
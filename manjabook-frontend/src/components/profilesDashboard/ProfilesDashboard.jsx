@@ -24,7 +24,7 @@ export default function ProfilesDashboard() {
                 });
                 if (recipesResponse.ok) {
                     const data = await recipesResponse.json();
-                    setProfiles(data);
+                    setProfiles(data.results);
                 }
             } catch (e) {
                 setError(e.message);
@@ -46,7 +46,7 @@ export default function ProfilesDashboard() {
 
             if (response.ok) {
                 const data = await response.json();
-                setSearchedProfiles(data);
+                setSearchedProfiles(data.results);
             }
         } catch (e) {
             setError(e.message);
@@ -14,6 +14,7 @@ import API_ENDPOINTS from "../../apiConfig.js";
 import {useError} from "../../context/errorProvider/ErrorProvider.jsx";
 import {useSuccess} from "../../context/successProvider/SuccessProvider.jsx";
 import {useAuth} from "../../context/authProvider/AuthProvider.jsx";
+import fetchAllPages from "../../utils/fetchAllPages/fetchAllPages.js";
 
 export default function RecipeAddToCollection({recipe}) {
     const {authState} = useAuth();
@@ -36,15 +37,10 @@ export default function RecipeAddToCollection({recipe}) {
     useEffect(() => {
         const fetchCollections = async () => {
             try {
-                const recipeResponse = await fetch(`${API_ENDPOINTS.recipesCollections}?userId=${authState.userID}`, {
+                setCollections(await fetchAllPages(`${API_ENDPOINTS.recipesCollections}?userId=${authState.userID}&page_size=100`, {
                     method: "GET",
                     credentials: "include", // later - same-origin
-                });
-
-                if (recipeResponse.ok) {
-                    const data = await recipeResponse.json();
-                    setCollections(data);
-                }
+                }));
             } catch (e) {
                 setError(e.message);
             }
@@ -1,6 +1,7 @@
 import defaultRecipeImage from "../../assets/images/default-recipe-image.png";
 import defaultUserPicture from "../../assets/images/default-user-picture.png";
-import {Avatar, Box, Card, CardContent, CardMedia, Typography} from "@mui/material";
+import {Avatar, Box, Card, CardContent, Typography} from "@mui/material";
+import ResponsivePicture from "../responsivePicture/ResponsivePicture";
 
 const anonymousUser = {
     profile_picture: defaultUserPicture,
@@ -21,10 +22,11 @@ export default function RecipeCard({recipe, withCreator = true}) {
                 overflow: "visible",
             }}
         >
-            <CardMedia
-                component="img"
-                image={recipe.image ? recipe.image : defaultRecipeImage}
+            <ResponsivePicture
+                src={recipe.image ? recipe.image : defaultRecipeImage}
+                srcset={recipe.image ? recipe.image_srcset : null}
                 alt={recipe.name}
+                sizes="(max-width: 600px) 100vw, (max-width: 1200px) 50vw, 33vw"
                 sx={{
                     maxHeight: 350,
                     borderRadius: "1.5em 1.5em 0 0",
@@ -52,6 +54,9 @@ export default function RecipeCard({recipe, withCreator = true}) {
                             ? creatorInfo.profile_picture
                             : anonymousUser.profile_picture
                     }
+                    imgProps={creatorInfo?.is_active && creatorInfo.profile_picture_srcset?.jpeg
+                        ? {srcSet: creatorInfo.profile_picture_srcset.jpeg, sizes: "40px"}
+                        : undefined}
                     alt={creatorInfo?.username}
                     sx={{width: 40, height: 40}}
                 />
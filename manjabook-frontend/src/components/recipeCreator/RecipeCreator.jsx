@@ -7,6 +7,7 @@ import addButtonIcon from "../../assets/images/add-button-icon.png";
 import defaultRecipeImage from "../../assets/images/default-recipe-image.png";
 import {useError} from "../../context/errorProvider/ErrorProvider.jsx";
 import API_ENDPOINTS from "../../apiConfig.js";
+import fetchAllPages from "../../utils/fetchAllPages/fetchAllPages.js";
 import {useSuccess} from "../../context/successProvider/SuccessProvider.jsx";
 
 export default function RecipeCreator({recipeData = null}) {
@@ -188,15 +189,10 @@ export default function RecipeCreator({recipeData = null}) {
 
         const fetchUnits = async () => {
             try {
-                const response = await fetch(API_ENDPOINTS.units, {
+                setUnits(await fetchAllPages(`${API_ENDPOINTS.units}?page_size=100`, {
                     method: "GET",
                     credentials: "include",
-                });
-
-                if (response.ok) {
-                    const data = await response.json();
-                    setUnits(data);
-                }
+                }));
             } catch (e) {
                 setError(e.message);
             }
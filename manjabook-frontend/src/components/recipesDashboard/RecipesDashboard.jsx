@@ -22,7 +22,7 @@ export default function RecipesDashboard() {
                 });
                 if (recipesResponse.ok) {
                     const data = await recipesResponse.json();
-                    setRecipes(data);
+                    setRecipes(data.results);
                 }
             } catch (e) {
                 setError(e.message);
@@ -44,7 +44,7 @@ export default function RecipesDashboard() {
 
             if (response.ok) {
                 const data = await response.json();
-                setSearchedRecipes(data);
+                setSearchedRecipes(data.results);
             }
         } catch (e) {
             setError(e.message);
@@ -0,0 +1,26 @@
+import {Box} from "@mui/material";
+
+const SOURCE_TYPES = {
+    webp: "image/webp",
+    jpeg: "image/jpeg",
+};
+
+export default function ResponsivePicture({src, srcset, alt, sizes = "100vw", sx}) {
+    const sources = Object.entries(srcset || {}).filter(([format]) => SOURCE_TYPES[format]);
+
+    return (
+        <Box component="picture" sx={{display: "block"}}>
+            {sources.map(([format, candidates]) => (
+                <source key={format} type={SOURCE_TYPES[format]} srcSet={candidates} sizes={sizes}/>
+            ))}
+            <Box
+                component="img"
+                src={src}
+                alt={alt}
+                loading="lazy"
+                decoding="async"
+                sx={{display: "block", width: "100%", objectFit: "cover", ...sx}}
+            />
+        </Box>
+    );
+}
@@ -0,0 +1,18 @@
+// Lists are paginated by the backend: follow the `next` links until the last page and return every result.
+export default async function fetchAllPages(url, options = {}) {
+    const results = [];
+    let nextUrl = url;
+
+    while (nextUrl) {
+        const response = await fetch(nextUrl, options);
+        if (!response.ok) {
+            throw new Error(`Could not load ${url} (${response.status}).`);
+        }
+
+        const data = await response.json();
+        results.push(...data.results);
+        nextUrl = data.next;
+    }
+
+    return results;
+}